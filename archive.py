@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tarfile
+import zipfile
+from rich.console import Console
+from objects import CHUNK_SIZE, commit_files, object_path
+from repository import Repository, RepositoryError
+from tracing import span, count, BYTES_READ, OBJECTS_OPENED
+
+# Initialize Rich console for output
+console = Console(stderr=True)
+
+FORMATS = ("tar", "tar.gz", "zip")
+
+# Files are stored with these permissions; the object store does not keep modes.
+FILE_MODE = 0o644
+
+# The earliest timestamp a zip entry can hold
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def format_for_path(path):
+    """
+    Guess the archive format from an output file name, or None.
+    """
+    for suffix, archive_format in ((".tar.gz", "tar.gz"), (".tgz", "tar.gz"), (".tar", "tar"), (".zip", "zip")):
+        if path.endswith(suffix):
+            return archive_format
+    return None
+
+
+def snapshot(repo, revision):
+    """
+    Return (commit hash, commit data, sorted [(path, blob hash)]) for a revision.
+    Collapsed directories of sparse commits are expanded from their trees.
+    """
+    commit_hash = repo.resolve(revision)
+    commit_data = repo.read_commit(commit_hash)
+    return commit_hash, commit_data, sorted(commit_files(commit_data, repo.objects_dir).items())
+
+
+def _write_tar(output, mode, files, objects_dir, prefix, mtime):
+    # Stream mode ("w|") never seeks, so the archive can go straight to a pipe
+    with tarfile.open(fileobj=output, mode=mode, format=tarfile.PAX_FORMAT) as tar:
+        for path, blob_hash in files:
+            blob_path = object_path(blob_hash, objects_dir)
+            info = tarfile.TarInfo(prefix + path)
+            info.size = os.path.getsize(blob_path)
+            info.mode = FILE_MODE
+            info.mtime = mtime
+            with open(blob_path, "rb") as blob_file:
+                tar.addfile(info, blob_file)
+            count(OBJECTS_OPENED)
+            count(BYTES_READ, info.size)
+
+
+def _write_zip(output, files, objects_dir, prefix, mtime):
+    date_time = max(ZIP_EPOCH, time.localtime(mtime)[:6])
+    # zipfile writes data descriptors when the output cannot seek
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path, blob_hash in files:
+            blob_path = object_path(blob_hash, objects_dir)
+            info = zipfile.ZipInfo(prefix + path, date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (0o100000 | FILE_MODE) << 16
+            info.file_size = os.path.getsize(blob_path)
+            with open(blob_path, "rb") as blob_file, archive.open(info, "w", force_zip64=info.file_size > 0x7FFFFFFF) as entry:
+                shutil.copyfileobj(blob_file, entry, CHUNK_SIZE)
+            count(OBJECTS_OPENED)
+            count(BYTES_READ, info.file_size)
+
+
+def write_archive(repo, revision, output, archive_format="tar", prefix=""):
+    """
+    Write the snapshot of `revision` as an archive to the binary file object
+    `output`. Blobs are copied from the object store in chunks, so memory use
+    does not depend on the size of the snapshot and the working tree is never
+    read. Returns the archived commit hash.
+    """
+    if archive_format not in FORMATS:
+        raise RepositoryError(f"Unknown archive format '{archive_format}'. Use one of: {', '.join(FORMATS)}.")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    commit_hash, commit_data, files = snapshot(repo, revision)
+    mtime = int(commit_data.get("timestamp") or 0)
+    with span("archive.write", format=archive_format, files=len(files)):
+        if archive_format == "zip":
+            _write_zip(output, files, repo.objects_dir, prefix, mtime)
+        else:
+            _write_tar(output, "w|gz" if archive_format == "tar.gz" else "w|", files, repo.objects_dir, prefix, mtime)
+    return commit_hash
+
+
+def archive(revision, archive_format=None, output_path=None, prefix="", repo=None):
+    """
+    Export a revision as a tar, tar.gz or zip archive to a file or stdout.
+    Messages go to stderr so they never mix with an archive on stdout.
+    """
+    archive_format = archive_format or (output_path and format_for_path(output_path)) or "tar"
+    try:
+        repo = repo or Repository(".")
+        if output_path is None:
+            commit_hash = write_archive(repo, revision, sys.stdout.buffer, archive_format, prefix)
+            sys.stdout.buffer.flush()
+        else:
+            try:
+                with open(output_path, "wb") as output:
+                    commit_hash = write_archive(repo, revision, output, archive_format, prefix)
+            except (RepositoryError, OSError):
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                raise
+            console.print(f"[bold green]Archived {commit_hash[:7]} to {output_path}.[/bold green]")
+    except (RepositoryError, OSError) as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.error(f"Archive of '{revision}' failed: {e}")
+        return False
+    logging.info(f"Archived {commit_hash} as {archive_format}.")
+    return True
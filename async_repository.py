@@ -0,0 +1,156 @@
+import os
+import asyncio
+import functools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from clone import copy_repository
+from repository import Repository
+
+# Blocking file I/O and hashing run on this many threads unless told otherwise.
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# How many repositories commit_many works on at the same time by default.
+DEFAULT_BATCH_CONCURRENCY = 16
+
+
+class AsyncRepositories:
+    """
+    Run repository operations from asyncio code.
+
+    Each call is executed on a bounded thread pool so the event loop never
+    blocks on file I/O or hashing. Operations on the same repository are
+    serialized by a per-repository lock, while operations on different
+    repositories overlap freely. An opened Repository object is kept while
+    operations on it are running or waiting, so queued calls reuse its cached
+    state, and dropped with the repository's lock afterwards.
+
+        async with AsyncRepositories(max_workers=8) as repos:
+            await repos.add("/srv/repos/a", ".")
+            await repos.commit("/srv/repos/a", "Update")
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="myscs")
+        self._repositories = {}
+        self._locks = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the thread pool after the running operations finish.
+        """
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _key(path):
+        return os.path.realpath(path)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, *keys):
+        """
+        Hold the locks of the given repositories, taken in a fixed order so
+        that two callers can never wait on each other. A lock is dropped once
+        nobody holds or waits for it, together with the opened repository, so
+        only repositories with operations in progress are kept.
+        """
+        keys = sorted(set(keys))
+        entries = []
+        for key in keys:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            entries.append((key, entry))
+        acquired = []
+        try:
+            for _, entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key, entry in entries:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+                    self._repositories.pop(key, None)
+
+    def _open(self, key):
+        repo = self._repositories.get(key)
+        if repo is None:
+            repo = self._repositories[key] = Repository(key)
+        return repo
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def run(self, path, operation, *args):
+        """
+        Call `operation(repo, *args)` on the repository at `path` while holding
+        that repository's lock, and return its result.
+        """
+        key = self._key(path)
+        async with self._locked(key):
+            return await self._call(lambda: operation(self._open(key), *args))
+
+    async def add(self, path, file_path):
+        return await self.run(path, Repository.add, file_path)
+
+    async def commit(self, path, message, author=None):
+        return await self.run(path, Repository.commit, message, author)
+
+    async def log(self, path, max_count=None):
+        return await self.run(path, lambda repo: repo.log(max_count=max_count))
+
+    async def clone(self, source_path, dest_path):
+        """
+        Copy a repository. Both the source and destination are locked, in a
+        fixed order so that two clones can never wait on each other.
+        """
+        async with self._locked(self._key(source_path), self._key(dest_path)):
+            await self._call(copy_repository, source_path, dest_path)
+
+    async def commit_pending(self, path, message, author=None):
+        """
+        Stage every file of the working tree and commit if anything changed.
+        Returns the new commit hash, or None when there was nothing to commit.
+        """
+        def stage_and_commit(repo):
+            repo.add(".")
+            if not repo.has_staged_changes():
+                return None
+            return repo.commit(message, author)
+
+        return await self.run(path, stage_and_commit)
+
+    async def commit_many(self, paths, message, concurrency=DEFAULT_BATCH_CONCURRENCY, author=None):
+        """
+        Commit pending changes in many repositories with at most `concurrency`
+        of them in progress at once. A failure in one repository does not stop
+        the others. Returns one dictionary per path, in order, with the "path",
+        the new "commit" hash (or None) and the "error" raised, if any.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def commit_one(path):
+            async with semaphore:
+                return await self.commit_pending(path, message, author)
+
+        outcomes = await asyncio.gather(*(commit_one(path) for path in paths), return_exceptions=True)
+        results = []
+        for path, outcome in zip(paths, outcomes):
+            if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+                # Cancellation and interrupts are not failures of one repository
+                raise outcome
+            if isinstance(outcome, Exception):
+                results.append({"path": path, "commit": None, "error": outcome})
+            else:
+                results.append({"path": path, "commit": outcome, "error": None})
+        return results
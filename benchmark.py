@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for myscs.
+
+Generates synthetic repositories at several scales, times every command by
+running `myscs.py` in a subprocess, and writes the results to JSON. A previous
+results file can be passed with --baseline to fail the run when a command got
+slower than the allowed threshold.
+
+    python benchmark.py --scales small,medium --repeat 5 --output bench.json
+    python benchmark.py --baseline bench.json --threshold 1.25
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+
+MYSCS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "myscs.py")
+
+# Each scale describes the synthetic repository the commands run against.
+SCALES = {
+    "small": {"files": 50, "depth": 3, "min_size": 64, "max_size": 4096, "commits": 50, "branches": 2, "branch_commits": 10},
+    "medium": {"files": 500, "depth": 6, "min_size": 64, "max_size": 32768, "commits": 500, "branches": 8, "branch_commits": 50},
+    "large": {"files": 5000, "depth": 10, "min_size": 64, "max_size": 131072, "commits": 5000, "branches": 32, "branch_commits": 200},
+}
+
+COMMANDS = ["init", "add", "commit", "log", "branch", "switch", "diff", "merge", "clone"]
+
+
+def generate_working_tree(repo_dir, files, depth, min_size, max_size, rng):
+    """
+    Create `files` files of random sizes. Half of them sit at the top level and
+    the rest are spread over directories nested up to `depth` levels deep.
+    Returns a list of (relative path, size) pairs.
+    """
+    created = []
+    for i in range(files):
+        if i % 2 == 0 or depth == 0:
+            relative_dir = ""
+        else:
+            levels = rng.randint(1, depth)
+            relative_dir = os.path.join(*[f"dir{(i + level) % 7}_{level}" for level in range(levels)])
+        os.makedirs(os.path.join(repo_dir, relative_dir), exist_ok=True)
+        relative_path = os.path.join(relative_dir, f"file{i}.txt")
+        size = rng.randint(min_size, max_size)
+        with open(os.path.join(repo_dir, relative_path), "wb") as f:
+            f.write(rng.getrandbits(8 * (size // 2 + 1)).to_bytes(size // 2 + 1, "little").hex().encode("ascii")[:size])
+        created.append((relative_path.replace(os.sep, "/"), size))
+    return created
+
+
+def write_object(objects_dir, data):
+    """
+    Write raw bytes as an object and return its hash.
+    """
+    object_hash = hashlib.sha1(data).hexdigest()
+    with open(os.path.join(objects_dir, object_hash), "wb") as f:
+        f.write(data)
+    return object_hash
+
+
+def write_commit(objects_dir, message, parent_commit, files, timestamp):
+    """
+    Write a commit object in the same format as `myscs commit`.
+    """
+    commit_data = {
+        "commit_message": message,
+        "timestamp": timestamp,
+        "parent_commit": parent_commit,
+        "files": files,
+        "author": "Benchmark",
+    }
+    return write_object(objects_dir, json.dumps(commit_data, indent=4).encode("utf-8"))
+
+
+def generate_repository(repo_dir, scale, seed=0):
+    """
+    Build a synthetic repository: a working tree, a linear history of
+    `commits` commits on main, and `branches` feature branches that fork from
+    random points of main with `branch_commits` commits each.
+    """
+    rng = random.Random(seed)
+    os.makedirs(repo_dir, exist_ok=True)
+    tree = generate_working_tree(repo_dir, scale["files"], scale["depth"], scale["min_size"], scale["max_size"], rng)
+
+    myscs_dir = os.path.join(repo_dir, ".myscs")
+    objects_dir = os.path.join(myscs_dir, "objects")
+    heads_dir = os.path.join(myscs_dir, "refs", "heads")
+    os.makedirs(objects_dir)
+    os.makedirs(heads_dir)
+    with open(os.path.join(myscs_dir, "config"), "w") as config_file:
+        json.dump({"repository": "myscs", "version": "1.0"}, config_file, indent=4)
+
+    snapshot = {}
+    for path, _ in tree:
+        with open(os.path.join(repo_dir, path), "rb") as f:
+            snapshot[path] = write_object(objects_dir, f.read())
+
+    timestamp = time.time() - scale["commits"] * 60
+    main_chain = []
+    parent = None
+    paths = sorted(snapshot)
+    for i in range(scale["commits"]):
+        changed = paths[i % len(paths)]
+        snapshot[changed] = write_object(objects_dir, f"{changed} revision {i}\n".encode("utf-8"))
+        parent = write_commit(objects_dir, f"Commit {i}", parent, sorted(snapshot.items()), timestamp + i * 60)
+        main_chain.append(parent)
+
+    for b in range(scale["branches"]):
+        branch_parent = rng.choice(main_chain)
+        branch_snapshot = dict(snapshot)
+        for i in range(scale["branch_commits"]):
+            changed = paths[(b * 31 + i) % len(paths)]
+            branch_snapshot[changed] = write_object(objects_dir, f"{changed} branch {b} revision {i}\n".encode("utf-8"))
+            branch_parent = write_commit(objects_dir, f"Branch {b} commit {i}", branch_parent, sorted(branch_snapshot.items()), timestamp + i)
+        with open(os.path.join(heads_dir, f"feature{b}"), "w") as ref_file:
+            ref_file.write(branch_parent)
+
+    with open(os.path.join(heads_dir, "main"), "w") as ref_file:
+        ref_file.write(parent)
+    with open(os.path.join(myscs_dir, "HEAD"), "w") as head_file:
+        head_file.write(f"ref: refs/heads/main\n{parent}")
+
+    # Leave the working tree and index checked out at the tip of main
+    with open(os.path.join(myscs_dir, "index"), "w") as index_file:
+        for path, blob_hash in sorted(snapshot.items()):
+            index_file.write(f"{path} {blob_hash}\n")
+            shutil.copyfile(os.path.join(objects_dir, blob_hash), os.path.join(repo_dir, path))
+    return tree
+
+
+def run_myscs(args, cwd):
+    """
+    Run one myscs command and return (elapsed seconds, peak RSS in KiB or None).
+    Peak RSS comes from wait4, which is not available on Windows.
+    """
+    # stderr goes to a file rather than a pipe, so a chatty command cannot
+    # block on a full pipe while wait4 waits for it to exit
+    with tempfile.TemporaryFile() as stderr_file:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, MYSCS_SCRIPT, *args], cwd=cwd, stdout=subprocess.DEVNULL, stderr=stderr_file)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            elapsed = time.perf_counter() - start
+            proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            # ru_maxrss is in KiB on Linux and in bytes on macOS
+            peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            proc.wait()
+            elapsed = time.perf_counter() - start
+            peak_rss = None
+        if proc.returncode != 0:
+            stderr_file.seek(0)
+            raise RuntimeError(f"myscs {' '.join(args)} failed: {stderr_file.read().decode(errors='replace')}")
+    return elapsed, peak_rss
+
+
+def prepare_run(command, template_dir, run_dir, run_number, scale):
+    """
+    Copy the template repository into run_dir and do any untimed setup the
+    command needs. Returns (arguments, working directory, items processed).
+    """
+    if command == "init":
+        shutil.copytree(template_dir, run_dir, ignore=shutil.ignore_patterns(".myscs"))
+        return ["init"], run_dir, 1
+
+    shutil.copytree(template_dir, run_dir)
+    if command == "add":
+        return ["add", "."], run_dir, scale["files"]
+    if command == "commit":
+        run_myscs(["add", "."], run_dir)
+        return ["commit", f"Benchmark commit {run_number}"], run_dir, scale["files"]
+    if command == "log":
+        return ["log"], run_dir, scale["commits"]
+    if command == "branch":
+        return ["branch", f"bench{run_number}"], run_dir, 1
+    if command == "switch":
+        return ["switch", "feature0"], run_dir, 1
+    if command == "diff":
+        return ["diff", "main", "feature0"], run_dir, scale["commits"] + scale["branch_commits"]
+    if command == "merge":
+        return ["merge", "feature0"], run_dir, scale["commits"] + scale["branch_commits"]
+    if command == "clone":
+        clone_dir = run_dir + "_clone"
+        return ["clone", run_dir, clone_dir], os.path.dirname(run_dir), scale["files"]
+    raise ValueError(f"Unknown command: {command}")
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def bench_command(command, scale_name, template_dir, work_dir, repeat):
+    """
+    Time a command `repeat` times against fresh copies of the template.
+    """
+    scale = SCALES[scale_name]
+    timings = []
+    peak_rss = []
+    items = 1
+    for run_number in range(repeat):
+        run_dir = os.path.join(work_dir, f"{scale_name}_{command}_{run_number}")
+        args, cwd, items = prepare_run(command, template_dir, run_dir, run_number, scale)
+        elapsed, rss = run_myscs(args, cwd)
+        timings.append(elapsed)
+        if rss is not None:
+            peak_rss.append(rss)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        shutil.rmtree(run_dir + "_clone", ignore_errors=True)
+
+    p50 = percentile(timings, 0.50)
+    return {
+        "scale": scale_name,
+        "command": command,
+        "runs": repeat,
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "throughput_per_s": round(items / p50, 3) if p50 else None,
+        "items": items,
+        "peak_rss_kb": max(peak_rss) if peak_rss else None,
+    }
+
+
+def run_benchmarks(scale_names, commands, repeat, seed=0):
+    """
+    Generate a template repository per scale and benchmark every command on it.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="myscs_bench_")
+    try:
+        for scale_name in scale_names:
+            template_dir = os.path.join(work_dir, f"{scale_name}_template")
+            generate_repository(template_dir, SCALES[scale_name], seed)
+            for command in commands:
+                result = bench_command(command, scale_name, template_dir, work_dir, repeat)
+                results.append(result)
+                print(f"{scale_name:>7} {command:<7} p50={result['p50_ms']:>10.3f} ms  p95={result['p95_ms']:>10.3f} ms  "
+                      f"rss={result['peak_rss_kb']} KiB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Return a list of regressions: commands whose p50 latency exceeds the
+    baseline p50 multiplied by threshold.
+    """
+    baseline_index = {(r["scale"], r["command"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_index.get((result["scale"], result["command"]))
+        if previous and previous["p50_ms"] and result["p50_ms"] > previous["p50_ms"] * threshold:
+            regressions.append({
+                "scale": result["scale"],
+                "command": result["command"],
+                "baseline_p50_ms": previous["p50_ms"],
+                "p50_ms": result["p50_ms"],
+                "ratio": round(result["p50_ms"] / previous["p50_ms"], 3),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark myscs commands on synthetic repositories.")
+    parser.add_argument("--scales", default="small", help=f"Comma-separated scales to run ({', '.join(SCALES)}).")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="Comma-separated commands to benchmark.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command and scale.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic repository generator.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Previous results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed p50 slowdown ratio against the baseline.")
+    args = parser.parse_args()
+
+    scale_names = [s for s in args.scales.split(",") if s]
+    commands = [c for c in args.commands.split(",") if c]
+    for name in scale_names:
+        if name not in SCALES:
+            parser.error(f"unknown scale '{name}'")
+    for command in commands:
+        if command not in COMMANDS:
+            parser.error(f"unknown command '{command}'")
+
+    current = run_benchmarks(scale_names, commands, args.repeat, args.seed)
+    with open(args.output, "w") as output_file:
+        json.dump(current, output_file, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(current, baseline, args.threshold)
+        if regressions:
+            for regression in regressions:
+                print(f"REGRESSION {regression['scale']} {regression['command']}: "
+                      f"{regression['baseline_p50_ms']} ms -> {regression['p50_ms']} ms (x{regression['ratio']})")
+            sys.exit(1)
+        print("No regressions above the threshold.")
+
+
+if __name__ == "__main__":
+    main()
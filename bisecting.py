@@ -0,0 +1,320 @@
+import os
+import json
+import math
+import logging
+import subprocess
+from collections import Counter
+from rich.console import Console
+from objects import commit_parents
+from repository import Repository, RepositoryError
+from tracing import span
+
+# Initialize Rich console for output
+console = Console()
+
+# The bisect session of a worktree: the commit known to be bad, the commits
+# known to be good or skipped, where HEAD was before, and every step taken.
+BISECT_FILE = "bisect"
+
+# `bisect run`: exit code 0 means good, 125 means the commit cannot be
+# tested, other codes up to 127 mean bad and anything else aborts the run.
+SKIP_EXIT_CODE = 125
+MAX_BAD_EXIT_CODE = 127
+
+
+def _state_path(repo):
+    return os.path.join(repo.myscs_dir, BISECT_FILE)
+
+
+def read_state(repo):
+    """
+    The current bisect session, or None if no bisect is in progress.
+    """
+    try:
+        with open(_state_path(repo), "r") as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise RepositoryError(f"Bisect state is damaged; run 'myscs bisect reset'. ({e})") from e
+
+
+def _write_state(repo, state):
+    with open(_state_path(repo), "w") as state_file:
+        json.dump(state, state_file, indent=4)
+
+
+def _require_state(repo):
+    state = read_state(repo)
+    if state is None:
+        raise RepositoryError("No bisect in progress. Start one with 'myscs bisect start <bad> <good>'.")
+    return state
+
+
+def _reachable(repo, starts, parents):
+    """
+    Every commit reachable from `starts` up to the shallow boundary. The
+    parents of each commit read are recorded in `parents`, so a commit is
+    only read once however many walks pass through it.
+    """
+    shallow = repo.shallow_commits
+    seen = set()
+    stack = list(starts)
+    while stack:
+        commit_hash = stack.pop()
+        if commit_hash in seen:
+            continue
+        seen.add(commit_hash)
+        if commit_hash not in parents:
+            commit_data = repo.read_commit(commit_hash)
+            parents[commit_hash] = [] if commit_data is None or commit_hash in shallow else commit_parents(commit_data)
+        stack.extend(parents[commit_hash])
+    return seen
+
+
+def candidates(repo, state):
+    """
+    The commits that may still be the first bad one: ancestors of the bad
+    commit (itself included) that no good commit reaches. Returns the set
+    and the {commit: parents} map of the walk.
+    """
+    parents = {}
+    with span("bisect.walk"):
+        suspects = _reachable(repo, [state["bad"]], parents)
+        suspects -= _reachable(repo, state["good"], parents)
+    return suspects, parents
+
+
+def weights(suspects, parents):
+    """
+    For each suspect, how many suspects it reaches (itself included). Marking
+    a commit good rules out exactly that many; marking it bad rules out the
+    rest. Reachability is kept as one bitset per commit, so history that
+    merges back together is never counted twice.
+    """
+    # Parents before children
+    order = []
+    visited = set()
+    for root in sorted(suspects):
+        stack = [(root, False)]
+        while stack:
+            commit_hash, expanded = stack.pop()
+            if expanded:
+                order.append(commit_hash)
+                continue
+            if commit_hash in visited:
+                continue
+            visited.add(commit_hash)
+            stack.append((commit_hash, True))
+            stack.extend((parent, False) for parent in parents[commit_hash] if parent in suspects and parent not in visited)
+
+    # A bitset is dropped once every child has used it, which keeps a long
+    # linear history to a handful of live sets
+    children_left = Counter(parent for commit_hash in suspects for parent in parents[commit_hash] if parent in suspects)
+    reach = {}
+    result = {}
+    with span("bisect.weights", commits=len(order)):
+        for position, commit_hash in enumerate(order):
+            bits = 1 << position
+            for parent in parents[commit_hash]:
+                if parent in suspects:
+                    bits |= reach[parent]
+                    children_left[parent] -= 1
+                    if not children_left[parent]:
+                        del reach[parent]
+            result[commit_hash] = bin(bits).count("1")
+            if children_left[commit_hash]:
+                reach[commit_hash] = bits
+    return result
+
+
+def next_step(repo, state):
+    """
+    Decide what to test next. Returns a dictionary with "done" and either
+    "commit" (the next commit to test, or the first bad commit when done)
+    or "culprits" (when skipped commits leave several possibilities), plus
+    "remaining" suspects and the estimated "steps" left.
+    """
+    suspects, parents = candidates(repo, state)
+    total = len(suspects)
+    if total <= 1:
+        return {"done": True, "commit": state["bad"], "culprits": [state["bad"]], "remaining": total, "steps": 0}
+
+    skipped = set(state["skip"])
+    counts = weights(suspects, parents)
+    # The commit whose answer rules out the most suspects either way
+    best, score = None, 0
+    for commit_hash in sorted(suspects):
+        if commit_hash in skipped:
+            continue
+        commit_score = min(counts[commit_hash], total - counts[commit_hash])
+        if commit_score > score:
+            best, score = commit_hash, commit_score
+    if best is None:
+        # Only skipped commits are left between the good and the bad ones
+        culprits = [state["bad"]] + sorted(suspects & skipped)
+        return {"done": True, "commit": None, "culprits": culprits, "remaining": total, "steps": 0}
+    return {"done": False, "commit": best, "culprits": [], "remaining": total, "steps": math.ceil(math.log2(total))}
+
+
+def _advance(repo, state):
+    """
+    Record the state, then check out the next commit to test (or the first
+    bad commit once it is known). Returns the next step.
+    """
+    step = next_step(repo, state)
+    _write_state(repo, state)
+    target = step["commit"] or state["bad"]
+    if not (repo.detached and repo.head_commit == target):
+        repo.detach(target, f"bisect: checkout {target}")
+    return step
+
+
+def start(repo, bad, goods):
+    """
+    Begin a bisect between a bad revision and one or more good ones, and
+    check out the first commit to test. Returns the next step.
+    """
+    if read_state(repo) is not None:
+        raise RepositoryError("A bisect is already in progress; run 'myscs bisect reset' first.")
+    if not goods:
+        raise RepositoryError("At least one good revision is needed.")
+    bad_commit = repo.resolve(bad)
+    good_commits = [repo.resolve(good) for good in goods]
+    if bad_commit in good_commits:
+        raise RepositoryError("A commit cannot be both good and bad.")
+    if not repo.head_commit:
+        raise RepositoryError("HEAD does not point to a commit yet.")
+    if bad_commit in _reachable(repo, good_commits, {}):
+        raise RepositoryError(f"The bad commit {bad_commit[:7]} is an ancestor of a good commit.")
+    state = {
+        "original": repo.head_branch or repo.head_commit,
+        "bad": bad_commit,
+        "good": good_commits,
+        "skip": [],
+        "log": [["bad", bad_commit]] + [["good", commit_hash] for commit_hash in good_commits],
+    }
+    logging.info(f"Bisect started between bad {bad_commit} and good {', '.join(good_commits)}.")
+    try:
+        return _advance(repo, state)
+    except RepositoryError:
+        # E.g. local changes in the way of the checkout
+        os.remove(_state_path(repo))
+        raise
+
+
+def mark(repo, verdict, revision=None):
+    """
+    Mark a revision (HEAD by default) "good", "bad" or "skip" and check out
+    the next commit to test. Returns the next step.
+    """
+    state = _require_state(repo)
+    commit_hash = repo.resolve(revision or "HEAD")
+    if verdict == "bad":
+        state["bad"] = commit_hash
+    elif verdict == "good":
+        if commit_hash == state["bad"]:
+            raise RepositoryError(f"{commit_hash[:7]} is already marked bad.")
+        state["good"].append(commit_hash)
+    elif verdict == "skip":
+        state["skip"].append(commit_hash)
+    else:
+        raise RepositoryError(f"Unknown bisect verdict '{verdict}'.")
+    state["log"].append([verdict, commit_hash])
+    logging.info(f"Bisect: marked {commit_hash} {verdict}.")
+    return _advance(repo, state)
+
+
+def reset(repo):
+    """
+    End the bisect and check out the branch (or commit) HEAD was on before.
+    """
+    state = _require_state(repo)
+    original = state["original"]
+    if repo.branch_commit(original):
+        repo.switch(original)
+    else:
+        repo.detach(original, "bisect: reset")
+    os.remove(_state_path(repo))
+    return original
+
+
+def run(repo, command):
+    """
+    Test the candidates with `command` until the first bad commit is found:
+    exit code 0 marks a commit good, 125 skips it, 1-127 mark it bad and
+    anything else stops the run. Returns the final step.
+    """
+    state = _require_state(repo)
+    if not command:
+        raise RepositoryError("No command given to run.")
+    step = next_step(repo, state)
+    while not step["done"]:
+        commit_hash = repo.head_commit
+        console.print(f"[dim]Running {' '.join(command)} on {commit_hash[:7]}[/dim]")
+        with span("bisect.run", commit=commit_hash[:7]):
+            try:
+                returncode = subprocess.run(command, cwd=repo.root).returncode
+            except OSError as e:
+                raise RepositoryError(f"Could not run {command[0]}: {e}") from e
+        if returncode == 0:
+            verdict = "good"
+        elif returncode == SKIP_EXIT_CODE:
+            verdict = "skip"
+        elif 0 < returncode <= MAX_BAD_EXIT_CODE:
+            verdict = "bad"
+        else:
+            raise RepositoryError(f"{command[0]} exited with {returncode} on {commit_hash[:7]}; bisect run stopped.")
+        console.print(f"{commit_hash[:7]} is {verdict}")
+        step = mark(repo, verdict, commit_hash)
+    return step
+
+
+def report_step(repo, step):
+    """
+    Print the next commit to test or the bisect result.
+    """
+    if step["done"] and step["commit"]:
+        commit_data = repo.read_commit(step["commit"]) or {}
+        console.print(f"[bold red]{step['commit']} is the first bad commit[/bold red]")
+        console.print(f"Author: {commit_data.get('author', '')}")
+        console.print(f"    {commit_data.get('commit_message', '')}")
+    elif step["done"]:
+        console.print("[bold yellow]The first bad commit could be any of these, because commits in between were skipped:[/bold yellow]")
+        for commit_hash in step["culprits"]:
+            console.print(f"    {commit_hash}")
+    else:
+        console.print(f"Bisecting: {step['remaining'] - 1} commits left to test after this "
+                      f"(roughly {step['steps']} steps)")
+        console.print(f"[cyan]Checked out {step['commit'][:7]}[/cyan]")
+
+
+def bisect(action, revisions=None, command=None, repo=None):
+    """
+    Find the commit that introduced a bug by binary search over history:
+    'start <bad> <good>...', 'good', 'bad' or 'skip' [<rev>], 'run <cmd>'
+    and 'reset'.
+    """
+    revisions = revisions or []
+    try:
+        repo = repo or Repository(".")
+        if action == "start":
+            if len(revisions) < 2:
+                raise RepositoryError("Usage: myscs bisect start <bad> <good> [<good>...]")
+            step = start(repo, revisions[0], revisions[1:])
+        elif action in ("good", "bad", "skip"):
+            step = mark(repo, action, revisions[0] if revisions else None)
+        elif action == "run":
+            step = run(repo, command)
+        elif action == "reset":
+            original = reset(repo)
+            console.print(f"[bold green]Bisect reset; back on {original}.[/bold green]")
+            return True
+        else:
+            raise RepositoryError(f"Unknown bisect action '{action}'.")
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.error(f"Bisect {action} failed: {e}")
+        return False
+    report_step(repo, step)
+    return True
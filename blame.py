@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import bisect
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from rich.console import Console
+from rich.table import Table
+from rich.text import Text
+from objects import commit_parents, object_path, read_tree
+from repository import Repository, RepositoryError
+from tracing import span, count, OBJECTS_OPENED
+
+# Initialize Rich console for output
+console = Console()
+
+# Attributions are cached per file under .myscs/blame, keyed by the commits
+# that changed the file. Commits never change, so entries never go stale.
+# Next to them the cache keeps the chain of changes last walked, so a later
+# walk that reaches it reads no further commits.
+BLAME_DIR = "blame"
+
+# How many attributions are kept per file. The newest one is what makes the
+# next blame incremental; the checkpoints keep older revisions cheap too.
+CACHE_ENTRIES = 32
+CHECKPOINT_INTERVAL = 256
+
+# Temporary files younger than this may still be renamed into place by a
+# running blame, so trimming leaves them alone
+TMP_GRACE_SECONDS = 60 * 60
+
+
+def normalize_path(path):
+    """
+    Turn a user-supplied file path into the form used in commits.
+    """
+    path = path.replace(os.sep, "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path
+
+
+def blob_at(repo, commit_data, path):
+    """
+    The blob hash of `path` in a commit, or None if the commit does not have it.
+    """
+    for file_path, blob_hash in commit_data.get("files", []):
+        if file_path == path:
+            return blob_hash
+    for directory, tree_hash in commit_data.get("trees", []):
+        if path.startswith(directory):
+            return read_tree(tree_hash, repo.objects_dir).get(path)
+    return None
+
+
+def read_lines(repo, blob_hash):
+    with open(object_path(blob_hash, repo.objects_dir), "rb") as blob_file:
+        data = blob_file.read()
+    count(OBJECTS_OPENED)
+    if b"\0" in data:
+        raise RepositoryError("Cannot blame a binary file.")
+    return data.decode("utf-8", errors="replace").splitlines()
+
+
+class BlameCache:
+    """
+    The cached line attributions of one file. Each entry maps a commit that
+    changed the file to the commit each of its lines came from, stored as
+    runs of (commit, number of lines). The chain lists the commits that
+    changed the file and their blobs, oldest first, starting where the
+    file's history starts.
+    """
+
+    def __init__(self, repo, path):
+        self.cache_path = os.path.join(repo.common_dir, BLAME_DIR, hashlib.sha1(path.encode("utf-8")).hexdigest())
+        self.path = path
+        self.entries = OrderedDict()
+        self.chain = []
+        self.dirty = False
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                data = json.load(cache_file)
+            if data.get("path") == path:
+                self.entries = OrderedDict(data.get("entries", []))
+                self.chain = [tuple(change) for change in data.get("chain", [])]
+        except (OSError, ValueError, TypeError):
+            pass
+        self.positions = {commit_hash: position for position, (commit_hash, _) in enumerate(self.chain)}
+
+    def __contains__(self, commit_hash):
+        return commit_hash in self.entries
+
+    def get(self, commit_hash):
+        runs = self.entries.get(commit_hash)
+        if runs is None:
+            return None
+        return [origin for origin, length in runs for _ in range(length)]
+
+    def checkpoint_before(self, position):
+        """
+        The chain position of the newest cached entry at or before `position`,
+        or 0 (where the history starts) if there is none.
+        """
+        checkpoints = sorted(self.positions[commit_hash] for commit_hash in self.entries if commit_hash in self.positions)
+        index = bisect.bisect_right(checkpoints, position)
+        return checkpoints[index - 1] if index else 0
+
+    def record(self, changes):
+        """
+        Join the (commit, blob) changes of a walk, newest first, onto the
+        chain. Walks that stopped at an entry off the chain are not recorded,
+        since the chain must reach back to the start of the history.
+        """
+        oldest = changes[-1][0]
+        if oldest in self.positions:
+            base = self.positions[oldest]
+        elif oldest in self.entries:
+            return
+        else:
+            base, self.chain = 0, []
+        walked = list(reversed(changes))
+        shared = 0
+        while shared < len(walked) and base + shared < len(self.chain) and self.chain[base + shared][0] == walked[shared][0]:
+            shared += 1
+        if shared == len(walked) and base + shared == len(self.chain):
+            return
+        self.chain = self.chain[:base + shared] + walked[shared:]
+        self.positions = {commit_hash: position for position, (commit_hash, _) in enumerate(self.chain)}
+        self.dirty = True
+
+    def discard(self, commit_hash):
+        if self.entries.pop(commit_hash, None) is not None:
+            self.dirty = True
+
+    def put(self, commit_hash, origins):
+        runs = []
+        for origin in origins:
+            if runs and runs[-1][0] == origin:
+                runs[-1][1] += 1
+            else:
+                runs.append([origin, 1])
+        self.entries.pop(commit_hash, None)
+        self.entries[commit_hash] = runs
+        while len(self.entries) > CACHE_ENTRIES:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.cache_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="tmp_")
+        with os.fdopen(fd, "w") as tmp_file:
+            json.dump({"path": self.path, "entries": list(self.entries.items()), "chain": self.chain}, tmp_file)
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+
+def cache_files(repo):
+    """
+    The paths of the blame cache files, oldest first.
+    """
+    cache_dir = os.path.join(repo.common_dir, BLAME_DIR)
+    if not os.path.isdir(cache_dir):
+        return []
+    with os.scandir(cache_dir) as entries:
+        files = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()]
+    return [path for _, path in sorted(files)]
+
+
+def trim_caches(repo, keep):
+    """
+    Delete leftover temporary files and the caches of commits that no longer
+    exist (e.g. after a prune), then the least recently written caches until
+    at most `keep` remain. Returns the number of files deleted.
+    """
+    removed = 0
+    remaining = []
+    for cache_path in cache_files(repo):
+        if os.path.basename(cache_path).startswith("tmp_"):
+            stale = time.time() - os.path.getmtime(cache_path) > TMP_GRACE_SECONDS
+            if not stale:
+                continue
+        else:
+            try:
+                with open(cache_path, "r") as cache_file:
+                    data = json.load(cache_file)
+                commits = [commit_hash for commit_hash, _ in data.get("entries", []) + data.get("chain", [])]
+                stale = any(not os.path.exists(object_path(commit_hash, repo.objects_dir)) for commit_hash in commits)
+            except (OSError, ValueError, AttributeError, TypeError):
+                stale = True
+        if stale:
+            os.remove(cache_path)
+            removed += 1
+        else:
+            remaining.append(cache_path)
+    for cache_path in remaining[:max(0, len(remaining) - keep)]:
+        os.remove(cache_path)
+        removed += 1
+    return removed
+
+
+def _changes(repo, cache, path, commit_hash):
+    """
+    Walk back from `commit_hash` and list the commits that changed `path`,
+    newest first, as (commit, blob) pairs. Commits whose version of the file
+    is the same as one of their parents' are passed over without a diff.
+    The walk stops at a commit already in the cache, at the commit that
+    added the file, or at the shallow boundary. Once it reaches the cached
+    chain, the rest is taken from the chain down to the nearest checkpoint
+    without reading any more commits.
+    """
+    changes = []
+    commit_data = repo.read_commit(commit_hash)
+    blob_hash = blob_at(repo, commit_data, path)
+    if blob_hash is None:
+        raise RepositoryError(f"'{path}' does not exist in {commit_hash[:7]}.")
+    with span("blame.walk"):
+        while True:
+            position = cache.positions.get(commit_hash)
+            if position is not None:
+                checkpoint = cache.checkpoint_before(position)
+                changes.extend(reversed(cache.chain[checkpoint:position + 1]))
+                break
+            if commit_hash in repo.shallow_commits:
+                parents = []
+            else:
+                parents = [(parent, repo.read_commit(parent)) for parent in commit_parents(commit_data)]
+                parents = [(parent, data, blob_at(repo, data, path)) for parent, data in parents if data is not None]
+            same = next(((parent, data) for parent, data, parent_blob in parents if parent_blob == blob_hash), None)
+            if same is not None:
+                commit_hash, commit_data = same
+                continue
+            changes.append((commit_hash, blob_hash))
+            if commit_hash in cache:
+                break
+            # Lines that did not change here come from the first parent that has the file
+            previous = next(((parent, data, parent_blob) for parent, data, parent_blob in parents if parent_blob), None)
+            if previous is None:
+                break
+            commit_hash, commit_data, blob_hash = previous
+    return changes
+
+
+def carry_origins(old_lines, new_lines, old_origins, commit_hash):
+    """
+    Attribute the lines of a new version: lines matched in the old version
+    keep their origin and everything else comes from `commit_hash`.
+    Most changes touch a few lines, so the common prefix and suffix are
+    matched directly and only the middle is diffed.
+    """
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_end, new_end = len(old_lines) - suffix, len(new_lines) - suffix
+
+    new_origins = old_origins[:prefix] + [commit_hash] * (new_end - prefix) + old_origins[old_end:]
+    matcher = SequenceMatcher(None, old_lines[prefix:old_end], new_lines[prefix:new_end], autojunk=False)
+    for old_start, new_start, size in matcher.get_matching_blocks():
+        new_origins[prefix + new_start:prefix + new_start + size] = old_origins[prefix + old_start:prefix + old_start + size]
+    return new_origins
+
+
+def blame(repo, path, revision="HEAD"):
+    """
+    Attribute every line of `path` at `revision` to the commit that last
+    changed it. Returns a list of (commit hash, line) pairs.
+    """
+    path = normalize_path(path)
+    start = repo.resolve(revision)
+    cache = BlameCache(repo, path)
+    changes = _changes(repo, cache, path, start)
+
+    # Replay the changes oldest first, carrying attributions across each diff
+    oldest, blob_hash = changes[-1]
+    lines = read_lines(repo, blob_hash)
+    origins = cache.get(oldest)
+    if origins is not None and len(origins) != len(lines):
+        # A damaged entry; walk again without it
+        cache.discard(oldest)
+        changes = _changes(repo, cache, path, start)
+        oldest, blob_hash = changes[-1]
+        lines = read_lines(repo, blob_hash)
+        origins = cache.get(oldest)
+    if origins is None:
+        origins = [oldest] * len(lines)
+    cache.record(changes)
+    with span("blame.diff", commits=len(changes) - 1):
+        for position, (commit_hash, blob_hash) in enumerate(reversed(changes[:-1]), start=1):
+            new_lines = read_lines(repo, blob_hash)
+            lines, origins = new_lines, carry_origins(lines, new_lines, origins, commit_hash)
+            # Checkpoints sit at fixed places in the chain, so every walk finds the same ones
+            if cache.positions.get(commit_hash, position) % CHECKPOINT_INTERVAL == 0:
+                cache.put(commit_hash, origins)
+    if changes[0][0] not in cache:
+        cache.put(changes[0][0], origins)
+    cache.save()
+    return list(zip(origins, lines))
+
+
+def show_blame(path, revision=None, repo=None):
+    """
+    Print each line of a file with the commit, author and date that last changed it.
+    """
+    try:
+        repo = repo or Repository(".")
+        result = blame(repo, path, revision or "HEAD")
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        return False
+
+    table = Table(title=f"Blame for {normalize_path(path)}", show_edge=False, box=None)
+    table.add_column("Commit", style="cyan", no_wrap=True)
+    table.add_column("Author", style="green", no_wrap=True)
+    table.add_column("Date", style="yellow", no_wrap=True)
+    table.add_column("Line", justify="right", style="magenta")
+    table.add_column("Content", overflow="fold")
+    with span("render"):
+        for number, (commit_hash, line) in enumerate(result, start=1):
+            commit_data = repo.read_commit(commit_hash) or {}
+            prefix = "^" if commit_hash in repo.shallow_commits else ""
+            date = time.strftime("%Y-%m-%d", time.localtime(commit_data.get("timestamp", 0)))
+            table.add_row(prefix + commit_hash[:7], commit_data.get("author", ""), date, str(number), Text(line))
+        console.print(table)
+    logging.info(f"Blamed {len(result)} lines of {path}.")
+    return True
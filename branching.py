@@ -1,55 +1,45 @@
-import os
 import logging
 from rich.console import Console
-from commit_change import get_current_commit_hash  # Import this from commit_change.py
+from repository import Repository, RepositoryError
 
 # Initialize Rich console
 console = Console()
 
-def create_branch(branch_name):
+def create_branch(branch_name, start=None, repo=None):
     """
-    Create a new branch in the repository and switch to it.
+    Create a new branch in the repository pointing to the current commit,
+    or to `start` (a branch name or commit hash) when given.
     """
-    branches_dir = ".myscs/refs/heads"
-    if not os.path.exists(branches_dir):
-        os.makedirs(branches_dir)
-
-    # Check if the branch already exists
-    branch_path = os.path.join(branches_dir, branch_name)
-    if os.path.exists(branch_path):
-        console.print(f"[bold red]Error:[/bold red] Branch '{branch_name}' already exists.")
-        logging.warning(f"Attempt to create existing branch '{branch_name}'.")
+    try:
+        repo = repo or Repository(".")
+        if repo.branch_commit(branch_name):
+            console.print(f"[bold red]Error:[/bold red] Branch '{branch_name}' already exists.")
+            logging.warning(f"Attempt to create existing branch '{branch_name}'.")
+            return
+        if not start and not repo.head_commit:
+            console.print(f"[bold yellow]Warning:[/bold yellow] Cannot create branch '{branch_name}' - No commit history found.")
+            logging.error(f"Failed to create branch '{branch_name}' - No commit history.")
+            return
+        current_commit_hash = repo.branch(branch_name, start)
+    except RepositoryError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        logging.error(f"Failed to create branch '{branch_name}': {e}")
         return
 
-    # Create a new branch by pointing it to the current commit (HEAD)
-    current_commit_hash = get_current_commit_hash()  # Fetch the current commit
-    if current_commit_hash:
-        with open(branch_path, 'w') as branch_file:
-            branch_file.write(current_commit_hash)
-        console.print(f"[bold green]Branch '{branch_name}' created successfully.[/bold green]")
-        logging.info(f"Branch '{branch_name}' created and points to commit {current_commit_hash}.")
-    else:
-        console.print(f"[bold yellow]Warning:[/bold yellow] Cannot create branch '{branch_name}' - No commit history found.")
-        logging.error(f"Failed to create branch '{branch_name}' - No commit history.")
+    console.print(f"[bold green]Branch '{branch_name}' created successfully.[/bold green]")
+    logging.info(f"Branch '{branch_name}' created and points to commit {current_commit_hash}.")
 
-def switch_branch(branch_name):
+def switch_branch(branch_name, repo=None):
     """
     Switch to an existing branch.
     """
-    branch_path = f".myscs/refs/heads/{branch_name}"
-
-    if not os.path.exists(branch_path):
-        console.print(f"[bold red]Error:[/bold red] Branch '{branch_name}' does not exist.")
-        logging.warning(f"Attempt to switch to non-existing branch '{branch_name}'.")
+    try:
+        repo = repo or Repository(".")
+        commit_hash = repo.switch(branch_name)
+    except RepositoryError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        logging.warning(f"Attempt to switch to branch '{branch_name}' failed: {e}")
         return
 
-    # Read the commit hash from the branch file
-    with open(branch_path, "r") as branch_file:
-        commit_hash = branch_file.read().strip()
-
-    # Update the HEAD file to point to the new branch
-    with open(".myscs/HEAD", "w") as head_file:
-        head_file.write(f"ref: refs/heads/{branch_name}\n{commit_hash}")
-
     console.print(f"[bold green]Switched to branch:[/bold green] [cyan]{branch_name}[/cyan] (Commit: [magenta]{commit_hash}[/magenta]).")
-    logging.info(f"Switched to branch '{branch_name}' (Commit: {commit_hash}).")
\ No newline at end of file
+    logging.info(f"Switched to branch '{branch_name}' (Commit: {commit_hash}).")
@@ -1,17 +1,193 @@
 import shutil
 import os
+from collections import deque
+from objects import commit_entries, commit_parents, note_new_objects, object_path, read_tree, WORKTREES_DIR
+from maintenance import MAINTENANCE_LOCK
+from reflog import LOCK_SUFFIX, REFLOG_DIR, TMP_SUFFIX
+from repository import Repository, RepositoryError, INDEX_LOCK, REFS_LOCK, WORKTREE_LOCK
+from tracing import span
 
-def clone_repo(source_path, dest_path):
+def copy_repository(source_path, dest_path):
+    """
+    Copy the repository at source_path, including its .myscs directory, to dest_path.
+    Raises RepositoryError if the source does not exist or the copy fails.
+    """
+    if not os.path.exists(source_path):
+        raise RepositoryError(f"Source directory {source_path} does not exist.")
+    if os.path.isfile(os.path.join(source_path, ".myscs")):
+        raise RepositoryError(f"{source_path} is a linked worktree; clone its main repository instead.")
+    source_myscs = os.path.join(os.path.abspath(source_path), ".myscs")
+    source_reflogs = os.path.join(source_myscs, REFLOG_DIR)
+
+    def skip_worktrees(directory, names):
+        # Linked worktrees and locks held by running commands belong to the source, not to the copy
+        directory = os.path.abspath(directory)
+        if directory == source_myscs:
+            return [WORKTREES_DIR, WORKTREE_LOCK, INDEX_LOCK, REFS_LOCK, MAINTENANCE_LOCK]
+        if directory == source_reflogs or directory.startswith(source_reflogs + os.sep):
+            return [name for name in names if name.endswith((LOCK_SUFFIX, TMP_SUFFIX))]
+        return []
+
+    try:
+        shutil.copytree(source_path, dest_path, ignore=skip_worktrees)
+    except (OSError, shutil.Error) as e:
+        raise RepositoryError(str(e)) from e
+
+def select_commits(source, tips, depth, have=lambda commit_hash: False):
+    """
+    Walk `source` breadth-first from `tips` and return the commits within
+    `depth` levels (a tip is level 1), skipping commits for which `have`
+    returns True. Returns the selected {hash: commit data} and the boundary
+    commits whose parents were left behind.
+    """
+    selected = {}
+    queue = deque((tip, 1) for tip in tips)
+    with span("history.walk"):
+        while queue:
+            commit_hash, level = queue.popleft()
+            if commit_hash in selected or have(commit_hash):
+                continue
+            commit_data = source.read_commit(commit_hash)
+            if commit_data is None:
+                continue
+            selected[commit_hash] = commit_data
+            # Never walk past the source's own shallow boundary
+            if level < depth and commit_hash not in source.shallow_commits:
+                queue.extend((parent, level + 1) for parent in commit_parents(commit_data))
+    boundary = {
+        commit_hash for commit_hash, commit_data in selected.items()
+        if any(parent not in selected and not have(parent) for parent in commit_parents(commit_data))
+    }
+    return selected, boundary
+
+def _copy_object(object_hash, source, dest):
+    """
+    Copy one object unless the destination already has it. Objects never
+    change once written, so a hard link is used where the filesystem allows.
+    """
+    dest_path = object_path(object_hash, dest.objects_dir)
+    if os.path.exists(dest_path):
+        return False
+    source_path = object_path(object_hash, source.objects_dir)
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        shutil.copyfile(source_path, dest_path)
+    note_new_objects()
+    return True
+
+def copy_commits(source, dest, commits):
+    """
+    Copy the given commits with every tree and blob they reference.
+    Returns the number of objects copied.
+    """
+    copied = 0
+    with span("objects.copy"):
+        for commit_hash, commit_data in commits.items():
+            copied += _copy_object(commit_hash, source, dest)
+            for path, object_hash in commit_entries(commit_data).items():
+                copied += _copy_object(object_hash, source, dest)
+                if path.endswith("/"):
+                    for blob_hash in read_tree(object_hash, source.objects_dir).values():
+                        copied += _copy_object(blob_hash, source, dest)
+    return copied
+
+def shallow_clone(source_path, dest_path, depth):
+    """
+    Clone only the last `depth` commits of the source's current branch, in the
+    manner of `git clone --depth`. The commits whose parents were not copied
+    are recorded in .myscs/shallow and the source path is kept as the
+    "remote" config value so the history can be deepened later.
+    Returns the new Repository.
+    """
+    if depth < 1:
+        raise RepositoryError("Depth must be a positive number.")
+    if os.path.exists(dest_path):
+        raise RepositoryError(f"Destination {dest_path} already exists.")
+    source = Repository(source_path)
+    branch_name, tip = source.head
+    if not tip:
+        raise RepositoryError(f"Repository {source_path} has no commits to clone.")
+
+    commits, boundary = select_commits(source, [tip], depth)
+    os.makedirs(dest_path)
+    try:
+        dest = Repository.init(dest_path)
+        copy_commits(source, dest, commits)
+        dest.write_shallow(boundary)
+        dest.update_config(remote=os.path.abspath(source_path))
+        dest.update_ref(branch_name, tip, f"clone: from {os.path.abspath(source_path)}")
+        dest.switch(branch_name)
+    except RepositoryError:
+        shutil.rmtree(dest_path, ignore_errors=True)
+        raise
+    except OSError as e:
+        shutil.rmtree(dest_path, ignore_errors=True)
+        raise RepositoryError(str(e)) from e
+    return dest
+
+def deepen(repo, depth):
+    """
+    Fetch `depth` more generations of history behind the shallow boundary from
+    the repository's remote. Returns the number of commits fetched.
+    """
+    if depth < 1:
+        raise RepositoryError("Depth must be a positive number.")
+    remote_path = repo.config.get("remote")
+    if not remote_path:
+        raise RepositoryError("No remote is configured for this repository.")
+    if not repo.shallow_commits:
+        return 0
+    source = Repository(remote_path)
+
+    shallow = set(repo.shallow_commits)
+
+    def have(commit_hash):
+        return os.path.exists(object_path(commit_hash, repo.objects_dir))
+
+    tips = [parent for commit_hash in sorted(shallow) for parent in commit_parents(repo.read_commit(commit_hash) or {})]
+    commits, boundary = select_commits(source, tips, depth, have)
+    copy_commits(source, repo, commits)
+
+    # A boundary commit stops being shallow once all its parents are present
+    for commit_hash in list(shallow):
+        if all(have(parent) for parent in commit_parents(repo.read_commit(commit_hash) or {})):
+            shallow.discard(commit_hash)
+    repo.write_shallow(shallow | boundary)
+    return len(commits)
+
+def clone_repo(source_path, dest_path, depth=None):
     """
     Clone the repository from the source path to the destination path.
-    This copies the repository and its .myscs directory.
+    This copies the repository and its .myscs directory, or only recent
+    history when a depth is given.
     """
     try:
-        if not os.path.exists(source_path):
-            print(f"Source directory {source_path} does not exist.")
+        if depth is not None:
+            shallow_clone(source_path, dest_path, depth)
+            print(f"Repository cloned from {source_path} to {dest_path} with a history depth of {depth}.")
             return
-        # Copy the entire source directory to the destination path
-        shutil.copytree(source_path, dest_path)
+        copy_repository(source_path, dest_path)
         print(f"Repository cloned from {source_path} to {dest_path}.")
-    except Exception as e:
-        print(f"Error cloning repository: {str(e)}")
\ No newline at end of file
+    except RepositoryError as e:
+        if not os.path.exists(source_path):
+            print(str(e))
+        else:
+            print(f"Error cloning repository: {str(e)}")
+
+def fetch(deepen_by, repo=None):
+    """
+    Extend the history of a shallow clone by `deepen_by` commits.
+    """
+    try:
+        repo = repo or Repository(".")
+        if not repo.shallow_commits:
+            print("Repository is not shallow; the full history is already present.")
+            return
+        fetched = deepen(repo, deepen_by)
+        if repo.shallow_commits:
+            print(f"Fetched {fetched} commits from {repo.config['remote']}.")
+        else:
+            print(f"Fetched {fetched} commits from {repo.config['remote']}. The full history is now present.")
+    except RepositoryError as e:
+        print(f"Error fetching history: {str(e)}")
@@ -0,0 +1,410 @@
+import os
+import re
+import sys
+import time
+import codecs
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+from objects import commit_files, commit_object, is_object_hash, note_new_objects, object_path, read_commit
+from repository import DEFAULT_AUTHOR, Repository, RepositoryError
+from tracing import span, count, BYTES_READ
+
+# Initialize Rich console for output
+console = Console()
+
+# Objects are handed to the writer threads in batches of this many objects
+# (or this many bytes, whichever comes first). Only a few batches are in
+# flight at once, so memory stays bounded however large the stream is.
+BATCH_SIZE = 512
+BATCH_BYTES = 8 * 1024 * 1024
+MAX_IN_FLIGHT = 4
+
+# File snapshots of recently written commits, keyed by commit hash. Branch
+# tips are almost always in here, so building the next commit on a branch
+# never has to read its parent back from disk.
+SNAPSHOT_CACHE_SIZE = 64
+
+# "Name <email> <seconds since epoch> <timezone>", as written by git fast-export
+IDENT_RE = re.compile(r"^(?P<name>.*?)\s+(?P<when>\d+)(?:\s+[+-]\d{4})?$")
+
+
+def _write_batch(objects_dir, batch):
+    """
+    Write a batch of objects that are not in the store yet. Each object goes
+    to a temporary file first, so a reader never sees a half-written object.
+    Runs on a writer thread; returns the number of objects written.
+    """
+    written = 0
+    for object_hash, data in batch:
+        destination = object_path(object_hash, objects_dir)
+        if os.path.exists(destination):
+            continue
+        tmp_path = os.path.join(objects_dir, f"tmp_import_{object_hash}")
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, destination)
+        written += 1
+    note_new_objects(written)
+    return written
+
+
+class ObjectWriter:
+    """
+    Hash objects on the calling thread and write them to the object store in
+    batches on background threads, so parsing the stream and writing files
+    overlap. Objects seen earlier in the stream are not written again.
+    """
+
+    def __init__(self, objects_dir, workers=2):
+        self.objects_dir = objects_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="myscs-import")
+        self._in_flight = deque()
+        self._pending = []
+        self._pending_bytes = 0
+        self._seen = set()
+        self.written = 0
+
+    def write(self, data):
+        """
+        Queue raw object bytes for writing and return the object's hash.
+        """
+        object_hash = hashlib.sha1(data).hexdigest()
+        if object_hash not in self._seen:
+            self._seen.add(object_hash)
+            self._pending.append((object_hash, data))
+            self._pending_bytes += len(data)
+            if len(self._pending) >= BATCH_SIZE or self._pending_bytes >= BATCH_BYTES:
+                self._submit()
+        return object_hash
+
+    def _submit(self):
+        if self._pending:
+            with span("import.batch", objects=len(self._pending)):
+                self._in_flight.append(self._executor.submit(_write_batch, self.objects_dir, self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+        while len(self._in_flight) > MAX_IN_FLIGHT:
+            self.written += self._in_flight.popleft().result()
+
+    def flush(self):
+        """
+        Write everything queued so far and wait until it is on disk.
+        """
+        self._submit()
+        while self._in_flight:
+            self.written += self._in_flight.popleft().result()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+class FastImporter:
+    """
+    Import history from a git fast-import style stream. Supported commands:
+
+        blob                        commit <ref>               reset <ref>
+        mark :<n>                   mark :<n>                  from <commit>
+        data <bytes>                author <name> <time> <tz>
+                                    committer <name> <time> <tz>
+        # comment                   data <bytes>
+        done                        from <commit>
+                                    merge <commit>
+                                    M <mode> <dataref> <path>
+                                    M <mode> inline <path>
+                                    D <path>
+                                    deleteall
+
+    Objects are written directly to the object store; the working tree and
+    the index are not touched and refs are only updated once the whole
+    stream has been read and every object is on disk.
+    """
+
+    def __init__(self, repo, stream):
+        self.repo = repo
+        self.stream = stream
+        self.writer = ObjectWriter(repo.objects_dir)
+        self.marks = {}
+        self.branches = {}
+        self.snapshots = OrderedDict()
+        self.line_number = 0
+        self.blobs = 0
+        self.commits = 0
+        self._peeked = None
+
+    # ------------------------------------------------------------------
+    # Reading the stream
+    # ------------------------------------------------------------------
+
+    def _error(self, message):
+        return RepositoryError(f"fast-import: line {self.line_number}: {message}")
+
+    def _next_line(self):
+        """
+        Return the next command line without its newline, or None at the end.
+        Blank lines and comments are skipped.
+        """
+        if self._peeked is not None:
+            line, self._peeked = self._peeked, None
+            return line
+        while True:
+            raw = self.stream.readline()
+            if not raw:
+                return None
+            self.line_number += 1
+            line = raw.decode("utf-8").rstrip("\n")
+            if line and not line.startswith("#"):
+                return line
+
+    def _peek_line(self):
+        if self._peeked is None:
+            self._peeked = self._next_line()
+        return self._peeked
+
+    def _optional(self, command):
+        """
+        Consume the next line if it starts with `command` and return its argument.
+        """
+        line = self._peek_line()
+        if line is not None and (line == command or line.startswith(command + " ")):
+            self._peeked = None
+            return line[len(command) + 1:]
+        return None
+
+    def _read_data(self):
+        line = self._next_line()
+        if line is None or not line.startswith("data "):
+            raise self._error("expected 'data <bytes>'")
+        try:
+            size = int(line[5:])
+        except ValueError:
+            raise self._error(f"invalid data length '{line[5:]}'")
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise self._error("stream ended inside a data block")
+        count(BYTES_READ, size)
+        # The newline after a data block is optional
+        self.line_number += data.count(b"\n")
+        return data
+
+    def _read_mark(self):
+        mark = self._optional("mark")
+        if mark is None:
+            return None
+        if not mark.startswith(":") or not mark[1:].isdigit():
+            raise self._error(f"invalid mark '{mark}'")
+        return mark
+
+    # ------------------------------------------------------------------
+    # Resolving names
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _branch_name(ref):
+        return ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+
+    def _resolve(self, reference):
+        """
+        Turn a mark, a full object hash or a branch name into an object hash.
+        """
+        if reference.startswith(":"):
+            if reference not in self.marks:
+                raise self._error(f"unknown mark '{reference}'")
+            return self.marks[reference]
+        if is_object_hash(reference):
+            return reference
+        commit_hash = self._branch_tip(self._branch_name(reference))
+        if not commit_hash:
+            raise self._error(f"unknown commit '{reference}'")
+        return commit_hash
+
+    def _branch_tip(self, branch_name):
+        """
+        The commit a branch points to so far in the import. A branch reset
+        without 'from' points nowhere, whatever the repository's ref says.
+        """
+        if branch_name in self.branches:
+            return self.branches[branch_name]
+        return self.repo.branch_commit(branch_name)
+
+    def _path(self, path):
+        """
+        Unquote a file path. The index stores one entry per line split on
+        whitespace, so paths containing any are refused.
+        """
+        path = self._unquote(path)
+        if not path or any(character.isspace() for character in path):
+            raise self._error(f"unsupported path {path!r}: paths with whitespace cannot be stored in the index")
+        return path
+
+    def _files_of(self, commit_hash):
+        """
+        The {path: blob hash} snapshot of a commit written earlier.
+        """
+        files = self.snapshots.get(commit_hash)
+        if files is not None:
+            self.snapshots.move_to_end(commit_hash)
+            return files
+        # Older commits may still be waiting in a batch
+        self.writer.flush()
+        commit_data = read_commit(commit_hash, self.repo.objects_dir)
+        if commit_data is None:
+            raise self._error(f"commit {commit_hash} not found")
+        return dict(commit_files(commit_data, self.repo.objects_dir))
+
+    def _remember_snapshot(self, commit_hash, files):
+        self.snapshots[commit_hash] = files
+        if len(self.snapshots) > SNAPSHOT_CACHE_SIZE:
+            self.snapshots.popitem(last=False)
+
+    @staticmethod
+    def _parse_ident(value):
+        match = IDENT_RE.match(value)
+        if match is None:
+            return value, None
+        return match.group("name"), float(match.group("when"))
+
+    @staticmethod
+    def _unquote(path):
+        if len(path) >= 2 and path.startswith('"') and path.endswith('"'):
+            return codecs.escape_decode(path[1:-1].encode("utf-8"))[0].decode("utf-8")
+        return path
+
+    # ------------------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------------------
+
+    def _blob(self):
+        mark = self._read_mark()
+        blob_hash = self.writer.write(self._read_data())
+        if mark:
+            self.marks[mark] = blob_hash
+        self.blobs += 1
+
+    def _commit(self, ref):
+        branch_name = self._branch_name(ref)
+        mark = self._read_mark()
+        author, timestamp = None, None
+        value = self._optional("author")
+        if value is not None:
+            author, timestamp = self._parse_ident(value)
+        value = self._optional("committer")
+        if value is not None:
+            committer, committed_at = self._parse_ident(value)
+            author = author or committer
+            timestamp = committed_at if committed_at is not None else timestamp
+        message = self._read_data().decode("utf-8")
+
+        # Without 'from', a commit continues its branch
+        value = self._optional("from")
+        parent = self._resolve(value) if value is not None else self._branch_tip(branch_name)
+        merge_parent = None
+        while (value := self._optional("merge")) is not None:
+            if merge_parent is not None:
+                raise self._error("only one merge parent is supported")
+            merge_parent = self._resolve(value)
+
+        files = dict(self._files_of(parent)) if parent else {}
+        while True:
+            line = self._peek_line()
+            if line is None:
+                break
+            if line.startswith("M "):
+                self._peeked = None
+                parts = line.split(" ", 3)
+                if len(parts) != 4:
+                    raise self._error(f"malformed file change '{line}'")
+                _, _, dataref, path = parts
+                path = self._path(path)
+                if dataref == "inline":
+                    files[path] = self.writer.write(self._read_data())
+                    self.blobs += 1
+                else:
+                    files[path] = self._resolve(dataref)
+            elif line.startswith("D "):
+                self._peeked = None
+                files.pop(self._path(line[2:]), None)
+            elif line == "deleteall":
+                self._peeked = None
+                files.clear()
+            else:
+                break
+
+        commit_hash, _, data = commit_object(
+            message,
+            OrderedDict(sorted(files.items())),
+            parent,
+            author or self.repo.config.get("author", DEFAULT_AUTHOR),
+            timestamp if timestamp is not None else time.time(),
+            merge_parent,
+        )
+        self.writer.write(data)
+        self._remember_snapshot(commit_hash, files)
+        self.branches[branch_name] = commit_hash
+        if mark:
+            self.marks[mark] = commit_hash
+        self.commits += 1
+
+    def _reset(self, ref):
+        branch_name = self._branch_name(ref)
+        value = self._optional("from")
+        # Without 'from' the next commit on the branch starts a new history
+        self.branches[branch_name] = self._resolve(value) if value is not None else None
+
+    def run(self):
+        """
+        Import the whole stream and update the refs. Returns the names of the
+        branches that were updated.
+        """
+        try:
+            with span("import.parse"):
+                while (line := self._next_line()) is not None:
+                    if line == "blob":
+                        self._blob()
+                    elif line.startswith("commit "):
+                        self._commit(line[7:])
+                    elif line.startswith("reset "):
+                        self._reset(line[6:])
+                    elif line == "done":
+                        break
+                    else:
+                        raise self._error(f"unsupported command '{line}'")
+        except ValueError as e:
+            # Text that is not UTF-8 or a path with a broken escape
+            raise self._error(f"malformed input ({e})") from e
+        finally:
+            self.writer.close()
+
+        # Every object is on disk now, so the refs can move. A branch reset
+        # and never committed to is left alone.
+        updated = sorted(name for name, commit_hash in self.branches.items() if commit_hash)
+        with span("import.refs"):
+            for branch_name in updated:
+                self.repo.update_ref(branch_name, self.branches[branch_name], "fast-import")
+        return updated
+
+
+def fast_import(repo=None, stream=None):
+    """
+    Read a fast-import stream from stdin and import it into the repository.
+    """
+    try:
+        repo = repo or Repository(".")
+        importer = FastImporter(repo, stream or sys.stdin.buffer)
+        branches = importer.run()
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.error(f"Import failed: {e}")
+        return False
+
+    console.print(f"[bold green]Imported {importer.blobs} blobs and {importer.commits} commits "
+                  f"({importer.writer.written} new objects).[/bold green]")
+    if branches:
+        console.print(f"Updated branches: {', '.join(branches)}")
+    if repo.head_branch in branches:
+        console.print("[yellow]The current branch moved; the working tree and index were not updated.[/yellow]")
+    logging.info(f"Imported {importer.blobs} blobs and {importer.commits} commits.")
+    return True
@@ -0,0 +1,258 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from rich.console import Console
+from rich.progress import Progress
+from rich.table import Table
+from objects import (
+    MYSCS_DIR,
+    OBJECTS_DIR,
+    commit_entries,
+    commit_parents,
+    hash_file,
+    is_object_hash,
+    list_branch_refs,
+    list_worktree_dirs,
+    object_path,
+    read_commit,
+    read_head_commit,
+    read_index_entries,
+    read_shallow,
+    read_tree,
+)
+from reflog import iter_reflog_commits
+
+# Initialize Rich console for output
+console = Console()
+
+# Unreachable objects younger than this are kept, so that a commit or an
+# `add` running at the same time as `prune` does not lose its objects.
+DEFAULT_GRACE_DAYS = 14
+
+# Number of object paths handed to a worker process in one task. Only a few
+# batches are in flight at once, which keeps memory bounded for huge stores.
+BATCH_SIZE = 256
+
+
+def _verify_batch(paths):
+    """
+    Hash every object in the batch and compare it with its name.
+    Runs in a worker process; returns the (object name, problem) pairs found
+    and the number of objects checked.
+    """
+    problems = []
+    for path in paths:
+        name = os.path.basename(path)
+        if not is_object_hash(name):
+            problems.append((name, "invalid object name"))
+            continue
+        try:
+            if hash_file(path) != name:
+                problems.append((name, "hash mismatch"))
+        except OSError as e:
+            problems.append((name, f"unreadable: {e.strerror}"))
+    return problems, len(paths)
+
+
+def iter_object_paths(objects_dir=OBJECTS_DIR):
+    """
+    Yield the path of every object file, skipping temporary files of writes in progress.
+    """
+    if not os.path.isdir(objects_dir):
+        return
+    with os.scandir(objects_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.startswith("tmp_"):
+                yield entry.path
+
+
+def iter_batches(paths, batch_size=BATCH_SIZE):
+    """
+    Group an iterable of paths into lists of at most batch_size items.
+    """
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def verify_objects(objects_dir=OBJECTS_DIR, workers=None, on_progress=None):
+    """
+    Verify every object against its name on a process pool.
+    Returns a list of (object name, problem) pairs for the corrupt objects.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    problems = []
+
+    def collect(futures):
+        for future in futures:
+            batch_problems, batch_size = future.result()
+            problems.extend(batch_problems)
+            if on_progress:
+                on_progress(batch_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for batch in iter_batches(iter_object_paths(objects_dir)):
+            pending.add(executor.submit(_verify_batch, batch))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending).done)
+    return problems
+
+
+def walk_reachable(myscs_dir=MYSCS_DIR, include_index=True):
+    """
+    Mark every object reachable from the branch refs, the reflogs, the HEAD of
+    every worktree and (optionally) their indexes, stopping at the shallow boundary of a depth-limited clone.
+    Returns (reachable hashes, missing objects) where each missing entry is a
+    (kind, object hash, referenced by) tuple.
+    """
+    objects_dir = os.path.join(myscs_dir, "objects")
+    shallow = read_shallow(myscs_dir)
+    reachable = set()
+    missing = []
+
+    stack = [(commit_hash, f"refs/heads/{name}") for name, commit_hash in list_branch_refs(myscs_dir).items()]
+    # Every linked worktree has a HEAD and an index of its own
+    worktrees = {
+        worktree_dir: "" if worktree_dir == myscs_dir else f" of worktree {os.path.basename(worktree_dir)}"
+        for worktree_dir in list_worktree_dirs(myscs_dir)
+    }
+    for worktree_dir, suffix in worktrees.items():
+        head_commit = read_head_commit(worktree_dir)
+        if head_commit:
+            stack.append((head_commit, "HEAD" + suffix))
+        # Commits a ref used to point to stay recoverable; reflog entries whose
+        # objects were pruned before reflogs existed are not an error
+        for commit_hash in iter_reflog_commits(worktree_dir):
+            if os.path.exists(object_path(commit_hash, objects_dir)):
+                stack.append((commit_hash, "reflog" + suffix))
+
+    def mark_entries(entries, referrer):
+        for path, object_hash in entries.items():
+            if object_hash in reachable:
+                continue
+            reachable.add(object_hash)
+            kind = "tree" if path.endswith("/") else "blob"
+            if not os.path.exists(object_path(object_hash, objects_dir)):
+                missing.append((kind, object_hash, referrer))
+            elif kind == "tree":
+                mark_entries(read_tree(object_hash, objects_dir), object_hash)
+
+    if include_index:
+        for worktree_dir, suffix in worktrees.items():
+            mark_entries(read_index_entries(worktree_dir), "index" + suffix)
+
+    while stack:
+        commit_hash, referrer = stack.pop()
+        if commit_hash in reachable:
+            continue
+        reachable.add(commit_hash)
+
+        commit_data = read_commit(commit_hash, objects_dir)
+        if commit_data is None:
+            kind = "commit" if not os.path.exists(object_path(commit_hash, objects_dir)) else "commit (unreadable)"
+            missing.append((kind, commit_hash, referrer))
+            continue
+
+        # The parents of shallow boundary commits were deliberately not copied
+        if commit_hash not in shallow:
+            for parent_commit in commit_parents(commit_data):
+                stack.append((parent_commit, commit_hash))
+
+        mark_entries(commit_entries(commit_data), commit_hash)
+
+    return reachable, missing
+
+
+def fsck(workers=None, repo=None):
+    """
+    Check the object store: verify every object's hash in parallel and make sure
+    that all parents and blobs referenced from the refs actually exist.
+    Returns True if the repository is consistent.
+    """
+    myscs_dir = repo.common_dir if repo else MYSCS_DIR
+    objects_dir = repo.objects_dir if repo else OBJECTS_DIR
+    if not os.path.isdir(objects_dir):
+        console.print("[bold red]Error: Not a myscs repository (no .myscs/objects directory).[/bold red]")
+        return False
+
+    logging.info("Starting fsck.")
+    total = sum(1 for _ in iter_object_paths(objects_dir))
+
+    with Progress(console=console, transient=True) as progress:
+        task = progress.add_task("Verifying objects", total=total)
+        corrupt = verify_objects(objects_dir, workers, lambda n: progress.advance(task, n))
+        progress.add_task("Checking connectivity", total=None)
+        _, missing = walk_reachable(myscs_dir)
+
+    if not corrupt and not missing:
+        console.print(f"[bold green]fsck: {total} objects verified, no problems found.[/bold green]")
+        logging.info(f"fsck completed: {total} objects verified, no problems found.")
+        return True
+
+    table = Table(title="fsck problems", style="bold red")
+    table.add_column("Object", style="cyan", no_wrap=True)
+    table.add_column("Problem", style="magenta")
+    table.add_column("Referenced by", style="yellow")
+    for name, problem in corrupt:
+        table.add_row(name, problem, "")
+    for kind, object_hash, referrer in missing:
+        table.add_row(object_hash, f"missing {kind}", referrer)
+    console.print(table)
+    console.print(f"[bold red]fsck: {len(corrupt)} corrupt and {len(missing)} missing objects out of {total}.[/bold red]")
+    logging.warning(f"fsck found {len(corrupt)} corrupt and {len(missing)} missing objects.")
+    return False
+
+
+def prune_objects(myscs_dir, objects_dir, grace_days=DEFAULT_GRACE_DAYS, dry_run=False):
+    """
+    Delete (or with `dry_run`, only count) the objects that are not reachable
+    and are older than the grace period. Returns (pruned, kept recent,
+    missing referenced objects).
+    """
+    reachable, missing = walk_reachable(myscs_dir)
+    cutoff = time.time() - grace_days * 24 * 60 * 60
+    pruned = 0
+    kept_recent = 0
+    with os.scandir(objects_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in reachable:
+                continue
+            if entry.stat().st_mtime > cutoff:
+                kept_recent += 1
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+            pruned += 1
+            logging.info(f"{'Would prune' if dry_run else 'Pruned'} unreachable object {entry.name}.")
+    return pruned, kept_recent, missing
+
+
+def prune(grace_days=DEFAULT_GRACE_DAYS, dry_run=False, repo=None):
+    """
+    Delete objects that are not reachable from any ref, HEAD or the index and
+    that are older than the grace period.
+    """
+    myscs_dir = repo.common_dir if repo else MYSCS_DIR
+    objects_dir = repo.objects_dir if repo else OBJECTS_DIR
+    if not os.path.isdir(objects_dir):
+        console.print("[bold red]Error: Not a myscs repository (no .myscs/objects directory).[/bold red]")
+        return
+
+    pruned, kept_recent, missing = prune_objects(myscs_dir, objects_dir, grace_days, dry_run)
+    if missing:
+        console.print(f"[bold yellow]Warning: {len(missing)} referenced objects are missing; run 'myscs fsck' for details.[/bold yellow]")
+
+    verb = "Would prune" if dry_run else "Pruned"
+    console.print(f"[bold green]{verb} {pruned} unreachable objects.[/bold green]")
+    if kept_recent:
+        console.print(f"[bold yellow]Kept {kept_recent} unreachable objects younger than {grace_days} days.[/bold yellow]")
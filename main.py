@@ -1,13 +1,35 @@
+import os
 import argparse
+import sys
+from rich.console import Console
 from repoinit import initialize_repo
 from staging import stage_file
-from commit_change import commit, view_commit_history, merge  # Import the commit and log functions
+from commit_change import commit, view_commit_history, merge, show_reflog  # Import the commit and log functions
 from branching import create_branch, switch_branch  # Import branch-related functions
 from diff import compare_branches  # Import the compare_branches function for diffing
-from clone import clone_repo
+from archive import archive, FORMATS
+from bisecting import bisect
+from blame import show_blame
+from clone import clone_repo, fetch
+from fast_import import fast_import
+from fsck import fsck, prune, DEFAULT_GRACE_DAYS
+from objects import resolve_myscs_dir
+from maintenance import maintenance, schedule_maintenance, TASKS as MAINTENANCE_TASKS
+from reflog import DEFAULT_EXPIRE_DAYS as DEFAULT_REFLOG_EXPIRE_DAYS
+from repository import Repository, RepositoryError
+from sparse_checkout import sparse_checkout
+from status import show_status
+from worktree import worktree
+from tracing import tracer, span, setup_logging, stop_logging, DEFAULT_LOG_LEVEL
+
+# Initialize Rich console for output
+console = Console()
 
 def main():
     parser = argparse.ArgumentParser(description="PesaPal Simple version control system.")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace-event JSON file of the command's spans and counters.")
+    parser.add_argument("--profile", action="store_true", help="Print a summary of time spent per span and the counters.")
+    parser.add_argument("--log-level", default=DEFAULT_LOG_LEVEL, help="Level for .myscs/logs/myscs.log (default: WARNING, or $MYSCS_LOG_LEVEL).")
     subparsers = parser.add_subparsers(dest="command")
 
     # 'init' command
@@ -15,7 +37,7 @@ def main():
     init_parser.set_defaults(func=initialize_repo)
 
     # 'add' command
-    add_parser = subparsers.add_parser("add", help="Stage a file.")
+    add_parser = subparsers.add_parser("add", help="Stage a file, or every file below a directory.")
     add_parser.add_argument("file_path", help="Path to the file to be staged.")
     add_parser.set_defaults(func=stage_file)
 
@@ -31,6 +53,7 @@ def main():
     # 'branch' command for creating a new branch
     branch_parser = subparsers.add_parser("branch", help="Create a new branch.")
     branch_parser.add_argument("branch_name", help="Name of the branch to create.")
+    branch_parser.add_argument("start", nargs="?", help="Commit or branch to start from (default: HEAD).")
     branch_parser.set_defaults(func=create_branch)
 
     # 'switch' command for switching branches
@@ -47,6 +70,12 @@ def main():
     diff_parser = subparsers.add_parser("diff", help="Compare two branches to see the differences.")
     diff_parser.add_argument("branch1", help="First branch to compare.")
     diff_parser.add_argument("branch2", help="Second branch to compare.")
+    diff_parser.add_argument("--no-renames", action="store_true", help="Show moved files as a deletion and an addition.")
+    diff_parser.add_argument("--find-copies", action="store_true", help="Also report files copied from another file.")
+    diff_parser.add_argument("--rename-threshold", type=int, metavar="PERCENT",
+                             help="Minimum similarity for a rename or copy (default: 'rename_threshold' config or 50).")
+    diff_parser.add_argument("--rename-limit", type=int, metavar="N",
+                             help="Candidate files compared per added file (default: 'rename_limit' config or 100).")
     diff_parser.set_defaults(func=compare_branches)
 
 
@@ -54,34 +83,184 @@ def main():
     clone_parser = subparsers.add_parser("clone", help="Clone a repository.")
     clone_parser.add_argument("source_path", help="Path to the source repository.")
     clone_parser.add_argument("dest_path", help="Path where the repository will be cloned.")
+    clone_parser.add_argument("--depth", type=int, help="Copy only the last N commits of the current branch.")
     clone_parser.set_defaults(func=clone_repo)
 
+    # 'archive' command for exporting a snapshot without a checkout
+    archive_parser = subparsers.add_parser("archive", help="Export a commit as a tar or zip archive.")
+    archive_parser.add_argument("revision", help="Branch name or commit hash to export.")
+    archive_parser.add_argument("--format", choices=FORMATS, help="Archive format (default: from the output name, else tar).")
+    archive_parser.add_argument("-o", "--output", help="Write the archive to this file instead of stdout.")
+    archive_parser.add_argument("--prefix", default="", help="Directory to put in front of every path in the archive.")
+    archive_parser.set_defaults(func=archive)
+
+    # 'blame' command for attributing lines to commits
+    blame_parser = subparsers.add_parser("blame", help="Show the commit that last changed each line of a file.")
+    blame_parser.add_argument("path", help="File to blame, relative to the repository root.")
+    blame_parser.add_argument("revision", nargs="?", help="Branch name or commit hash to blame (default: HEAD).")
+    blame_parser.set_defaults(func=show_blame)
+
+    # 'fast-import' command for bulk history imports
+    fast_import_parser = subparsers.add_parser("fast-import", help="Import history from a fast-import stream on stdin.")
+    fast_import_parser.set_defaults(func=fast_import)
+
+    # 'fetch' command for deepening a shallow clone
+    fetch_parser = subparsers.add_parser("fetch", help="Fetch more history into a shallow clone.")
+    fetch_parser.add_argument("--deepen", type=int, required=True, help="Number of additional commits to fetch.")
+    fetch_parser.set_defaults(func=fetch)
+
+    # 'status' command
+    status_parser = subparsers.add_parser("status", help="Show staged, modified and untracked files.")
+    status_parser.set_defaults(func=show_status)
+
+    # 'sparse-checkout' command for working on a subset of the tree
+    sparse_parser = subparsers.add_parser("sparse-checkout", help="Limit the working tree to some directories.")
+    sparse_parser.add_argument("action", choices=["set", "list", "disable"], help="What to do with the sparse checkout.")
+    sparse_parser.add_argument("directories", nargs="*", help="Directories to check out (for 'set').")
+    sparse_parser.set_defaults(func=sparse_checkout)
+
+    # 'reflog' command for finding where refs used to point
+    reflog_parser = subparsers.add_parser("reflog", help="Show the history of HEAD or a branch.")
+    reflog_parser.add_argument("ref", nargs="?", default="HEAD", help="HEAD or a branch name (default: HEAD).")
+    reflog_parser.add_argument("-n", "--max-count", type=int, default=20, help="Number of entries to show (default: 20).")
+    reflog_parser.add_argument("--expire", type=int, nargs="?", const=DEFAULT_REFLOG_EXPIRE_DAYS, metavar="DAYS",
+                               help=f"Drop entries older than DAYS from every reflog (default: {DEFAULT_REFLOG_EXPIRE_DAYS}).")
+    reflog_parser.set_defaults(func=show_reflog)
+
+    # 'worktree' command for checking out several branches at once
+    worktree_parser = subparsers.add_parser("worktree", help="Manage worktrees that share this repository's objects.")
+    worktree_actions = worktree_parser.add_subparsers(dest="action", required=True)
+    worktree_add_parser = worktree_actions.add_parser("add", help="Check out a branch in a new directory.")
+    worktree_add_parser.add_argument("path", help="Directory to create the worktree in.")
+    worktree_add_parser.add_argument("branch_name", help="Branch to check out.")
+    worktree_actions.add_parser("list", help="List the worktrees.")
+    worktree_remove_parser = worktree_actions.add_parser("remove", help="Delete a linked worktree.")
+    worktree_remove_parser.add_argument("path", help="Directory of the worktree.")
+    worktree_remove_parser.add_argument("--force", action="store_true", help="Remove it even with uncommitted changes.")
+    worktree_parser.set_defaults(func=worktree)
+
+    # 'bisect' command for finding the commit that introduced a bug
+    bisect_parser = subparsers.add_parser("bisect", help="Find the first bad commit by binary search.")
+    bisect_actions = bisect_parser.add_subparsers(dest="action", required=True)
+    bisect_start_parser = bisect_actions.add_parser("start", help="Start bisecting between a bad and good revisions.")
+    bisect_start_parser.add_argument("revisions", nargs="+", metavar="REV", help="The bad revision, then one or more good ones.")
+    for verdict, description in (("good", "good"), ("bad", "bad"), ("skip", "untestable")):
+        verdict_parser = bisect_actions.add_parser(verdict, help=f"Mark a revision (default: HEAD) as {description}.")
+        verdict_parser.add_argument("revisions", nargs="?", metavar="REV", type=lambda rev: [rev], default=[])
+    bisect_run_parser = bisect_actions.add_parser("run", help="Test each candidate with a command (exit 0 good, 125 skip, 1-127 bad).")
+    bisect_run_parser.add_argument("test_command", nargs=argparse.REMAINDER, metavar="command", help="Command and its arguments.")
+    bisect_actions.add_parser("reset", help="End the bisect and return to the original branch.")
+    bisect_parser.set_defaults(func=bisect)
+
+    # 'maintenance' command for housekeeping; also started in the background after add, commit and fetch
+    maintenance_parser = subparsers.add_parser("maintenance", help="Compact storage and refresh caches.")
+    maintenance_actions = maintenance_parser.add_subparsers(dest="action", required=True)
+    maintenance_run_parser = maintenance_actions.add_parser("run", help="Run maintenance tasks now.")
+    maintenance_run_parser.add_argument("--task", action="append", choices=MAINTENANCE_TASKS, dest="tasks",
+                                        help="Task to run; may be repeated (default: all tasks).")
+    maintenance_run_parser.add_argument("--auto", action="store_true", help=argparse.SUPPRESS)
+    maintenance_actions.add_parser("status", help="Show the health counters and the recent runs.")
+    maintenance_parser.set_defaults(func=maintenance)
+
+    # 'fsck' command for verifying the object store
+    fsck_parser = subparsers.add_parser("fsck", help="Verify object hashes and check that all referenced objects exist.")
+    fsck_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    fsck_parser.set_defaults(func=fsck)
+
+    # 'prune' command for deleting unreachable objects
+    prune_parser = subparsers.add_parser("prune", help="Delete unreachable objects older than a grace period.")
+    prune_parser.add_argument("--grace-days", type=float, default=DEFAULT_GRACE_DAYS, help="Keep unreachable objects younger than this many days.")
+    prune_parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+    prune_parser.set_defaults(func=prune)
+
     args = parser.parse_args()
-    if args.command:
-        # Check if a file path is provided for 'add'
-        if args.command == "add":
-            args.func(args.file_path)
-        # Check if a commit message is provided for 'commit'
-        elif args.command == "commit":
-            args.func(args.commit_message)
-        # Check for branch and switch functionality
-        elif args.command == "branch":
-            args.func(args.branch_name)
-        elif args.command == "switch":
-            args.func(args.branch_name)
-        # Check for the merge functionality
-        elif args.command == "merge":
-            args.func(args.branch_name)
-        # Check for diff functionality
-        elif args.command == "diff":
-            args.func(args.branch1, args.branch2)
-
-        elif args.command =="clone":
-            args.func(args.source_path, args.dest_path)
-        else:
-            args.func()
-    else:
+    # Resolved once: a linked worktree logs next to its own HEAD and index
+    setup_logging(args.log_level, os.path.join(resolve_myscs_dir(), "logs"))
+    if args.trace or args.profile:
+        tracer.enable()
+    try:
+        with span(f"command.{args.command}"):
+            run_command(parser, args)
+    finally:
+        if args.trace:
+            tracer.write_chrome_trace(args.trace)
+        if args.profile:
+            tracer.print_profile()
+        stop_logging()
+
+def run_command(parser, args):
+    """
+    Dispatch the parsed arguments to the selected command.
+    Commands that work on an existing repository share one Repository object.
+    """
+    if not args.command:
         parser.print_help()
+        return
+
+    # 'init' and 'clone' create repositories rather than opening one
+    if args.command == "init":
+        args.func()
+        return
+    if args.command == "clone":
+        args.func(args.source_path, args.dest_path, args.depth)
+        return
+
+    try:
+        repo = Repository(".")
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        sys.exit(1)
+
+    # Check if a file path is provided for 'add'
+    if args.command == "add":
+        args.func(args.file_path, repo=repo)
+    # Check if a commit message is provided for 'commit'
+    elif args.command == "commit":
+        args.func(args.commit_message, repo=repo)
+    # Check for branch and switch functionality
+    elif args.command == "branch":
+        args.func(args.branch_name, args.start, repo=repo)
+    elif args.command in ("switch", "merge"):
+        args.func(args.branch_name, repo=repo)
+    # Check for diff functionality
+    elif args.command == "diff":
+        args.func(args.branch1, args.branch2, not args.no_renames, args.find_copies,
+                  args.rename_threshold, args.rename_limit, repo=repo)
+    elif args.command == "fsck":
+        if not args.func(args.workers, repo=repo):
+            sys.exit(1)
+    elif args.command == "prune":
+        args.func(args.grace_days, args.dry_run, repo=repo)
+    elif args.command == "archive":
+        if not args.func(args.revision, args.format, args.output, args.prefix, repo=repo):
+            sys.exit(1)
+    elif args.command == "blame":
+        if not args.func(args.path, args.revision, repo=repo):
+            sys.exit(1)
+    elif args.command == "fast-import":
+        if not args.func(repo=repo):
+            sys.exit(1)
+    elif args.command == "fetch":
+        args.func(args.deepen, repo=repo)
+    elif args.command == "reflog":
+        args.func(args.ref, args.max_count, args.expire, repo=repo)
+    elif args.command == "bisect":
+        if not args.func(args.action, getattr(args, "revisions", None), getattr(args, "test_command", None), repo=repo):
+            sys.exit(1)
+    elif args.command == "maintenance":
+        if not args.func(args.action, getattr(args, "tasks", None), getattr(args, "auto", False), repo=repo):
+            sys.exit(1)
+    elif args.command == "worktree":
+        args.func(args.action, getattr(args, "path", None), getattr(args, "branch_name", None),
+                  getattr(args, "force", False), repo=repo)
+    elif args.command == "sparse-checkout":
+        args.func(args.action, args.directories, repo=repo)
+    else:
+        args.func(repo=repo)
+
+    # Housekeeping is checked after the commands that add objects, refs or index entries
+    if args.command in ("add", "commit", "fetch", "fast-import"):
+        schedule_maintenance(repo)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import subprocess
+from rich.console import Console
+from rich.table import Table
+from blame import cache_files, trim_caches
+from fsck import DEFAULT_GRACE_DAYS, prune_objects
+from objects import take_new_objects
+from reflog import DEFAULT_EXPIRE_DAYS
+from repository import Repository, RepositoryError
+from tracing import span
+
+# Initialize Rich console for output
+console = Console()
+
+# Run history, in the shared .myscs
+MAINTENANCE_STATE = "maintenance.json"
+MAINTENANCE_HISTORY = 20
+
+# Objects written since the last run. Each command appends the number it
+# wrote as one line and a run starts the file over, so the counter never
+# has to list the flat object store.
+OBJECT_COUNTER = "maintenance-objects"
+
+# Held by a running `maintenance run`. A lock older than this is left over
+# from a run that was killed and is taken over.
+MAINTENANCE_LOCK = "maintenance.lock"
+STALE_LOCK_SECONDS = 60 * 60
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Tasks in the order they run: reflogs expire before the prune, so the
+# commits only they referenced can go in the same run.
+TASKS = ("pack-refs", "compact-index", "expire-reflogs", "prune-objects", "trim-caches")
+
+# Each check is one cheap counter, the config value holding its threshold,
+# the default threshold and the tasks that bring the counter back down.
+# Setting "maintenance_auto" to false in the config turns the checks off.
+CHECKS = (
+    ("new loose objects", "maintenance_loose_objects", 5000, ("expire-reflogs", "prune-objects")),
+    ("loose refs", "maintenance_loose_refs", 50, ("pack-refs",)),
+    ("stale index bytes", "maintenance_index_slack", 256 * 1024, ("compact-index",)),
+    ("blame caches", "maintenance_blame_caches", 256, ("trim-caches",)),
+)
+
+
+def _state_path(repo):
+    return os.path.join(repo.common_dir, MAINTENANCE_STATE)
+
+
+def read_state(repo):
+    """
+    The maintenance state: {"runs": [...]}, newest run last.
+    """
+    try:
+        with open(_state_path(repo), "r") as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault("runs", [])
+    return state
+
+
+def _write_state(repo, state):
+    fd, tmp_path = tempfile.mkstemp(dir=repo.common_dir, prefix="tmp_")
+    with os.fdopen(fd, "w") as tmp_file:
+        json.dump(state, tmp_file, indent=4)
+    os.replace(tmp_path, _state_path(repo))
+
+
+def _counter_path(repo):
+    return os.path.join(repo.common_dir, OBJECT_COUNTER)
+
+
+def record_new_objects(repo):
+    """
+    Add the objects this process wrote to the repository's counter. A single
+    append, so concurrent commands never lose each other's counts.
+    """
+    amount = take_new_objects()
+    if amount:
+        fd = os.open(_counter_path(repo), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b"%d\n" % amount)
+        finally:
+            os.close(fd)
+
+
+def new_objects(repo):
+    """
+    The number of objects written since the last maintenance run.
+    """
+    try:
+        with open(_counter_path(repo), "rb") as counter_file:
+            return sum(int(line) for line in counter_file if line.strip().isdigit())
+    except OSError:
+        return 0
+
+
+def measure(repo):
+    """
+    Read every counter. Each one costs at most a small directory listing.
+    Returns {check name: value}.
+    """
+    return {
+        "new loose objects": new_objects(repo),
+        "loose refs": len(repo.loose_refs()),
+        "stale index bytes": repo.index_slack(),
+        "blame caches": len(cache_files(repo)),
+    }
+
+
+def _threshold(repo, key, default):
+    try:
+        return int(repo.config.get(key, default))
+    except (TypeError, ValueError):
+        raise RepositoryError(f"Invalid value for '{key}' in the config: {repo.config.get(key)!r}.")
+
+
+def due_tasks(repo):
+    """
+    The tasks whose counters crossed their thresholds, in run order.
+    """
+    with span("maintenance.check"):
+        values = measure(repo)
+        due = set()
+        for name, key, default, tasks in CHECKS:
+            if values[name] >= _threshold(repo, key, default):
+                due.update(tasks)
+    return [task for task in TASKS if task in due]
+
+
+# ----------------------------------------------------------------------
+# Locking
+# ----------------------------------------------------------------------
+
+def _lock_path(repo):
+    return os.path.join(repo.common_dir, MAINTENANCE_LOCK)
+
+
+def lock_holder(repo):
+    """
+    {"pid", "started"} of the running maintenance, or None if none is running.
+    Only the age of the lock makes it stale: a run that has just created it
+    may not have written its details yet.
+    """
+    try:
+        modified = os.path.getmtime(_lock_path(repo))
+    except OSError:
+        return None
+    if time.time() - modified > STALE_LOCK_SECONDS:
+        return None
+    try:
+        with open(_lock_path(repo), "r") as lock_file:
+            holder = json.load(lock_file)
+    except (OSError, ValueError):
+        holder = None
+    if not isinstance(holder, dict):
+        holder = {"pid": None, "started": modified}
+    return holder
+
+
+def _acquire_lock(repo):
+    lock_path = _lock_path(repo)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            holder = lock_holder(repo)
+            if holder is not None:
+                raise RepositoryError(f"Maintenance is already running (pid {holder.get('pid')}).")
+            # Left behind by a run that was killed
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as lock_file:
+            json.dump({"pid": os.getpid(), "started": time.time()}, lock_file)
+        return
+    raise RepositoryError(f"Could not lock maintenance; remove {lock_path} if no other myscs process is running.")
+
+
+# ----------------------------------------------------------------------
+# Running
+# ----------------------------------------------------------------------
+
+def _run_task(repo, task):
+    if task == "pack-refs":
+        return f"packed {repo.pack_refs()} refs"
+    if task == "compact-index":
+        return f"saved {repo.compact_index()} bytes"
+    if task == "expire-reflogs":
+        days = _threshold(repo, "maintenance_reflog_days", DEFAULT_EXPIRE_DAYS)
+        return f"expired {repo.expire_reflogs(days)} entries"
+    if task == "prune-objects":
+        days = float(repo.config.get("maintenance_grace_days", DEFAULT_GRACE_DAYS))
+        pruned, kept_recent, missing = prune_objects(repo.common_dir, repo.objects_dir, days)
+        return f"pruned {pruned} objects, kept {kept_recent} recent" + (f", {len(missing)} missing" if missing else "")
+    if task == "trim-caches":
+        keep = _threshold(repo, "maintenance_blame_caches", 256) // 2
+        return f"removed {trim_caches(repo, keep)} blame caches"
+    raise RepositoryError(f"Unknown maintenance task '{task}'. Use one of: {', '.join(TASKS)}.")
+
+
+def run_maintenance(repo, tasks=None, trigger="manual"):
+    """
+    Run the given maintenance tasks (all of them if None) under the
+    maintenance lock and record the run in the history. A failing task is
+    recorded and the remaining tasks still run. Returns the history entry.
+    """
+    tasks = [task for task in TASKS if tasks is None or task in tasks]
+    _acquire_lock(repo)
+    try:
+        if "prune-objects" in tasks:
+            # Objects written from here on count towards the next prune
+            try:
+                os.remove(_counter_path(repo))
+            except FileNotFoundError:
+                pass
+        started = time.time()
+        entry = {"started": started, "trigger": trigger, "status": "ok", "tasks": []}
+        for task in tasks:
+            task_start = time.perf_counter()
+            with span(f"maintenance.{task}"):
+                try:
+                    result, status = _run_task(repo, task), "ok"
+                except (RepositoryError, OSError, ValueError) as e:
+                    result, status = str(e), "error"
+                    entry["status"] = "error"
+                    logging.error(f"Maintenance task {task} failed: {e}")
+            entry["tasks"].append({
+                "name": task,
+                "status": status,
+                "result": result,
+                "duration": round(time.perf_counter() - task_start, 3),
+            })
+        entry["duration"] = round(time.time() - started, 3)
+
+        state = read_state(repo)
+        state["runs"] = (state["runs"] + [entry])[-MAINTENANCE_HISTORY:]
+        _write_state(repo, state)
+    finally:
+        os.remove(_lock_path(repo))
+    logging.info(f"Maintenance ({trigger}) ran {', '.join(tasks) or 'no tasks'} in {entry['duration']}s.")
+    return entry
+
+
+def schedule_maintenance(repo):
+    """
+    Called after commands that add objects, refs or index entries. When a
+    counter crossed its threshold, start `maintenance run --auto` as a
+    detached background process and return the tasks it will run.
+    Never raises, so it cannot fail the command that called it.
+    """
+    try:
+        record_new_objects(repo)
+        if str(repo.config.get("maintenance_auto", True)).lower() in ("false", "0", "no", "off"):
+            return []
+        if lock_holder(repo) is not None:
+            return []
+        tasks = due_tasks(repo)
+        if not tasks:
+            return []
+        command = [sys.executable, MAIN_SCRIPT, "maintenance", "run", "--auto"]
+        for task in tasks:
+            command += ["--task", task]
+        options = {"start_new_session": True} if os.name != "nt" else {
+            "creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP,
+        }
+        subprocess.Popen(
+            command,
+            cwd=repo.root,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **options,
+        )
+    except (RepositoryError, OSError) as e:
+        logging.warning(f"Could not schedule maintenance: {e}")
+        return []
+    logging.info(f"Started background maintenance: {', '.join(tasks)}.")
+    return tasks
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+
+def show_status(repo):
+    state = read_state(repo)
+    holder = lock_holder(repo)
+    if holder:
+        console.print(f"[bold yellow]Maintenance is running (pid {holder.get('pid')}, "
+                      f"started {time.ctime(holder.get('started', 0))}).[/bold yellow]")
+
+    counters = Table(title="Repository health")
+    counters.add_column("Counter", style="cyan")
+    counters.add_column("Value", justify="right")
+    counters.add_column("Threshold", justify="right", style="dim")
+    counters.add_column("Tasks", style="magenta")
+    values = measure(repo)
+    for name, key, default, tasks in CHECKS:
+        threshold = _threshold(repo, key, default)
+        style = "red" if values[name] >= threshold else "green"
+        counters.add_row(name, f"[{style}]{values[name]}[/{style}]", str(threshold), ", ".join(tasks))
+    console.print(counters)
+
+    if not state["runs"]:
+        console.print("[bold yellow]Maintenance has not run yet.[/bold yellow]")
+        return
+    history = Table(title="Recent maintenance runs")
+    history.add_column("Started", style="yellow")
+    history.add_column("Trigger")
+    history.add_column("Status")
+    history.add_column("Duration", justify="right")
+    history.add_column("Tasks", overflow="fold")
+    for run in reversed(state["runs"]):
+        style = "green" if run["status"] == "ok" else "red"
+        tasks = "\n".join(f"{task['name']}: {task['result']} ({task['duration']:.2f}s)" for task in run["tasks"])
+        history.add_row(time.ctime(run["started"]), run["trigger"], f"[{style}]{run['status']}[/{style}]",
+                        f"{run['duration']:.2f}s", tasks or "-")
+    console.print(history)
+
+
+def maintenance(action, tasks=None, auto=False, repo=None):
+    """
+    Run repository maintenance now ("run") or show the health counters and
+    the recent runs ("status").
+    """
+    try:
+        repo = repo or Repository(".")
+        if action == "status":
+            show_status(repo)
+            return True
+        if auto:
+            # A background run started after a command; another run has it covered
+            if lock_holder(repo) is not None:
+                return True
+        entry = run_maintenance(repo, tasks, "auto" if auto else "manual")
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.error(f"Maintenance failed: {e}")
+        return False
+
+    for task in entry["tasks"]:
+        style = "green" if task["status"] == "ok" else "red"
+        console.print(f"[{style}]{task['name']}[/{style}]: {task['result']} ({task['duration']:.2f}s)")
+    console.print(f"[bold green]Maintenance finished in {entry['duration']:.2f}s.[/bold green]")
+    return entry["status"] == "ok"
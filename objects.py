@@ -0,0 +1,315 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from tracing import span, count, FILES_HASHED, BYTES_READ, OBJECTS_OPENED
+
+# Every object is stored uncompressed under .myscs/objects and is named by the
+# SHA-1 of its raw bytes, so blobs and commits can be verified the same way.
+MYSCS_DIR = ".myscs"
+OBJECTS_DIR = os.path.join(MYSCS_DIR, "objects")
+CHUNK_SIZE = 8192
+
+# In a linked worktree .myscs is a file holding this prefix and the path of
+# the worktree's own directory under the main repository's .myscs/worktrees.
+WORKTREE_POINTER = "myscsdir: "
+WORKTREES_DIR = "worktrees"
+# Branch refs moved out of refs/heads by maintenance, one "<hash> refs/heads/<name>" per line
+PACKED_REFS = "packed-refs"
+
+# Objects created by this process and not yet handed to maintenance, which
+# keeps its own running count instead of listing the flat object store
+_new_objects = 0
+_new_objects_lock = threading.Lock()
+
+
+def note_new_objects(amount=1):
+    """
+    Record that `amount` objects were added to an object store.
+    """
+    global _new_objects
+    with _new_objects_lock:
+        _new_objects += amount
+
+
+def take_new_objects():
+    """
+    Return the number of objects created since the last call and reset it.
+    """
+    global _new_objects
+    with _new_objects_lock:
+        amount, _new_objects = _new_objects, 0
+    return amount
+
+
+def is_object_hash(name):
+    """
+    Check whether a string looks like a full SHA-1 object name.
+    """
+    return len(name) == 40 and all(c in "0123456789abcdef" for c in name)
+
+
+def object_path(object_hash, objects_dir=OBJECTS_DIR):
+    """
+    Return the path of an object inside the object directory.
+    """
+    return os.path.join(objects_dir, object_hash)
+
+
+def hash_file(file_path):
+    """
+    Calculate the SHA-1 hash of a file, reading it in chunks.
+    """
+    hasher = hashlib.sha1()
+    with span("hash"):
+        with open(file_path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                hasher.update(chunk)
+                count(BYTES_READ, len(chunk))
+    count(FILES_HASHED)
+    return hasher.hexdigest()
+
+
+def store_blob(file_path, objects_dir=OBJECTS_DIR):
+    """
+    Copy a file's contents into the object directory and return its hash.
+    The file is hashed while it is being copied, so it is only read once.
+    """
+    os.makedirs(objects_dir, exist_ok=True)
+    hasher = hashlib.sha1()
+    fd, tmp_path = tempfile.mkstemp(dir=objects_dir, prefix="tmp_blob_")
+    try:
+        with span("object.write", path=file_path):
+            with os.fdopen(fd, "wb") as tmp_file, open(file_path, "rb") as f:
+                with span("hash"):
+                    while chunk := f.read(CHUNK_SIZE):
+                        hasher.update(chunk)
+                        tmp_file.write(chunk)
+                        count(BYTES_READ, len(chunk))
+            count(FILES_HASHED)
+            blob_hash = hasher.hexdigest()
+            destination = object_path(blob_hash, objects_dir)
+            if os.path.exists(destination):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, destination)
+                note_new_objects()
+        return blob_hash
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_commit(commit_hash, objects_dir=OBJECTS_DIR):
+    """
+    Load a commit object. Returns None if the object is missing or is not a commit.
+    """
+    commit_path = object_path(commit_hash, objects_dir)
+    if not os.path.exists(commit_path):
+        return None
+    try:
+        with span("object.read"), open(commit_path, "r") as commit_file:
+            commit_data = json.load(commit_file)
+        count(OBJECTS_OPENED)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(commit_data, dict) or "commit_message" not in commit_data:
+        return None
+    return commit_data
+
+
+def commit_object(message, files, parent_commit, author, timestamp, merge_parent=None):
+    """
+    Build a commit for a {path: hash} mapping and return its (hash, data, bytes).
+    Entries ending in "/" are collapsed directories and are recorded as trees.
+    """
+    commit_data = {
+        "commit_message": message,
+        "timestamp": timestamp,
+        "parent_commit": parent_commit,
+        "files": [[path, blob_hash] for path, blob_hash in files.items() if not path.endswith("/")],
+        "author": author,
+    }
+    trees = [[path, tree_hash] for path, tree_hash in files.items() if path.endswith("/")]
+    if trees:
+        commit_data["trees"] = trees
+    if merge_parent:
+        commit_data["merge_parent"] = merge_parent
+    data = json.dumps(commit_data, indent=4).encode("utf-8")
+    return hashlib.sha1(data).hexdigest(), commit_data, data
+
+
+def commit_parents(commit_data):
+    """
+    Return the parent hashes of a commit: the first parent and, for merge
+    commits, the merged branch's commit.
+    """
+    parents = []
+    if commit_data.get("parent_commit"):
+        parents.append(commit_data["parent_commit"])
+    if commit_data.get("merge_parent"):
+        parents.append(commit_data["merge_parent"])
+    return parents
+
+
+def commit_files(commit_data, objects_dir=OBJECTS_DIR):
+    """
+    Return a commit's files as an ordered {path: blob hash} dictionary,
+    expanding the directories a sparse commit recorded as tree objects.
+    Later entries win if a path is listed more than once.
+    """
+    files = dict((path, blob_hash) for path, blob_hash in commit_data.get("files", []))
+    for _, tree_hash in commit_data.get("trees", []):
+        files.update(read_tree(tree_hash, objects_dir))
+    return files
+
+
+def commit_entries(commit_data):
+    """
+    Return a commit's entries without expanding trees: files map to blob
+    hashes and collapsed directories (ending in "/") map to tree hashes.
+    """
+    entries = dict((path, blob_hash) for path, blob_hash in commit_data.get("files", []))
+    entries.update((directory, tree_hash) for directory, tree_hash in commit_data.get("trees", []))
+    return entries
+
+
+def tree_data(files):
+    """
+    Serialize a {path: blob hash} mapping as the bytes of a tree object.
+    The same files always give the same bytes, and therefore the same hash.
+    """
+    return json.dumps({"tree": sorted([path, blob_hash] for path, blob_hash in files.items())}, indent=4).encode("utf-8")
+
+
+def write_tree(files, objects_dir=OBJECTS_DIR):
+    """
+    Store a tree object listing every file below one directory and return its hash.
+    """
+    data = tree_data(files)
+    tree_hash = hashlib.sha1(data).hexdigest()
+    destination = object_path(tree_hash, objects_dir)
+    if not os.path.exists(destination):
+        with span("object.write"), open(destination, "wb") as tree_file:
+            tree_file.write(data)
+        note_new_objects()
+    return tree_hash
+
+
+def read_tree(tree_hash, objects_dir=OBJECTS_DIR):
+    """
+    Load a tree object as a {path: blob hash} dictionary. Missing trees are empty.
+    """
+    tree_path = object_path(tree_hash, objects_dir)
+    if not os.path.exists(tree_path):
+        return {}
+    with span("object.read"), open(tree_path, "r") as tree_file:
+        data = json.load(tree_file)
+    count(OBJECTS_OPENED)
+    return dict((path, blob_hash) for path, blob_hash in data.get("tree", []))
+
+
+def resolve_myscs_dir(root="."):
+    """
+    Return the .myscs directory for a working tree root, following the
+    pointer file of a linked worktree.
+    """
+    myscs_path = os.path.join(root, MYSCS_DIR)
+    if os.path.isfile(myscs_path):
+        with open(myscs_path, "r") as pointer_file:
+            content = pointer_file.read().strip()
+        if content.startswith(WORKTREE_POINTER):
+            return os.path.normpath(os.path.join(root, content[len(WORKTREE_POINTER):]))
+    return myscs_path
+
+
+def list_worktree_dirs(myscs_dir=MYSCS_DIR):
+    """
+    Return the directories holding a HEAD and an index: the main repository's
+    .myscs directory followed by the directory of every linked worktree.
+    """
+    worktree_dirs = [myscs_dir]
+    worktrees_dir = os.path.join(myscs_dir, WORKTREES_DIR)
+    if os.path.isdir(worktrees_dir):
+        for name in sorted(os.listdir(worktrees_dir)):
+            if os.path.isfile(os.path.join(worktrees_dir, name, "HEAD")):
+                worktree_dirs.append(os.path.join(worktrees_dir, name))
+    return worktree_dirs
+
+
+def read_head_commit(myscs_dir=MYSCS_DIR):
+    """
+    Return the commit hash recorded in HEAD, whichever branch it refers to.
+    """
+    head_path = os.path.join(myscs_dir, "HEAD")
+    if not os.path.exists(head_path):
+        return None
+    with open(head_path, "r") as head_file:
+        lines = head_file.read().split()
+    if lines and is_object_hash(lines[-1]):
+        return lines[-1]
+    return None
+
+
+def load_packed_refs(packed_refs_path):
+    """
+    Return the {branch name: commit hash} mapping stored in a packed-refs file.
+    """
+    refs = {}
+    with open(packed_refs_path, "r") as packed_file:
+        for line in packed_file:
+            parts = line.split()
+            if len(parts) == 2 and parts[1].startswith("refs/heads/") and is_object_hash(parts[0]):
+                refs[parts[1][len("refs/heads/"):]] = parts[0]
+    return refs
+
+
+def list_branch_refs(myscs_dir=MYSCS_DIR):
+    """
+    Return a dictionary mapping branch names to the commit hash they point to.
+    Loose refs in refs/heads take precedence over packed ones.
+    """
+    packed_refs_path = os.path.join(myscs_dir, PACKED_REFS)
+    refs = load_packed_refs(packed_refs_path) if os.path.exists(packed_refs_path) else {}
+    heads_dir = os.path.join(myscs_dir, "refs", "heads")
+    if not os.path.isdir(heads_dir):
+        return refs
+    for root, _, files in os.walk(heads_dir):
+        for name in files:
+            ref_path = os.path.join(root, name)
+            with open(ref_path, "r") as ref_file:
+                commit_hash = ref_file.read().strip()
+            if commit_hash:
+                refs[os.path.relpath(ref_path, heads_dir).replace(os.sep, "/")] = commit_hash
+    return refs
+
+
+def read_shallow(myscs_dir=MYSCS_DIR):
+    """
+    Return the set of shallow boundary commits: commits whose parents were not
+    copied by a depth-limited clone.
+    """
+    shallow_path = os.path.join(myscs_dir, "shallow")
+    if not os.path.exists(shallow_path):
+        return set()
+    with open(shallow_path, "r") as shallow_file:
+        return {line.strip() for line in shallow_file if line.strip()}
+
+
+def read_index_entries(myscs_dir=MYSCS_DIR):
+    """
+    Return the index as a {path: hash} dictionary. Collapsed directories of a
+    sparse index end in "/" and map to tree hashes.
+    """
+    entries = {}
+    index_path = os.path.join(myscs_dir, "index")
+    if not os.path.exists(index_path):
+        return entries
+    with open(index_path, "r") as index_file:
+        for line in index_file:
+            parts = line.split()
+            if len(parts) == 2:
+                entries[parts[0]] = parts[1]
+    return entries
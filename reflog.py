@@ -0,0 +1,180 @@
+import os
+import time
+import tempfile
+import contextlib
+from tracing import span
+
+# Reflogs live under .myscs/reflogs: HEAD in each worktree's own directory and
+# refs/heads/<branch> in the shared one. Every record has the same width, so
+# the newest entries can be read by seeking back from the end of the file.
+REFLOG_DIR = "reflogs"
+NULL_HASH = "0" * 40
+TIME_WIDTH = 10
+OPERATION_WIDTH = 64
+# "<old> <new> <timestamp> <operation>\n"
+RECORD_SIZE = 40 + 1 + 40 + 1 + TIME_WIDTH + 1 + OPERATION_WIDTH + 1
+
+# When a reflog grows past this size, expired records are dropped and only
+# the newest COMPACT_KEEP records are kept.
+MAX_REFLOG_BYTES = 1024 * 1024
+COMPACT_KEEP = MAX_REFLOG_BYTES // RECORD_SIZE // 2
+DEFAULT_EXPIRE_DAYS = 90
+
+# Appends and compaction of one reflog hold "<name>.lock" next to it, so a
+# record is never appended to a file that compaction is about to replace.
+# Rewrites go through "<random>.tmp" files. Branch names cannot end in either
+# suffix, so neither is ever mistaken for a reflog.
+LOCK_SUFFIX = ".lock"
+TMP_SUFFIX = ".tmp"
+LOCK_TIMEOUT = 10
+
+
+def format_record(old_hash, new_hash, operation, timestamp=None):
+    """
+    Encode one reflog entry as a fixed-width line.
+    """
+    operation = " ".join(operation.split())
+    operation_bytes = operation.encode("utf-8")[:OPERATION_WIDTH].decode("utf-8", errors="ignore").encode("utf-8")
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    return b"%s %s %0*d %s\n" % (
+        (old_hash or NULL_HASH).encode("ascii"),
+        (new_hash or NULL_HASH).encode("ascii"),
+        TIME_WIDTH,
+        timestamp,
+        operation_bytes.ljust(OPERATION_WIDTH),
+    )
+
+
+def parse_record(record):
+    """
+    Decode a fixed-width line into a dictionary; null hashes become None.
+    """
+    old_hash = record[:40].decode("ascii")
+    new_hash = record[41:81].decode("ascii")
+    return {
+        "old": None if old_hash == NULL_HASH else old_hash,
+        "new": None if new_hash == NULL_HASH else new_hash,
+        "timestamp": int(record[82:82 + TIME_WIDTH]),
+        "operation": record[83 + TIME_WIDTH:RECORD_SIZE - 1].decode("utf-8", errors="replace").rstrip(),
+    }
+
+
+def _lock_path(reflog_path):
+    return reflog_path + LOCK_SUFFIX
+
+
+@contextlib.contextmanager
+def _locked(reflog_path):
+    """
+    Hold the lock of a reflog, waiting up to LOCK_TIMEOUT for it.
+    """
+    lock_path = _lock_path(reflog_path)
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Could not lock the reflog; remove {lock_path} if no other myscs process is running.")
+            time.sleep(0.05)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def append_entry(reflog_path, old_hash, new_hash, operation):
+    """
+    Append an entry under the reflog's lock. Compacts the file once it is
+    too big, still holding the lock, so no concurrent append can be lost.
+    """
+    os.makedirs(os.path.dirname(reflog_path), exist_ok=True)
+    record = format_record(old_hash, new_hash, operation)
+    with _locked(reflog_path):
+        fd = os.open(reflog_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > MAX_REFLOG_BYTES:
+            _rewrite(reflog_path, COMPACT_KEEP, None)
+
+
+def _complete_size(reflog_file):
+    # A torn final record (e.g. after a crash) is ignored
+    size = os.fstat(reflog_file.fileno()).st_size
+    return size - size % RECORD_SIZE
+
+
+def read_entries(reflog_path, max_count=None):
+    """
+    Return the newest `max_count` entries (all of them if None), newest first.
+    Only the tail of the file is read.
+    """
+    if not os.path.exists(reflog_path):
+        return []
+    with span("reflog.read"), open(reflog_path, "rb") as reflog_file:
+        size = _complete_size(reflog_file)
+        start = 0 if max_count is None else max(0, size - max_count * RECORD_SIZE)
+        reflog_file.seek(start)
+        data = reflog_file.read(size - start)
+    records = [data[offset:offset + RECORD_SIZE] for offset in range(0, len(data), RECORD_SIZE)]
+    return [parse_record(record) for record in reversed(records)]
+
+
+def compact(reflog_path, keep=COMPACT_KEEP, expire_before=None):
+    """
+    Rewrite a reflog with only its newest `keep` entries, dropping any older
+    than the `expire_before` timestamp. Returns the number of entries removed.
+    """
+    if not os.path.exists(reflog_path):
+        return 0
+    with _locked(reflog_path):
+        return _rewrite(reflog_path, keep, expire_before)
+
+
+def _rewrite(reflog_path, keep, expire_before):
+    # Callers hold the reflog's lock
+    with span("reflog.compact"), open(reflog_path, "rb") as reflog_file:
+        size = _complete_size(reflog_file)
+        total = size // RECORD_SIZE
+        start = max(0, total - keep) * RECORD_SIZE if keep is not None else 0
+        reflog_file.seek(start)
+        data = reflog_file.read(size - start)
+    records = [data[offset:offset + RECORD_SIZE] for offset in range(0, len(data), RECORD_SIZE)]
+    if expire_before is not None:
+        records = [record for record in records if parse_record(record)["timestamp"] >= expire_before]
+    if len(records) == total:
+        return 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(reflog_path), suffix=TMP_SUFFIX)
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(b"".join(records))
+    os.replace(tmp_path, reflog_path)
+    return total - len(records)
+
+
+def iter_reflog_files(myscs_dir):
+    """
+    Yield (ref name, path) for every reflog below a .myscs or worktree directory.
+    """
+    reflog_dir = os.path.join(myscs_dir, REFLOG_DIR)
+    for root, _, files in os.walk(reflog_dir):
+        for name in sorted(files):
+            if name.endswith((LOCK_SUFFIX, TMP_SUFFIX)):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, reflog_dir).replace(os.sep, "/"), path
+
+
+def iter_reflog_commits(myscs_dir):
+    """
+    Yield every commit hash mentioned in the reflogs below `myscs_dir`.
+    """
+    for _, path in iter_reflog_files(myscs_dir):
+        for entry in read_entries(path):
+            for commit_hash in (entry["old"], entry["new"]):
+                if commit_hash:
+                    yield commit_hash
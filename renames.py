@@ -0,0 +1,209 @@
+import os
+import struct
+import hashlib
+from collections import Counter, defaultdict
+from objects import object_path
+from tracing import span, count, BYTES_READ, OBJECTS_OPENED
+
+# A file counts as renamed or copied when at least this percentage of its
+# lines survive the move. Both values can be set in .myscs/config as
+# "rename_threshold" and "rename_limit".
+DEFAULT_RENAME_THRESHOLD = 50
+# The most candidate sources compared line by line for each added file
+DEFAULT_RENAME_LIMIT = 100
+
+# Each blob gets a MinHash signature over its distinct lines. Signatures are
+# cut into bands and files sharing any band become candidate pairs, so only
+# likely matches are ever compared instead of every deleted file against
+# every added one. Two rows per band finds pairs with a third of their lines
+# in common almost every time.
+SIGNATURE_SIZE = 48
+BAND_ROWS = 2
+# One SHAKE-128 digest per line provides all SIGNATURE_SIZE hash values
+_LINE_HASHES = struct.Struct(f"<{SIGNATURE_SIZE}I")
+
+
+class RenameDetector:
+    """
+    Pair deleted and added files of two snapshots that hold the same or
+    similar content. Exact blob matches are paired first; the rest are
+    matched through MinHash signatures. Blob signatures are kept for the
+    lifetime of the detector, since blobs never change.
+    """
+
+    def __init__(self, objects_dir, threshold=DEFAULT_RENAME_THRESHOLD, limit=DEFAULT_RENAME_LIMIT):
+        if not 0 <= threshold <= 100:
+            raise ValueError("The rename threshold must be a percentage between 0 and 100.")
+        if limit < 0:
+            raise ValueError("The rename limit cannot be negative.")
+        self.objects_dir = objects_dir
+        self.threshold = threshold
+        self.limit = limit
+        self._lines = {}
+        self._signatures = {}
+
+    # ------------------------------------------------------------------
+    # Blob sketches
+    # ------------------------------------------------------------------
+
+    def lines(self, blob_hash):
+        """
+        The lines of a blob as a Counter, or None for binary blobs.
+        """
+        if blob_hash not in self._lines:
+            blob_path = object_path(blob_hash, self.objects_dir)
+            try:
+                with open(blob_path, "rb") as blob_file:
+                    data = blob_file.read()
+            except OSError:
+                data = b"\0"
+            count(OBJECTS_OPENED)
+            count(BYTES_READ, len(data))
+            self._lines[blob_hash] = None if b"\0" in data else Counter(
+                line.rstrip() for line in data.splitlines() if line.strip()
+            )
+        return self._lines[blob_hash]
+
+    def signature(self, blob_hash):
+        """
+        The MinHash signature of a blob's distinct lines, or None when the
+        blob is binary or has no content to compare.
+        """
+        if blob_hash not in self._signatures:
+            lines = self.lines(blob_hash)
+            if not lines:
+                self._signatures[blob_hash] = None
+            else:
+                hashes = [_LINE_HASHES.unpack(hashlib.shake_128(line).digest(_LINE_HASHES.size)) for line in lines]
+                self._signatures[blob_hash] = tuple(map(min, zip(*hashes)))
+        return self._signatures[blob_hash]
+
+    def similarity(self, old_hash, new_hash):
+        """
+        The percentage of lines the two blobs have in common, relative to
+        the larger of the two.
+        """
+        if old_hash == new_hash:
+            return 100
+        old_lines, new_lines = self.lines(old_hash), self.lines(new_hash)
+        if not old_lines or not new_lines:
+            return 0
+        common = sum((old_lines & new_lines).values())
+        return common * 100 // max(sum(old_lines.values()), sum(new_lines.values()))
+
+    # ------------------------------------------------------------------
+    # Pairing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _exact(sources, targets, used, reuse):
+        """
+        Pair targets with sources holding the identical blob. A source with
+        the same file name is preferred.
+        """
+        by_hash = defaultdict(list)
+        for path in sorted(sources):
+            by_hash[sources[path]].append(path)
+        pairs = []
+        for path, blob_hash in sorted(targets.items()):
+            candidates = [source for source in by_hash.get(blob_hash, []) if reuse or source not in used]
+            if not candidates:
+                continue
+            name = os.path.basename(path)
+            source = next((c for c in candidates if os.path.basename(c) == name), candidates[0])
+            used.add(source)
+            pairs.append((source, path, 100))
+        return pairs
+
+    def _similar(self, sources, targets, used, reuse):
+        """
+        Pair targets with the most similar source above the threshold, using
+        signature bands to pick which sources are compared at all.
+        """
+        buckets = defaultdict(list)
+        with span("renames.sketch", files=len(sources) + len(targets)):
+            for path, blob_hash in sorted(sources.items()):
+                signature = self.signature(blob_hash)
+                if signature is None:
+                    continue
+                for band in range(0, SIGNATURE_SIZE, BAND_ROWS):
+                    buckets[(band, signature[band:band + BAND_ROWS])].append(path)
+            target_signatures = {path: self.signature(blob_hash) for path, blob_hash in targets.items()}
+
+        scored = []
+        with span("renames.compare"):
+            for path, signature in sorted(target_signatures.items()):
+                if signature is None:
+                    continue
+                agreement = Counter()
+                for band in range(0, SIGNATURE_SIZE, BAND_ROWS):
+                    agreement.update(buckets.get((band, signature[band:band + BAND_ROWS]), ()))
+                # Sources sharing the most bands are the most likely matches
+                for source, _ in agreement.most_common(self.limit):
+                    score = self.similarity(sources[source], targets[path])
+                    if score >= self.threshold:
+                        scored.append((score, source, path))
+
+        # Best pairs first; each target (and, for renames, each source) is used once
+        scored.sort(key=lambda pair: (-pair[0], pair[2], pair[1]))
+        pairs = []
+        paired = set()
+        for score, source, path in scored:
+            if path in paired or (not reuse and source in used):
+                continue
+            paired.add(path)
+            used.add(source)
+            pairs.append((source, path, score))
+        return pairs
+
+    def detect(self, old_files, new_files, copies=False):
+        """
+        Find renames (and copies, if asked) between two {path: blob hash}
+        snapshots. Returns a list of (status, old path, new path, similarity)
+        tuples, where status is "renamed" or "copied".
+        """
+        deleted = {path: blob for path, blob in old_files.items() if path not in new_files}
+        added = {path: blob for path, blob in new_files.items() if path not in old_files}
+        results = []
+        used = set()
+        with span("renames.detect", deleted=len(deleted), added=len(added)):
+            stages = [("renamed", deleted, False)]
+            if copies:
+                # Any file of the old snapshot may have been the source of a copy
+                stages.append(("copied", old_files, True))
+            matchers = (self._exact, self._similar) if self.limit else (self._exact,)
+            for status, sources, reuse in stages:
+                for match in matchers:
+                    if not sources or not added:
+                        break
+                    pairs = match(sources, added, used, reuse)
+                    results += [(status, source, path, score) for source, path, score in pairs]
+                    paired = {path for _, path, _ in pairs}
+                    added = {path: blob for path, blob in added.items() if path not in paired}
+        return sorted(results, key=lambda result: result[2])
+
+
+def diff_files(old_files, new_files, detector=None, copies=False):
+    """
+    Compare two {path: blob hash} snapshots. Returns a sorted list of
+    changes as dictionaries with "status" ("added", "deleted", "modified",
+    "renamed" or "copied"), "path", "old_path" and "similarity". Without a
+    detector, moved files show up as a deletion and an addition.
+    """
+    moves = detector.detect(old_files, new_files, copies) if detector else []
+    renamed_from = {source for status, source, _, _ in moves if status == "renamed"}
+    moved_to = {path for _, _, path, _ in moves}
+
+    changes = [
+        {"status": status, "path": path, "old_path": source, "similarity": score}
+        for status, source, path, score in moves
+    ]
+    for path, blob_hash in old_files.items():
+        if path not in new_files and path not in renamed_from:
+            changes.append({"status": "deleted", "path": path, "old_path": path, "similarity": None})
+        elif path in new_files and new_files[path] != blob_hash:
+            changes.append({"status": "modified", "path": path, "old_path": path, "similarity": None})
+    for path in new_files:
+        if path not in old_files and path not in moved_to:
+            changes.append({"status": "added", "path": path, "old_path": None, "similarity": None})
+    return sorted(changes, key=lambda change: (change["path"], change["status"]))
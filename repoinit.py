@@ -32,53 +32,8 @@ FUNCTION initialize_repo():
 """
 
 import os
-import json
 import logging
-import hashlib 
-
-# Configure logging
-logging.basicConfig(
-    filename="myscs.log",
-    level=logging.INFO,  # Log level (INFO, DEBUG, ERROR)
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
-"""  #Pseudo code for initialize index fn
-FUNCTION initialize_index():
-    # Step 1: Check if the .myscs/index file already exists
-    IF .myscs/index does not exist:
-        # Step 2: Create the .myscs/index file
-        CREATE an empty .myscs/index file
-        LOG "Index file created successfully."
-        PRINT "Index file created for staging."
-    ELSE:
-        PRINT "Index file already exists."
-"""
-
-def initialize_index():
-    """
-    The .myscs/index file serves as the staging area
-    in your custom version control system. 
-    It will store the paths and content hashes 
-    of files that have been staged, allowing you to track
-    what changes are ready for the next commit.
-    Initialize the .myscs/index file if it does not exist.
-    """
-    index_path = ".myscs/index"
-    
-    if not os.path.exists(index_path):
-        try:
-            # Create the index file
-            with open(index_path, 'w') as index_file:
-                pass  # Create an empty file
-            logging.info("Index file created successfully.")
-            print("Index file created for staging.")
-        except Exception as e:
-            logging.error(f"Error creating index file: {str(e)}")
-            print(f"Error creating index file. Details: {str(e)}")
-    else:
-        print("Index file already exists.")
-
+from repository import Repository
 
 
 def initialize_repo():
@@ -90,44 +45,19 @@ def initialize_repo():
     if os.path.exists(".myscs"):
         logging.warning("Repository already exists in the current directory.")
         print("There is already a repository in this directory.")
-        logging.shutdown()  # Ensure the log file is closed properly
         return
 
     try:
-        # Step 2: Create the main repository directory
-        os.makedirs(".myscs")
-        logging.info("Created main repository directory: .myscs")
-
-        # Step 3: Create subdirectories
-        os.makedirs(".myscs/objects")
-        os.makedirs(".myscs/refs/heads")
-        logging.info("Created subdirectories: objects, refs/heads")
-
-        # Step 4: Create essential files
-        with open(".myscs/HEAD", "w") as head_file:
-            head_file.write("ref: refs/heads/main\n")
-        logging.info("HEAD file created and initialized.")
-
-        config_data = {
-            "repository": "myscs",
-            "version": "1.0"
-        }
-
-        with open(".myscs/config", "w") as config_file:
-            json.dump(config_data, config_file, indent=4)
-        logging.info("Config file created with default settings.")
-
-        # Initialize the index file
-        initialize_index()
+        # Steps 2-4: Create .myscs with its subdirectories, HEAD, config and index
+        Repository.init(".")
+        logging.info("Created .myscs with objects, refs/heads, HEAD, config and index.")
 
         # Step 5: Provide user feedback
         print("Initialized empty repository in the current directory.")
         logging.info("Repository initialization completed successfully.")
-        logging.shutdown()  # Ensure the log file is closed properly
 
     except Exception as e:
         logging.error(f"Error during repository initialization: {str(e)}")
         print(f"Error: Unable to initialize repository. Details: {str(e)}")
-        logging.shutdown()  # Ensure the log file is closed properly
 if __name__ == "__main__":
     initialize_repo()
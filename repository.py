@@ -0,0 +1,1211 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+import logging
+from collections import OrderedDict
+from fnmatch import fnmatch
+from objects import (
+    commit_entries,
+    commit_files,
+    commit_object,
+    commit_parents,
+    hash_file,
+    is_object_hash,
+    list_worktree_dirs,
+    load_packed_refs,
+    note_new_objects,
+    object_path,
+    read_commit,
+    read_tree,
+    resolve_myscs_dir,
+    store_blob,
+    write_tree,
+    PACKED_REFS,
+    WORKTREE_POINTER,
+    WORKTREES_DIR,
+)
+from reflog import REFLOG_DIR, DEFAULT_EXPIRE_DAYS, LOCK_SUFFIX, TMP_SUFFIX, append_entry, compact, iter_reflog_files, read_entries
+from renames import DEFAULT_RENAME_LIMIT, DEFAULT_RENAME_THRESHOLD, RenameDetector, diff_files
+from sparse import SPARSE_FILE, ConePatterns, load_patterns
+from tracing import span, count, CACHE_HITS
+
+DEFAULT_BRANCH = "main"
+DEFAULT_AUTHOR = "Victor Maina"
+
+# Commit objects never change once written, so they can be cached for as long
+# as the Repository lives. The cache is bounded to keep memory flat.
+COMMIT_CACHE_SIZE = 4096
+
+# Checking that a branch is not checked out elsewhere and moving HEAD happen
+# under this lock in the main .myscs directory, so two worktrees can never
+# claim the same branch at once.
+WORKTREE_LOCK = "worktrees.lock"
+LOCK_TIMEOUT = 10.0
+
+# Writers of the index (per worktree) and of branch refs (shared) hold these,
+# so background maintenance never rewrites either under a foreground command.
+INDEX_LOCK = "index.lock"
+REFS_LOCK = "refs.lock"
+
+
+class RepositoryError(Exception):
+    """
+    Raised when a repository operation cannot be completed.
+    """
+
+
+class Repository:
+    """
+    A myscs repository opened at `path`.
+
+    `path` may also be a linked worktree. Its HEAD, index and sparse patterns
+    live in `myscs_dir` (.myscs/worktrees/<name> of the main repository),
+    while objects, refs and the config are shared through `common_dir`.
+
+    HEAD, the config, branch refs, the index and the ignore patterns are read
+    once and kept in memory. Before a cached file is used its size and
+    modification time are checked, and it is only re-read when another process
+    changed it. Writes made through this object update the cache directly.
+    """
+
+    def __init__(self, path="."):
+        self.root = os.path.abspath(path)
+        self.myscs_dir = resolve_myscs_dir(self.root)
+        if not os.path.isdir(self.myscs_dir):
+            raise RepositoryError(f"Not a myscs repository: {self.root}")
+        commondir_path = os.path.join(self.myscs_dir, "commondir")
+        if os.path.exists(commondir_path):
+            with open(commondir_path, "r") as commondir_file:
+                self.common_dir = os.path.normpath(os.path.join(self.myscs_dir, commondir_file.read().strip()))
+        else:
+            self.common_dir = self.myscs_dir
+        self.objects_dir = os.path.join(self.common_dir, "objects")
+        self.heads_dir = os.path.join(self.common_dir, "refs", "heads")
+        self.packed_refs_path = os.path.join(self.common_dir, PACKED_REFS)
+        self.config_path = os.path.join(self.common_dir, "config")
+        self.shallow_path = os.path.join(self.common_dir, "shallow")
+        self.worktrees_dir = os.path.join(self.common_dir, WORKTREES_DIR)
+        self.head_path = os.path.join(self.myscs_dir, "HEAD")
+        self.index_path = os.path.join(self.myscs_dir, "index")
+        self.sparse_path = os.path.join(self.myscs_dir, SPARSE_FILE)
+        self.ignore_path = os.path.join(self.root, ".myscsignore")
+        self._file_cache = {}
+        self._commit_cache = OrderedDict()
+
+    @classmethod
+    def init(cls, path="."):
+        """
+        Create a new, empty repository at `path` and open it.
+        """
+        myscs_dir = os.path.join(os.path.abspath(path), ".myscs")
+        if os.path.exists(myscs_dir):
+            raise RepositoryError(f"Repository already exists in {os.path.abspath(path)}.")
+        os.makedirs(os.path.join(myscs_dir, "objects"))
+        os.makedirs(os.path.join(myscs_dir, "refs", "heads"))
+        with open(os.path.join(myscs_dir, "HEAD"), "w") as head_file:
+            head_file.write(f"ref: refs/heads/{DEFAULT_BRANCH}\n")
+        with open(os.path.join(myscs_dir, "config"), "w") as config_file:
+            json.dump({"repository": "myscs", "version": "1.0"}, config_file, indent=4)
+        open(os.path.join(myscs_dir, "index"), "w").close()
+        return cls(path)
+
+    # ------------------------------------------------------------------
+    # Cached repository state
+    # ------------------------------------------------------------------
+
+    def _cached(self, path, loader, default=None):
+        """
+        Return the parsed contents of `path`, re-reading it only when its
+        size or modification time changed since it was last loaded.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._file_cache.pop(path, None)
+            return default
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self._file_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            count(CACHE_HITS)
+            return cached[1]
+        value = loader(path)
+        self._file_cache[path] = (signature, value)
+        return value
+
+    def _remember(self, path, value):
+        """
+        Record the value just written to `path` so the next read is a cache hit.
+        """
+        stat = os.stat(path)
+        self._file_cache[path] = ((stat.st_mtime_ns, stat.st_size, stat.st_ino), value)
+
+    def invalidate(self):
+        """
+        Drop every cached file, e.g. after changing the repository by other means
+        on a filesystem with coarse modification times.
+        """
+        self._file_cache.clear()
+
+    @staticmethod
+    def _load_head(path):
+        with open(path, "r") as head_file:
+            lines = head_file.read().split("\n")
+        branch = None
+        commit_hash = None
+        first = lines[0].strip() if lines else ""
+        if first.startswith("ref: refs/heads/"):
+            branch = first[len("ref: refs/heads/"):]
+        tokens = "\n".join(lines).split()
+        if tokens and is_object_hash(tokens[-1]):
+            commit_hash = tokens[-1]
+        return branch, commit_hash
+
+    @staticmethod
+    def _load_text(path):
+        with open(path, "r") as f:
+            return f.read().strip()
+
+    @staticmethod
+    def _load_json(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _load_index(path):
+        entries = OrderedDict()
+        with span("index.load"), open(path, "r") as index_file:
+            for line in index_file:
+                parts = line.split()
+                if len(parts) != 2:
+                    if parts:
+                        logging.warning(f"Skipping malformed index line: {line.strip()}")
+                    continue
+                entries[parts[0]] = parts[1]
+        return entries
+
+    @staticmethod
+    def _load_shallow(path):
+        with open(path, "r") as shallow_file:
+            return frozenset(line.strip() for line in shallow_file if line.strip())
+
+    @staticmethod
+    def _load_ignore(path):
+        patterns = []
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(line)
+        return patterns
+
+    @property
+    def head(self):
+        """
+        The (branch name, commit hash) pair recorded in HEAD.
+        """
+        return self._cached(self.head_path, self._load_head, (None, None))
+
+    @property
+    def head_branch(self):
+        return self.head[0]
+
+    @property
+    def head_commit(self):
+        return self.head[1]
+
+    @property
+    def detached(self):
+        """
+        True when HEAD holds a commit without a branch, e.g. during bisect.
+        """
+        return self.head_branch is None and self.head_commit is not None
+
+    @property
+    def config(self):
+        return self._cached(self.config_path, self._load_json, {})
+
+    def update_config(self, **values):
+        """
+        Set config values and write the config file.
+        """
+        config = dict(self.config)
+        config.update(values)
+        with open(self.config_path, "w") as config_file:
+            json.dump(config, config_file, indent=4)
+        self._remember(self.config_path, config)
+
+    @property
+    def shallow_commits(self):
+        """
+        Commits at the shallow boundary; their parents are not in this repository.
+        """
+        return self._cached(self.shallow_path, self._load_shallow, frozenset())
+
+    def write_shallow(self, commits):
+        """
+        Record the shallow boundary. An empty set makes the repository complete again.
+        """
+        if not commits:
+            if os.path.exists(self.shallow_path):
+                os.remove(self.shallow_path)
+            self._file_cache.pop(self.shallow_path, None)
+            return
+        with open(self.shallow_path, "w") as shallow_file:
+            for commit_hash in sorted(commits):
+                shallow_file.write(commit_hash + "\n")
+        self._remember(self.shallow_path, frozenset(commits))
+
+    @property
+    def index(self):
+        """
+        A copy of the staged entries as an ordered {path: blob hash} mapping.
+        In a sparse checkout, directories outside the cone appear as single
+        entries ending in "/" that map to a tree hash.
+        """
+        return OrderedDict(self._index_entries())
+
+    def _index_entries(self):
+        return self._cached(self.index_path, self._load_index, OrderedDict())
+
+    @property
+    def ignore_patterns(self):
+        return self._cached(self.ignore_path, self._load_ignore, [])
+
+    def is_ignored(self, relative_path):
+        return any(fnmatch(relative_path, pattern) for pattern in self.ignore_patterns)
+
+    @property
+    def sparse_patterns(self):
+        """
+        The cone patterns of a sparse checkout, or None when the checkout is full.
+        """
+        return self._cached(self.sparse_path, load_patterns, None)
+
+    def _ref_path(self, branch_name):
+        # Names ending like a reflog's lock or temporary file would be hidden among them
+        if (not branch_name or branch_name.startswith(("/", ".")) or ".." in branch_name.split("/")
+                or branch_name.endswith((LOCK_SUFFIX, TMP_SUFFIX))):
+            raise RepositoryError(f"Invalid branch name '{branch_name}'.")
+        return os.path.join(self.heads_dir, *branch_name.split("/"))
+
+    @property
+    def packed_refs(self):
+        return self._cached(self.packed_refs_path, load_packed_refs, {})
+
+    def branch_commit(self, branch_name):
+        """
+        The commit a branch points to, or None if the branch does not exist.
+        A loose ref in refs/heads overrides the packed one.
+        """
+        return self._cached(self._ref_path(branch_name), self._load_text) or self.packed_refs.get(branch_name)
+
+    def loose_refs(self):
+        """
+        The names of the branches stored as files in refs/heads.
+        """
+        names = []
+        for root, _, files in os.walk(self.heads_dir):
+            for name in files:
+                names.append(os.path.relpath(os.path.join(root, name), self.heads_dir).replace(os.sep, "/"))
+        return sorted(names)
+
+    def branches(self):
+        """
+        A {branch name: commit hash} mapping of every branch.
+        """
+        refs = dict(self.packed_refs)
+        for branch_name in self.loose_refs():
+            refs[branch_name] = self.branch_commit(branch_name)
+        return refs
+
+    def pack_refs(self):
+        """
+        Move every loose branch ref into packed-refs, so listing branches
+        reads one file. Ref writers hold the same lock, so no update can land
+        between reading a loose ref and removing it. Returns the number of
+        refs packed.
+        """
+        with self._refs_lock():
+            loose = self.loose_refs()
+            if not loose:
+                return 0
+            for branch_name in loose:
+                self._file_cache.pop(self._ref_path(branch_name), None)
+            refs = self.branches()
+            with span("refs.pack", refs=len(loose)):
+                fd, tmp_path = tempfile.mkstemp(dir=self.common_dir, prefix="tmp_")
+                with os.fdopen(fd, "w") as packed_file:
+                    for branch_name, commit_hash in sorted(refs.items()):
+                        packed_file.write(f"{commit_hash} refs/heads/{branch_name}\n")
+                os.replace(tmp_path, self.packed_refs_path)
+                self._remember(self.packed_refs_path, refs)
+                for branch_name in loose:
+                    ref_path = self._ref_path(branch_name)
+                    os.remove(ref_path)
+                    self._file_cache.pop(ref_path, None)
+                # Drop the directories left empty by refs such as feature/x
+                for root, dirs, files in os.walk(self.heads_dir, topdown=False):
+                    if root != self.heads_dir and not dirs and not files:
+                        os.rmdir(root)
+        return len(loose)
+
+    def read_commit(self, commit_hash):
+        """
+        Load a commit object, from the in-memory cache when possible.
+        """
+        cached = self._commit_cache.get(commit_hash)
+        if cached is not None:
+            self._commit_cache.move_to_end(commit_hash)
+            count(CACHE_HITS)
+            return cached
+        commit_data = read_commit(commit_hash, self.objects_dir)
+        if commit_data is not None:
+            self._commit_cache[commit_hash] = commit_data
+            if len(self._commit_cache) > COMMIT_CACHE_SIZE:
+                self._commit_cache.popitem(last=False)
+        return commit_data
+
+    def resolve(self, revision):
+        """
+        Turn "HEAD", a branch name or a (possibly abbreviated) commit hash into
+        a full commit hash.
+        """
+        if revision == "HEAD":
+            if not self.head_commit:
+                raise RepositoryError("HEAD does not point to a commit yet.")
+            return self.head_commit
+        try:
+            commit_hash = self.branch_commit(revision)
+        except RepositoryError:
+            commit_hash = None
+        if commit_hash:
+            return commit_hash
+        revision = revision.lower()
+        if 4 <= len(revision) <= 40 and all(c in "0123456789abcdef" for c in revision):
+            if len(revision) == 40:
+                matches = [revision] if self.read_commit(revision) is not None else []
+            else:
+                matches = [name for name in os.listdir(self.objects_dir)
+                           if name.startswith(revision) and self.read_commit(name) is not None]
+            if len(matches) == 1:
+                return matches[0]
+            if len(matches) > 1:
+                raise RepositoryError(f"Revision '{revision}' is ambiguous.")
+        raise RepositoryError(f"Unknown revision '{revision}'.")
+
+    # ------------------------------------------------------------------
+    # Writing state
+    # ------------------------------------------------------------------
+
+    def _write_head(self, branch_name, commit_hash, operation):
+        old_hash = self.head_commit
+        # Without a branch HEAD is just the commit ("detached")
+        content = f"ref: refs/heads/{branch_name}\n" if branch_name else ""
+        if commit_hash:
+            content += commit_hash
+        with open(self.head_path, "w") as head_file:
+            head_file.write(content)
+        self._remember(self.head_path, (branch_name, commit_hash))
+        self._append_reflog(self.reflog_path("HEAD"), old_hash, commit_hash, operation)
+
+    @staticmethod
+    def _append_reflog(reflog_path, old_hash, new_hash, operation):
+        try:
+            append_entry(reflog_path, old_hash, new_hash, operation)
+        except TimeoutError as e:
+            raise RepositoryError(str(e)) from e
+
+    def _index_lock(self):
+        return self._lock(os.path.join(self.myscs_dir, INDEX_LOCK), "the index")
+
+    def _refs_lock(self):
+        return self._lock(os.path.join(self.common_dir, REFS_LOCK), "refs")
+
+    def _write_ref(self, branch_name, commit_hash, operation):
+        ref_path = self._ref_path(branch_name)
+        with self._refs_lock():
+            old_hash = self.branch_commit(branch_name)
+            os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+            with open(ref_path, "w") as ref_file:
+                ref_file.write(commit_hash)
+            self._remember(ref_path, commit_hash)
+        if old_hash != commit_hash:
+            self._append_reflog(self.reflog_path(branch_name), old_hash, commit_hash, operation)
+
+    def update_ref(self, branch_name, commit_hash, operation="update"):
+        """
+        Point a branch at a commit that is already in the object store.
+        HEAD records its branch's commit too, so it is kept in step.
+        """
+        if self.read_commit(commit_hash) is None:
+            raise RepositoryError(f"Commit object {commit_hash} not found.")
+        self._write_ref(branch_name, commit_hash, operation)
+        if branch_name == self.head_branch:
+            self._write_head(branch_name, commit_hash, operation)
+
+    def _write_index(self, entries):
+        with self._index_lock():
+            self._replace_index(entries)
+
+    def _replace_index(self, entries):
+        # Readers see either the old or the new index, never a partial one
+        fd, tmp_path = tempfile.mkstemp(dir=self.myscs_dir, prefix="tmp_")
+        with os.fdopen(fd, "w") as index_file:
+            for path, blob_hash in entries.items():
+                index_file.write(f"{path} {blob_hash}\n")
+        os.replace(tmp_path, self.index_path)
+        self._remember(self.index_path, OrderedDict(entries))
+
+    def index_slack(self):
+        """
+        The bytes of the index taken by entries a later `add` superseded.
+        `add` only appends, so this grows until the index is compacted.
+        """
+        try:
+            size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            return 0
+        live = sum(len(path.encode("utf-8")) + len(blob_hash) + 2 for path, blob_hash in self._index_entries().items())
+        return max(0, size - live)
+
+    def compact_index(self):
+        """
+        Rewrite the index with one line per path. Returns the bytes saved.
+        """
+        with self._index_lock():
+            # Re-read under the lock so entries appended meanwhile are kept
+            self._file_cache.pop(self.index_path, None)
+            slack = self.index_slack()
+            if slack:
+                self._replace_index(self._index_entries())
+        return slack
+
+    def write_commit(self, message, files, parent_commit, merge_parent=None, author=None, timestamp=None):
+        """
+        Write a commit object for `files` and return its hash. Refs are not moved.
+        Entries ending in "/" are collapsed directories and are recorded as trees.
+        """
+        commit_hash, commit_data, data = commit_object(
+            message,
+            files,
+            parent_commit,
+            author or self.config.get("author", DEFAULT_AUTHOR),
+            timestamp if timestamp is not None else time.time(),
+            merge_parent,
+        )
+        with span("object.write"):
+            with open(object_path(commit_hash, self.objects_dir), "wb") as commit_file:
+                commit_file.write(data)
+        note_new_objects()
+        self._commit_cache[commit_hash] = commit_data
+        return commit_hash
+
+    def _advance_head(self, commit_hash, operation):
+        if self.detached:
+            # No branch to move; only HEAD records the new commit
+            self._write_head(None, commit_hash, operation)
+            return
+        branch_name = self.head_branch or DEFAULT_BRANCH
+        self._write_ref(branch_name, commit_hash, operation)
+        self._write_head(branch_name, commit_hash, operation)
+
+    # ------------------------------------------------------------------
+    # Reflogs
+    # ------------------------------------------------------------------
+
+    def reflog_path(self, ref):
+        """
+        The reflog file of "HEAD" (kept per worktree) or of a branch.
+        """
+        if ref == "HEAD":
+            return os.path.join(self.myscs_dir, REFLOG_DIR, "HEAD")
+        self._ref_path(ref)
+        return os.path.join(self.common_dir, REFLOG_DIR, "refs", "heads", *ref.split("/"))
+
+    def reflog(self, ref="HEAD", max_count=None):
+        """
+        The newest reflog entries of a ref, newest first, as dictionaries with
+        "old", "new", "timestamp" and "operation".
+        """
+        return read_entries(self.reflog_path(ref), max_count)
+
+    def expire_reflogs(self, days=DEFAULT_EXPIRE_DAYS):
+        """
+        Drop reflog entries older than `days` from every reflog of this
+        worktree and the shared branch reflogs. Returns the number removed.
+        """
+        expire_before = time.time() - days * 24 * 60 * 60
+        removed = 0
+        for reflog_dir in dict.fromkeys([self.common_dir, self.myscs_dir]):
+            for _, path in iter_reflog_files(reflog_dir):
+                try:
+                    removed += compact(path, keep=None, expire_before=expire_before)
+                except TimeoutError as e:
+                    raise RepositoryError(str(e)) from e
+        return removed
+
+    # ------------------------------------------------------------------
+    # Sparse index and working tree
+    # ------------------------------------------------------------------
+
+    def collapse_entries(self, entries, patterns):
+        """
+        Turn index-style entries into a sparse index for `patterns`: files in
+        the cone are kept, and everything else is folded into one tree entry
+        per outermost directory outside the cone. Existing tree entries that
+        already line up with the cone are kept without being read.
+        """
+        result = OrderedDict()
+        groups = {}
+        for path, object_hash in entries.items():
+            if path.endswith("/"):
+                continue
+            if patterns.contains(path):
+                result[path] = object_hash
+            else:
+                groups.setdefault(patterns.collapsed_directory(path), {})[path] = object_hash
+
+        for directory, tree_hash in entries.items():
+            if not directory.endswith("/"):
+                continue
+            if directory not in groups and patterns.is_collapsed(directory):
+                result[directory] = tree_hash
+                continue
+            for path, blob_hash in read_tree(tree_hash, self.objects_dir).items():
+                if patterns.contains(path):
+                    result[path] = blob_hash
+                else:
+                    groups.setdefault(patterns.collapsed_directory(path), {})[path] = blob_hash
+
+        for directory in sorted(groups):
+            result[directory] = write_tree(groups[directory], self.objects_dir)
+        return result
+
+    def expand_entries(self, entries):
+        """
+        Replace every collapsed directory entry with the files of its tree.
+        """
+        result = OrderedDict()
+        for path, object_hash in entries.items():
+            if path.endswith("/"):
+                result.update(read_tree(object_hash, self.objects_dir))
+            else:
+                result[path] = object_hash
+        return result
+
+    def entries_for_commit(self, commit_data, patterns=None):
+        """
+        The index entries that checking out a commit produces: its full file
+        list, or a sparse index when the checkout is sparse.
+        """
+        patterns = patterns if patterns is not None else self.sparse_patterns
+        if patterns is None:
+            return commit_files(commit_data, self.objects_dir)
+        return self.collapse_entries(commit_entries(commit_data), patterns)
+
+    def _checkout(self, new_entries):
+        """
+        Update the working tree from the current index to `new_entries` and
+        make them the index. Only files outside collapsed directories are
+        written or removed. Refuses, before changing anything, if a local
+        modification would be overwritten or lost, whether it is only in the
+        working tree or already staged.
+        """
+        old_entries = self._index_entries()
+        old_files = {p: h for p, h in old_entries.items() if not p.endswith("/")}
+        new_files = {p: h for p, h in new_entries.items() if not p.endswith("/")}
+        head_data = self.read_commit(self.head_commit) if self.head_commit else None
+        # Collapsed like the index, so only trees inside the cone are read
+        head_entries = self.entries_for_commit(head_data) if head_data else {}
+
+        conflicts = []
+        for path, old_hash in old_entries.items():
+            # Staged but not committed, and the new index would not keep it
+            if old_hash != head_entries.get(path) and not self._keeps_entry(new_entries, path, old_hash):
+                conflicts.append(path)
+        for path, blob_hash in new_files.items():
+            old_hash = old_files.get(path)
+            absolute_path = os.path.join(self.root, path)
+            if old_hash == blob_hash or not os.path.exists(absolute_path):
+                continue
+            if hash_file(absolute_path) not in (old_hash, blob_hash):
+                conflicts.append(path)
+        for path, old_hash in old_files.items():
+            absolute_path = os.path.join(self.root, path)
+            if path not in new_files and os.path.exists(absolute_path) and hash_file(absolute_path) != old_hash:
+                conflicts.append(path)
+        if conflicts:
+            raise RepositoryError(
+                "Your local changes to the following files would be overwritten: " + ", ".join(sorted(set(conflicts)))
+            )
+
+        with span("checkout"):
+            for path, blob_hash in new_files.items():
+                if old_files.get(path) == blob_hash:
+                    continue
+                absolute_path = os.path.join(self.root, path)
+                os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+                shutil.copyfile(object_path(blob_hash, self.objects_dir), absolute_path)
+            for path in old_files:
+                if path not in new_files:
+                    self._remove_working_file(path)
+        self._write_index(new_entries)
+
+    def _keeps_entry(self, entries, path, object_hash):
+        """
+        Whether `entries` still hold an index entry's content: unchanged, in
+        the tree of a collapsed directory (a file leaving the cone), or as the
+        files of an expanded directory (a directory entering it).
+        """
+        if path in entries:
+            return entries[path] == object_hash
+        if path.endswith("/"):
+            return all(entries.get(file_path) == blob_hash
+                       for file_path, blob_hash in read_tree(object_hash, self.objects_dir).items())
+        parts = path.split("/")[:-1]
+        for depth in range(1, len(parts) + 1):
+            directory = "/".join(parts[:depth]) + "/"
+            if directory in entries:
+                return read_tree(entries[directory], self.objects_dir).get(path) == object_hash
+        return False
+
+    def _remove_working_file(self, path):
+        absolute_path = os.path.join(self.root, path)
+        if os.path.exists(absolute_path):
+            os.remove(absolute_path)
+        directory = os.path.dirname(absolute_path)
+        while directory != self.root and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+    def set_sparse(self, directories):
+        """
+        Restrict the checkout to `directories` (cone mode). Files leaving the
+        cone are removed from the working tree and collapsed in the index;
+        files entering it are written out.
+        """
+        patterns = ConePatterns(directories)
+        self._checkout(self.collapse_entries(self._index_entries(), patterns))
+        os.makedirs(os.path.dirname(self.sparse_path), exist_ok=True)
+        with open(self.sparse_path, "w") as sparse_file:
+            for directory in patterns.directories:
+                sparse_file.write(directory + "\n")
+        self._remember(self.sparse_path, patterns)
+        return patterns
+
+    def disable_sparse(self):
+        """
+        Go back to a full checkout: expand the index and write every file.
+        """
+        if self.sparse_patterns is None:
+            return
+        self._checkout(self.expand_entries(self._index_entries()))
+        os.remove(self.sparse_path)
+        self._file_cache.pop(self.sparse_path, None)
+
+    def status(self):
+        """
+        Compare HEAD, the index and the working tree. Only the sparse cone is
+        examined. Returns a dictionary of sorted path lists: "staged" (index
+        differs from HEAD), "modified", "deleted" and "untracked".
+        """
+        patterns = self.sparse_patterns
+        entries = self._index_entries()
+        head_commit = self.head_commit
+        head_data = self.read_commit(head_commit) if head_commit else None
+        head_entries = self.entries_for_commit(head_data, patterns) if head_data else {}
+        staged = [path for path in set(entries) | set(head_entries) if entries.get(path) != head_entries.get(path)]
+
+        tracked = {p: h for p, h in entries.items() if not p.endswith("/")}
+        modified = []
+        deleted = []
+        for path, blob_hash in tracked.items():
+            absolute_path = os.path.join(self.root, path)
+            if not os.path.exists(absolute_path):
+                deleted.append(path)
+            elif hash_file(absolute_path) != blob_hash:
+                modified.append(path)
+        untracked = [path for path in self.walk_working_tree(patterns=patterns) if path not in tracked]
+        return {
+            "staged": sorted(staged),
+            "modified": sorted(modified),
+            "deleted": sorted(deleted),
+            "untracked": sorted(untracked),
+        }
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+
+    def _relative_path(self, file_path):
+        absolute_path = file_path if os.path.isabs(file_path) else os.path.join(self.root, file_path)
+        return os.path.relpath(absolute_path, self.root).replace(os.sep, "/")
+
+    def walk_working_tree(self, start="", patterns=None):
+        """
+        Yield the relative paths of the non-ignored files below `start`.
+        With cone patterns, directories outside the cone are not entered at all.
+        Other repositories and worktrees nested in the tree are not entered
+        either: any directory holding a .myscs file or directory, and every
+        registered worktree of this repository.
+        """
+        top = os.path.join(self.root, start)
+        own_root = os.path.realpath(self.root)
+        nested = {os.path.realpath(worktree["path"]) for worktree in self.worktrees() if worktree["path"]} - {own_root}
+        for dirpath, dirnames, filenames in os.walk(top):
+            relative_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            prefix = "" if relative_dir == "." else relative_dir + "/"
+            kept = []
+            for name in sorted(dirnames):
+                relative_path = prefix + name
+                if name == ".myscs" or self.is_ignored(relative_path):
+                    continue
+                if patterns is not None and not patterns.includes_directory(relative_path):
+                    continue
+                directory = os.path.join(dirpath, name)
+                if os.path.lexists(os.path.join(directory, ".myscs")):
+                    continue
+                if nested and os.path.realpath(directory) in nested:
+                    continue
+                kept.append(name)
+            dirnames[:] = kept
+            for name in sorted(filenames):
+                relative_path = prefix + name
+                # The pointer file of a linked worktree
+                if relative_path == ".myscs" or self.is_ignored(relative_path):
+                    continue
+                if patterns is not None and not patterns.contains(relative_path):
+                    continue
+                yield relative_path
+
+    def add(self, file_path):
+        """
+        Stage a file, or every non-ignored file below a directory ("." for the
+        whole working tree). In a sparse checkout only the cone is walked.
+        Returns a list of (path, status, blob hash) tuples where status is one
+        of "staged", "unchanged", "ignored", "outside-sparse" or "missing".
+        """
+        patterns = self.sparse_patterns
+        relative_path = self._relative_path(file_path)
+        if os.path.isdir(os.path.join(self.root, relative_path)):
+            paths = self.walk_working_tree("" if relative_path == "." else relative_path, patterns)
+        else:
+            paths = [relative_path]
+
+        results = []
+        entries = self._index_entries()
+        new_lines = []
+        for relative_path in paths:
+            if self.is_ignored(relative_path):
+                results.append((relative_path, "ignored", None))
+                continue
+            if patterns is not None and not patterns.contains(relative_path):
+                results.append((relative_path, "outside-sparse", None))
+                continue
+            absolute_path = os.path.join(self.root, relative_path)
+            if not os.path.isfile(absolute_path):
+                results.append((relative_path, "missing", None))
+                continue
+            blob_hash = store_blob(absolute_path, self.objects_dir)
+            if entries.get(relative_path) == blob_hash:
+                results.append((relative_path, "unchanged", blob_hash))
+                continue
+            new_lines.append((relative_path, blob_hash))
+            results.append((relative_path, "staged", blob_hash))
+
+        if new_lines:
+            with self._index_lock():
+                entries = OrderedDict(self._index_entries())
+                with open(self.index_path, "a") as index_file:
+                    for relative_path, blob_hash in new_lines:
+                        index_file.write(f"{relative_path} {blob_hash}\n")
+                        entries[relative_path] = blob_hash
+                self._remember(self.index_path, entries)
+        return results
+
+    def has_staged_changes(self):
+        """
+        Whether the index differs from the files of the current commit.
+        """
+        entries = self._index_entries()
+        if not entries:
+            return False
+        head_commit = self.head_commit
+        if not head_commit:
+            return True
+        commit_data = self.read_commit(head_commit)
+        return commit_data is None or self.entries_for_commit(commit_data) != dict(entries)
+
+    def commit(self, message, author=None):
+        """
+        Commit the staged files on the current branch and return the new commit hash.
+        """
+        entries = self._index_entries()
+        if not entries:
+            raise RepositoryError("No files staged for commit.")
+        commit_hash = self.write_commit(message, entries, self.head_commit, author=author)
+        self._advance_head(commit_hash, f"commit: {message}")
+        logging.info(f"Commit completed successfully. Commit hash: {commit_hash}")
+        return commit_hash
+
+    def log(self, start=None, max_count=None):
+        """
+        Follow first parents from `start` (HEAD by default) and return the
+        commits latest first, each as a dictionary with its hash. The walk
+        stops at the shallow boundary of a depth-limited clone.
+        """
+        commit_hash = start if start is not None else self.head_commit
+        shallow = self.shallow_commits
+        history = []
+        with span("history.walk"):
+            while commit_hash and (max_count is None or len(history) < max_count):
+                commit_data = self.read_commit(commit_hash)
+                if commit_data is None:
+                    break
+                history.append({
+                    "commit_hash": commit_hash,
+                    "commit_message": commit_data.get("commit_message", ""),
+                    "timestamp": commit_data.get("timestamp", ""),
+                    "author": commit_data.get("author", "Unknown"),
+                    "parent_commit": commit_data.get("parent_commit"),
+                })
+                if commit_hash in shallow:
+                    break
+                commit_hash = commit_data.get("parent_commit")
+        return history
+
+    def branch(self, branch_name, start=None):
+        """
+        Create a branch pointing at the current commit, or at `start` (any
+        revision, e.g. a commit found in the reflog), and return that commit.
+        """
+        if self.branch_commit(branch_name):
+            raise RepositoryError(f"Branch '{branch_name}' already exists.")
+        commit_hash = self.resolve(start) if start else self.head_commit
+        if not commit_hash:
+            raise RepositoryError(f"Cannot create branch '{branch_name}' - No commit history found.")
+        self._write_ref(branch_name, commit_hash, f"branch: created from {start or self.head_branch or commit_hash}")
+        return commit_hash
+
+    def switch(self, branch_name):
+        """
+        Check out an existing branch: update the working tree and index to its
+        commit (only the cone in a sparse checkout), point HEAD at it and
+        return the commit hash.
+        """
+        commit_hash = self.branch_commit(branch_name)
+        if not commit_hash:
+            raise RepositoryError(f"Branch '{branch_name}' does not exist.")
+        commit_data = self.read_commit(commit_hash)
+        if commit_data is None:
+            raise RepositoryError(f"Commit object {commit_hash} not found.")
+        with self._worktree_lock():
+            self._check_branch_free(branch_name, self.root)
+            self._checkout(self.entries_for_commit(commit_data))
+            self._write_head(branch_name, commit_hash, f"switch: moving from {self.head_branch or self.head_commit} to {branch_name}")
+        return commit_hash
+
+    def detach(self, revision, operation=None):
+        """
+        Check out a commit without a branch ("detached HEAD") and return its
+        hash. Commits made while detached move only HEAD.
+        """
+        commit_hash = self.resolve(revision)
+        commit_data = self.read_commit(commit_hash)
+        with self._worktree_lock():
+            self._checkout(self.entries_for_commit(commit_data))
+            self._write_head(None, commit_hash, operation or f"checkout: moving to {commit_hash}")
+        return commit_hash
+
+    def ancestors(self, commit_hash):
+        """
+        The set of commits reachable from `commit_hash`, following every parent
+        up to the shallow boundary.
+        """
+        shallow = self.shallow_commits
+        seen = set()
+        stack = [commit_hash] if commit_hash else []
+        with span("history.walk"):
+            while stack:
+                current = stack.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                commit_data = self.read_commit(current)
+                if commit_data is not None and current not in shallow:
+                    stack.extend(commit_parents(commit_data))
+        return seen
+
+    def merge_base(self, first, second):
+        """
+        The nearest commit reachable from both `first` and `second`, or None.
+        Commits beyond the shallow boundary are not considered.
+        """
+        shallow = self.shallow_commits
+        first_ancestors = self.ancestors(first)
+        queue = [second]
+        seen = set()
+        while queue:
+            next_queue = []
+            for commit_hash in queue:
+                if commit_hash in first_ancestors:
+                    return commit_hash
+                if commit_hash in seen:
+                    continue
+                seen.add(commit_hash)
+                commit_data = self.read_commit(commit_hash)
+                if commit_data is not None and commit_hash not in shallow:
+                    next_queue.extend(commit_parents(commit_data))
+            queue = next_queue
+        return None
+
+    def rename_detector(self, threshold=None, limit=None):
+        """
+        A RenameDetector using the given threshold and candidate limit, or the
+        "rename_threshold" and "rename_limit" config values when not given.
+        """
+        try:
+            threshold = int(threshold if threshold is not None else self.config.get("rename_threshold", DEFAULT_RENAME_THRESHOLD))
+            limit = int(limit if limit is not None else self.config.get("rename_limit", DEFAULT_RENAME_LIMIT))
+            return RenameDetector(self.objects_dir, threshold, limit)
+        except ValueError as e:
+            raise RepositoryError(f"Invalid rename detection setting: {e}") from e
+
+    def diff(self, first_branch, second_branch, find_renames=True, find_copies=False, threshold=None, limit=None):
+        """
+        Compare two branches. Returns a dictionary with the hashes of the
+        common commits, the commits unique to each branch and, under
+        "changes", the file changes from the first branch's tip to the
+        second's (see renames.diff_files). Moved files are reported as
+        renames unless `find_renames` is False.
+        """
+        first_commit = self.branch_commit(first_branch)
+        second_commit = self.branch_commit(second_branch)
+        if not first_commit or not second_commit:
+            raise RepositoryError("One or both branches do not exist.")
+        detector = self.rename_detector(threshold, limit) if find_renames or find_copies else None
+        with span("diff.files"):
+            changes = diff_files(
+                commit_files(self.read_commit(first_commit), self.objects_dir),
+                commit_files(self.read_commit(second_commit), self.objects_dir),
+                detector,
+                find_copies,
+            )
+        first_history = self.log(first_commit)
+        second_history = self.log(second_commit)
+        first_hashes = {commit["commit_hash"] for commit in first_history}
+        second_hashes = {commit["commit_hash"] for commit in second_history}
+        common = first_hashes & second_hashes
+        return {
+            "common": [commit for commit in first_history if commit["commit_hash"] in common],
+            "only_first": [commit for commit in first_history if commit["commit_hash"] not in common],
+            "only_second": [commit for commit in second_history if commit["commit_hash"] not in common],
+            "changes": changes,
+        }
+
+    def merge(self, branch_name):
+        """
+        Merge another branch into the current one.
+
+        Fast-forwards when possible; otherwise does a three-way merge of the
+        file lists against the merge base and records a merge commit. Files
+        renamed on one side are matched with their old path on the other, so
+        an edit on one side and a rename on the other merge cleanly. Returns a
+        dictionary with "status" ("up-to-date", "fast-forward", "merged" or
+        "conflict"), "commit" and "conflicts".
+        """
+        current_branch, ours = self.head
+        if branch_name == current_branch:
+            raise RepositoryError("You are already on the target branch.")
+        theirs = self.branch_commit(branch_name)
+        if not theirs:
+            raise RepositoryError(f"Branch '{branch_name}' does not exist.")
+
+        if ours == theirs or (ours and theirs in self.ancestors(ours)):
+            return {"status": "up-to-date", "commit": ours, "conflicts": []}
+
+        theirs_data = self.read_commit(theirs)
+        if theirs_data is None:
+            raise RepositoryError(f"Commit object {theirs} not found.")
+        if not ours or ours in self.ancestors(theirs):
+            self._checkout(self.entries_for_commit(theirs_data))
+            self._advance_head(theirs, f"merge {branch_name}: fast-forward")
+            return {"status": "fast-forward", "commit": theirs, "conflicts": []}
+
+        base = self.merge_base(ours, theirs)
+        base_files = commit_files(self.read_commit(base), self.objects_dir) if base else {}
+        our_files = commit_files(self.read_commit(ours), self.objects_dir)
+        their_files = commit_files(theirs_data, self.objects_dir)
+
+        # A file one side moved follows the move, so edits the other side
+        # made at the old path are not lost
+        detector = self.rename_detector()
+        with span("merge.renames"):
+            our_moves = {old: new for _, old, new, _ in detector.detect(base_files, our_files)}
+            their_moves = {old: new for _, old, new, _ in detector.detect(base_files, their_files)}
+
+        merged = OrderedDict()
+        conflicts = []
+        seen_ours, seen_theirs = set(), set()
+
+        def place(path, our_hash, their_hash, base_hash):
+            if our_hash == their_hash or their_hash == base_hash:
+                result = our_hash
+            elif our_hash == base_hash:
+                result = their_hash
+            else:
+                conflicts.append(path)
+                return
+            if result is None:
+                return
+            if merged.get(path, result) != result:
+                conflicts.append(path)
+            merged[path] = result
+
+        for path, base_hash in base_files.items():
+            our_path, their_path = our_moves.get(path, path), their_moves.get(path, path)
+            seen_ours.add(our_path)
+            seen_theirs.add(their_path)
+            if path in our_moves and path in their_moves and our_path != their_path:
+                # Moved to different places on each side
+                conflicts.append(path)
+                continue
+            target = our_path if path in our_moves else their_path
+            place(target, our_files.get(our_path), their_files.get(their_path), base_hash)
+
+        for path in list(our_files) + [p for p in their_files if p not in our_files]:
+            our_hash = our_files.get(path) if path not in seen_ours else None
+            their_hash = their_files.get(path) if path not in seen_theirs else None
+            if our_hash is not None or their_hash is not None:
+                place(path, our_hash, their_hash, None)
+        merged = OrderedDict(sorted(merged.items()))
+
+        if conflicts:
+            return {"status": "conflict", "commit": None, "conflicts": sorted(set(conflicts))}
+
+        patterns = self.sparse_patterns
+        if patterns is not None:
+            merged = self.collapse_entries(merged, patterns)
+        message = f"Merge branch '{branch_name}' into {'HEAD' if self.detached else current_branch or DEFAULT_BRANCH}"
+        commit_hash = self.write_commit(message, merged, ours, merge_parent=theirs)
+        self._checkout(merged)
+        self._advance_head(commit_hash, f"merge {branch_name}")
+        return {"status": "merged", "commit": commit_hash, "conflicts": []}
+
+    # ------------------------------------------------------------------
+    # Linked worktrees
+    # ------------------------------------------------------------------
+
+    def _worktree_lock(self):
+        """
+        Hold the lock that serializes branch checkouts across worktrees.
+        """
+        return self._lock(os.path.join(self.common_dir, WORKTREE_LOCK), "worktrees")
+
+    @contextlib.contextmanager
+    def _lock(self, lock_path, what):
+        """
+        Hold an exclusive lock file, waiting up to LOCK_TIMEOUT for it.
+        """
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise RepositoryError(f"Could not lock {what}; remove {lock_path} if no other myscs process is running.")
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode("utf-8"))
+            os.close(fd)
+            yield
+        finally:
+            os.remove(lock_path)
+
+    def worktrees(self):
+        """
+        List every worktree of the repository, the main one first, as
+        dictionaries with "path", "branch", "commit" and "name" (None for the
+        main worktree).
+        """
+        result = []
+        for worktree_dir in list_worktree_dirs(self.common_dir):
+            branch_name, commit_hash = self._cached(os.path.join(worktree_dir, "HEAD"), self._load_head, (None, None))
+            if worktree_dir == self.common_dir:
+                name, path = None, os.path.dirname(self.common_dir)
+            else:
+                name = os.path.basename(worktree_dir)
+                path = self._cached(os.path.join(worktree_dir, "worktree"), self._load_text)
+            result.append({"path": path, "branch": branch_name, "commit": commit_hash, "name": name})
+        return result
+
+    def _check_branch_free(self, branch_name, root):
+        """
+        Fail if a worktree other than the one at `root` has the branch checked out.
+        """
+        for worktree in self.worktrees():
+            if worktree["branch"] == branch_name and os.path.realpath(worktree["path"]) != os.path.realpath(root):
+                raise RepositoryError(f"Branch '{branch_name}' is already checked out in {worktree['path']}.")
+
+    def add_worktree(self, path, branch_name):
+        """
+        Check out an existing branch into a new directory that shares this
+        repository's objects and refs but has its own HEAD and index.
+        Returns the Repository of the new worktree.
+        """
+        commit_hash = self.branch_commit(branch_name)
+        if not commit_hash:
+            raise RepositoryError(f"Branch '{branch_name}' does not exist.")
+        path = os.path.abspath(path)
+        if os.path.exists(path) and os.listdir(path):
+            raise RepositoryError(f"{path} already exists and is not empty.")
+
+        with self._worktree_lock():
+            self._check_branch_free(branch_name, path)
+            base_name = os.path.basename(path.rstrip(os.sep)) or "worktree"
+            name, suffix = base_name, 1
+            while os.path.exists(os.path.join(self.worktrees_dir, name)):
+                suffix += 1
+                name = f"{base_name}{suffix}"
+            worktree_dir = os.path.join(self.worktrees_dir, name)
+            os.makedirs(worktree_dir)
+            with open(os.path.join(worktree_dir, "commondir"), "w") as commondir_file:
+                commondir_file.write(os.path.relpath(self.common_dir, worktree_dir))
+            with open(os.path.join(worktree_dir, "worktree"), "w") as worktree_file:
+                worktree_file.write(path)
+            with open(os.path.join(worktree_dir, "HEAD"), "w") as head_file:
+                head_file.write(f"ref: refs/heads/{branch_name}\n{commit_hash}")
+            open(os.path.join(worktree_dir, "index"), "w").close()
+            self._append_reflog(os.path.join(worktree_dir, REFLOG_DIR, "HEAD"), None, commit_hash,
+                                f"worktree: checked out {branch_name}")
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, ".myscs"), "w") as pointer_file:
+                pointer_file.write(WORKTREE_POINTER + worktree_dir + "\n")
+
+        worktree = Repository(path)
+        worktree._checkout(worktree.entries_for_commit(worktree.read_commit(commit_hash)))
+        return worktree
+
+    def remove_worktree(self, path, force=False):
+        """
+        Delete a linked worktree and its HEAD and index. Worktrees with staged
+        or modified files are kept unless `force` is set.
+        """
+        path = os.path.realpath(path)
+        for worktree in self.worktrees():
+            if worktree["name"] is not None and os.path.realpath(worktree["path"]) == path:
+                break
+        else:
+            raise RepositoryError(f"{path} is not a linked worktree of this repository.")
+        if os.path.isdir(path) and not force:
+            changes = Repository(path).status()
+            if changes["staged"] or changes["modified"]:
+                raise RepositoryError(f"{path} has uncommitted changes; use --force to remove it anyway.")
+        with self._worktree_lock():
+            shutil.rmtree(path, ignore_errors=True)
+            shutil.rmtree(os.path.join(self.worktrees_dir, worktree["name"]))
+
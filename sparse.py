@@ -0,0 +1,81 @@
+import os
+
+# The sparse checkout patterns: one directory per line, relative to the
+# repository root. The checkout is sparse only while this file exists.
+SPARSE_FILE = os.path.join("info", "sparse-checkout")
+
+
+def normalize_directory(directory):
+    """
+    Turn a user-supplied directory into the form stored in the patterns file.
+    """
+    directory = directory.replace(os.sep, "/").strip("/")
+    while directory.startswith("./"):
+        directory = directory[2:]
+    if not directory or directory == "." or ".." in directory.split("/"):
+        raise ValueError(f"Invalid sparse checkout directory '{directory}'.")
+    return directory
+
+
+class ConePatterns:
+    """
+    Cone-mode sparse patterns, as in git's sparse-checkout cone mode.
+
+    A path is in the cone when it is a top-level file, lies anywhere below one
+    of the listed directories, or is a file directly inside one of their parent
+    directories. Everything else is collapsed into one index entry per
+    outermost directory outside the cone.
+    """
+
+    def __init__(self, directories):
+        self.directories = sorted({normalize_directory(d) for d in directories})
+        # Parent directories of the listed ones; their direct files are in the cone
+        self.parents = {""}
+        for directory in self.directories:
+            parts = directory.split("/")
+            for i in range(1, len(parts)):
+                self.parents.add("/".join(parts[:i]))
+
+    def _below_listed(self, path):
+        return any(path == d or path.startswith(d + "/") for d in self.directories)
+
+    def contains(self, path):
+        """
+        Whether a file path is inside the cone.
+        """
+        return self._below_listed(path) or path.rpartition("/")[0] in self.parents
+
+    def includes_directory(self, directory):
+        """
+        Whether a directory has to be walked, i.e. it may hold files in the cone.
+        """
+        return directory in self.parents or self._below_listed(directory)
+
+    def is_collapsed(self, directory):
+        """
+        Whether a directory (with or without a trailing "/") is an outermost
+        directory outside the cone, i.e. one that gets a single index entry.
+        """
+        directory = directory.rstrip("/")
+        parent = directory.rpartition("/")[0]
+        return not self.includes_directory(directory) and (not parent or self.includes_directory(parent))
+
+    def collapsed_directory(self, path):
+        """
+        The outermost directory outside the cone that holds `path`, with a
+        trailing "/". Only meaningful for paths that are not in the cone.
+        """
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            prefix = "/".join(parts[:i])
+            if not self.includes_directory(prefix):
+                return prefix + "/"
+        return path
+
+
+def load_patterns(sparse_path):
+    """
+    Load cone patterns from a sparse-checkout file.
+    """
+    with open(sparse_path, "r") as sparse_file:
+        return ConePatterns(line.strip() for line in sparse_file if line.strip() and not line.startswith("#"))
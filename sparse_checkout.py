@@ -0,0 +1,35 @@
+import logging
+from rich.console import Console
+from repository import Repository, RepositoryError
+
+# Initialize Rich console for output
+console = Console()
+
+def sparse_checkout(action, directories=None, repo=None):
+    """
+    Manage the sparse checkout: 'set' the cone directories, 'list' them or
+    'disable' sparse checkout and restore the full working tree.
+    """
+    try:
+        repo = repo or Repository(".")
+        if action == "set":
+            if not directories:
+                console.print("[bold red]Error: 'sparse-checkout set' needs at least one directory.[/bold red]")
+                return
+            patterns = repo.set_sparse(directories)
+            console.print(f"[bold green]Sparse checkout set to:[/bold green] {', '.join(patterns.directories)}")
+            logging.info(f"Sparse checkout set to {patterns.directories}.")
+        elif action == "list":
+            patterns = repo.sparse_patterns
+            if patterns is None:
+                console.print("[bold yellow]Sparse checkout is not enabled.[/bold yellow]")
+                return
+            for directory in patterns.directories:
+                console.print(f"[cyan]{directory}[/cyan]")
+        elif action == "disable":
+            repo.disable_sparse()
+            console.print("[bold green]Sparse checkout disabled; full working tree restored.[/bold green]")
+            logging.info("Sparse checkout disabled.")
+    except (RepositoryError, ValueError) as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.warning(f"sparse-checkout {action} failed: {e}")
@@ -0,0 +1,41 @@
+from rich.console import Console
+from repository import Repository, RepositoryError
+from tracing import span
+
+# Initialize Rich console for output
+console = Console()
+
+def show_status(repo=None):
+    """
+    Show staged changes, modified, deleted and untracked files.
+    In a sparse checkout only the paths inside the cone are examined.
+    """
+    try:
+        repo = repo or Repository(".")
+        status = repo.status()
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        return
+
+    if repo.detached:
+        console.print(f"[bold yellow]HEAD detached at {repo.head_commit[:7]}[/bold yellow]")
+    else:
+        console.print(f"[bold green]On branch {repo.head_branch}[/bold green]")
+    if repo.sparse_patterns is not None:
+        console.print(f"[dim]Sparse checkout: {', '.join(repo.sparse_patterns.directories)}[/dim]")
+
+    sections = [
+        ("staged", "Changes to be committed", "green"),
+        ("modified", "Modified but not staged", "red"),
+        ("deleted", "Deleted", "red"),
+        ("untracked", "Untracked files", "yellow"),
+    ]
+    with span("render"):
+        if not any(status[key] for key, _, _ in sections):
+            console.print("Nothing to commit, working tree clean.")
+            return
+        for key, title, style in sections:
+            if status[key]:
+                console.print(f"[bold]{title}:[/bold]")
+                for path in status[key]:
+                    console.print(f"    [{style}]{path}[/{style}]")
@@ -0,0 +1,57 @@
+import unittest
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from archive import write_archive
+from repository import Repository, RepositoryError
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with two commits."""
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.repo_dir)
+        os.makedirs(os.path.join(self.repo_dir, "src"))
+        self.write("README.md", "first")
+        self.write("src/app.py", "print('hi')")
+        self.repo.add(".")
+        self.first = self.repo.commit("First")
+        self.write("README.md", "second")
+        self.repo.add(".")
+        self.repo.commit("Second")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.repo_dir)
+
+    def write(self, path, content):
+        with open(os.path.join(self.repo_dir, path), "w") as f:
+            f.write(content)
+
+    def test_tar_of_older_commit(self):
+        """An abbreviated hash exports that commit's files, not the working tree."""
+        output = io.BytesIO()
+        self.assertEqual(write_archive(self.repo, self.first[:8], output, "tar.gz", prefix="release"), self.first)
+        with tarfile.open(fileobj=io.BytesIO(output.getvalue()), mode="r:gz") as tar:
+            self.assertEqual(sorted(tar.getnames()), ["release/README.md", "release/src/app.py"])
+            self.assertEqual(tar.extractfile("release/README.md").read(), b"first")
+
+    def test_zip_of_branch(self):
+        """A branch name exports its tip as a zip archive."""
+        output = io.BytesIO()
+        write_archive(self.repo, "main", output, "zip")
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as archive:
+            self.assertEqual(archive.read("README.md"), b"second")
+            self.assertEqual(archive.read("src/app.py"), b"print('hi')")
+
+    def test_unknown_revision(self):
+        """Unknown revisions raise an error."""
+        with self.assertRaises(RepositoryError):
+            write_archive(self.repo, "no-such-branch", io.BytesIO())
+
+
+if __name__ == "__main__":
+    unittest.main()
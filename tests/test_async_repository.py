@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+import os
+import shutil
+import tempfile
+from repository import Repository, RepositoryError
+from async_repository import AsyncRepositories
+
+
+class TestAsyncRepositories(unittest.TestCase):
+    def setUp(self):
+        """Create several small repositories with uncommitted files."""
+        self.base_dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.base_dir, f"repo{i}")
+            os.makedirs(path)
+            Repository.init(path)
+            with open(os.path.join(path, "file.txt"), "w") as f:
+                f.write(f"content {i}")
+            self.paths.append(path)
+
+    def tearDown(self):
+        """Remove the temporary repositories."""
+        shutil.rmtree(self.base_dir)
+
+    def test_commit_many(self):
+        """Pending changes are committed in every repository; unchanged ones are skipped."""
+        missing = os.path.join(self.base_dir, "not-a-repo")
+
+        async def scenario():
+            async with AsyncRepositories(max_workers=4) as repos:
+                first = await repos.commit_many(self.paths + [missing], "Batch commit", concurrency=3)
+                second = await repos.commit_many(self.paths, "Nothing changed", concurrency=3)
+                return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual([r["path"] for r in first], self.paths + [missing])
+        for result, path in zip(first, self.paths):
+            self.assertIsNone(result["error"])
+            self.assertEqual(Repository(path).head_commit, result["commit"])
+        self.assertIsInstance(first[-1]["error"], RepositoryError)
+        self.assertTrue(all(r["commit"] is None and r["error"] is None for r in second))
+
+    def test_commit_many_reports_each_failure(self):
+        """Any error is reported for its own path and the other repositories still commit."""
+        # A damaged config fails the commit with a plain ValueError
+        with open(os.path.join(self.paths[1], ".myscs", "config"), "w") as f:
+            f.write("{broken")
+
+        async def scenario():
+            async with AsyncRepositories(max_workers=4) as repos:
+                results = await repos.commit_many(self.paths, "Batch commit", concurrency=2)
+                return results, dict(repos._locks), dict(repos._repositories)
+
+        results, locks, repositories = asyncio.run(scenario())
+        self.assertIsInstance(results[1]["error"], ValueError)
+        self.assertIsNone(results[1]["commit"])
+        for result in results[:1] + results[2:]:
+            self.assertIsNone(result["error"])
+            self.assertEqual(Repository(result["path"]).head_commit, result["commit"])
+        # Released locks and the repositories opened under them are not kept around
+        self.assertEqual(locks, {})
+        self.assertEqual(repositories, {})
+
+    def test_operations_on_one_repository_are_serialized(self):
+        """Concurrent commits to the same repository produce a linear history."""
+        path = self.paths[0]
+
+        async def scenario():
+            async with AsyncRepositories(max_workers=4) as repos:
+                await repos.add(path, "file.txt")
+
+                async def commit(i):
+                    return await repos.commit(path, f"Commit {i}")
+
+                hashes = await asyncio.gather(*(commit(i) for i in range(5)))
+                history = await repos.log(path)
+                return hashes, history
+
+        hashes, history = asyncio.run(scenario())
+        self.assertEqual(len(history), 5)
+        self.assertEqual(sorted(c["commit_hash"] for c in history), sorted(hashes))
+
+    def test_clone(self):
+        """Cloning copies the repository to the destination."""
+        dest = os.path.join(self.base_dir, "clone")
+
+        async def scenario():
+            async with AsyncRepositories() as repos:
+                await repos.clone(self.paths[0], dest)
+
+        asyncio.run(scenario())
+        self.assertTrue(os.path.isdir(os.path.join(dest, ".myscs", "objects")))
+
+
+if __name__ == "__main__":
+    unittest.main()
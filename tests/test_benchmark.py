@@ -0,0 +1,21 @@
+import unittest
+import io
+import contextlib
+from benchmark import COMMANDS, compare_results, run_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_smallest_scale_runs_every_command(self):
+        """One run of each command on the small scale completes and reports timings."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            current = run_benchmarks(["small"], COMMANDS, 1)
+        self.assertEqual([r["command"] for r in current["results"]], COMMANDS)
+        for result in current["results"]:
+            self.assertEqual(result["runs"], 1)
+            self.assertGreater(result["p50_ms"], 0)
+        # A run compared against itself has no regressions
+        self.assertEqual(compare_results(current, current, 1.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from rich.console import Console
+import bisecting
+import commit_change
+from objects import store_blob
+from repository import Repository, RepositoryError
+
+
+class TestBisect(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a history where the bug arrives on main and a side branch
+        forks after it and merges back:
+
+            good - c1 - ... - c9 - bug - c11 - ... - c19 - merge
+                                      \\                  /
+                                       side1 - side2 ---
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.test_dir)
+        self.blobs = {state: self.blob(state) for state in ("good", "bad")}
+        self.commits = {}
+        parent = None
+        for number in range(21):
+            state = "bad" if number >= 10 else "good"
+            parent = self.write(f"c{number}", state, parent)
+        self.side = self.write("side1", "bad", self.commits["c10"])
+        self.side = self.write("side2", "bad", self.side)
+        merge = self.repo.write_commit("merge", {"v.txt": self.blobs["bad"]}, parent, merge_parent=self.side)
+        self.repo.update_ref("main", merge, "test")
+        self.repo._checkout({"v.txt": self.blobs["bad"]})
+        self.bad, self.good, self.culprit = merge, self.commits["c0"], self.commits["c10"]
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.test_dir)
+
+    def blob(self, state):
+        path = os.path.join(self.test_dir, state)
+        with open(path, "w") as f:
+            f.write(state)
+        blob_hash = store_blob(path, self.repo.objects_dir)
+        os.remove(path)
+        return blob_hash
+
+    def write(self, name, state, parent):
+        self.commits[name] = self.repo.write_commit(name, {"v.txt": self.blobs[state]}, parent)
+        return self.commits[name]
+
+    def current_state(self):
+        with open(os.path.join(self.test_dir, "v.txt")) as f:
+            return f.read()
+
+    def test_weights_count_shared_history_once(self):
+        """A commit reached through both merge parents counts once."""
+        suspects, parents = bisecting.candidates(self.repo, {"bad": self.bad, "good": [self.good]})
+        self.assertEqual(len(suspects), 23)
+        counts = bisecting.weights(suspects, parents)
+        self.assertEqual(counts[self.bad], 23)
+        self.assertEqual(counts[self.side], 12)
+        self.assertEqual(counts[self.commits["c1"]], 1)
+
+    def test_manual_bisect_finds_first_bad_commit(self):
+        """Answering each checked-out commit converges on the culprit."""
+        step = bisecting.start(self.repo, "main", [self.good[:8]])
+        self.assertTrue(self.repo.detached)
+        steps = 0
+        while not step["done"]:
+            steps += 1
+            step = bisecting.mark(self.repo, self.current_state())
+        self.assertEqual(step["commit"], self.culprit)
+        self.assertLessEqual(steps, 6)
+        self.assertEqual(self.repo.head_commit, self.culprit)
+
+        bisecting.reset(self.repo)
+        self.assertEqual(self.repo.head, ("main", self.bad))
+        self.assertIsNone(bisecting.read_state(self.repo))
+
+    def test_log_shows_history_while_detached(self):
+        """During a bisect, log lists the history of the detached HEAD."""
+        step = bisecting.start(self.repo, "main", [self.good])
+        output = StringIO()
+        with mock.patch.object(commit_change, "console", Console(file=output, width=200)):
+            commit_change.view_commit_history(self.repo)
+        text = output.getvalue()
+        self.assertIn(f"HEAD detached at {step['commit'][:7]}", text)
+        self.assertNotIn("Error", text)
+        self.assertIn(self.good[:7], text)
+
+    def test_skipped_commits_leave_candidates(self):
+        """When only skipped commits remain, all possible culprits are reported."""
+        bisecting.start(self.repo, self.commits["c11"], [self.commits["c8"]])
+        step = bisecting.mark(self.repo, "skip", self.commits["c10"])
+        step = bisecting.mark(self.repo, "skip", self.commits["c9"])
+        self.assertTrue(step["done"])
+        self.assertEqual(set(step["culprits"]), {self.commits["c9"], self.commits["c10"], self.commits["c11"]})
+
+    def test_run_uses_exit_codes(self):
+        """`run` marks commits by exit code; 125 skips a commit."""
+        script = (
+            "import sys\n"
+            "state = open('v.txt').read()\n"
+            f"sys.exit(125 if open('.myscs/HEAD').read().strip() == '{self.commits['c5']}' else (0 if state == 'good' else 1))\n"
+        )
+        bisecting.start(self.repo, "main", [self.good])
+        step = bisecting.run(self.repo, [sys.executable, "-c", script])
+        self.assertEqual(step["commit"], self.culprit)
+        with self.assertRaises(RepositoryError):
+            bisecting.start(self.repo, "main", [self.good])
+
+
+if __name__ == "__main__":
+    unittest.main()
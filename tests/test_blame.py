@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+import blame as blame_module
+from blame import blame
+from repository import Repository, RepositoryError
+
+
+class TestBlame(unittest.TestCase):
+    def setUp(self):
+        """Create a repository in a temporary directory."""
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.repo_dir)
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.repo_dir)
+
+    def commit_file(self, name, lines, message):
+        with open(os.path.join(self.repo_dir, name), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.repo.add(name)
+        return self.repo.commit(message)
+
+    def test_lines_are_attributed_to_the_commit_that_changed_them(self):
+        """Unchanged lines keep their origin; commits that skip the file are passed over."""
+        first = self.commit_file("a.txt", ["one", "two", "three"], "First")
+        second = self.commit_file("a.txt", ["one", "TWO", "three", "four"], "Second")
+        self.commit_file("other.txt", ["unrelated"], "Other file")
+
+        self.assertEqual(blame(self.repo, "a.txt"), [
+            (first, "one"), (second, "TWO"), (first, "three"), (second, "four"),
+        ])
+        self.assertEqual([origin for origin, _ in blame(self.repo, "a.txt", first)], [first] * 3)
+
+    def test_cache_makes_blame_incremental(self):
+        """After a new commit, only that commit's change is diffed."""
+        lines = ["line"]
+        for i in range(5):
+            lines.append(f"line {i}")
+            self.commit_file("a.txt", lines, f"Commit {i}")
+        blame(self.repo, "a.txt")
+
+        lines[0] = "changed"
+        last = self.commit_file("a.txt", lines, "Last")
+        with mock.patch.object(blame_module, "SequenceMatcher", wraps=blame_module.SequenceMatcher) as matcher:
+            result = blame(self.repo, "a.txt")
+        self.assertEqual(matcher.call_count, 1)
+        self.assertEqual(result[0], (last, "changed"))
+        self.assertEqual(len(set(origin for origin, _ in result)), 6)
+
+    def test_older_revision_starts_from_nearest_checkpoint(self):
+        """Blaming an older revision reads no history below it and diffs only from the checkpoint before it."""
+        lines = ["line"]
+        changes = []
+        for i in range(12):
+            lines.append(f"line {i}")
+            changes.append(self.commit_file("a.txt", lines, f"Commit {i}"))
+            self.commit_file("other.txt", [str(i)], f"Other {i}")
+        with mock.patch.object(blame_module, "CHECKPOINT_INTERVAL", 4):
+            blame(self.repo, "a.txt")
+            with mock.patch.object(self.repo, "read_commit", wraps=self.repo.read_commit) as read_commit, \
+                    mock.patch.object(blame_module, "SequenceMatcher", wraps=blame_module.SequenceMatcher) as matcher:
+                result = blame(self.repo, "a.txt", changes[9])
+        # Once to resolve the revision and once to read its files
+        self.assertEqual(read_commit.call_count, 2)
+        self.assertEqual(matcher.call_count, 1)
+
+        shutil.rmtree(os.path.join(self.repo.common_dir, blame_module.BLAME_DIR))
+        self.assertEqual(result, blame(self.repo, "a.txt", changes[9]))
+        self.assertEqual([origin for origin, _ in result], changes[:1] + changes[:10])
+
+    def test_missing_file(self):
+        """Blaming a path that is not in the revision raises an error."""
+        self.commit_file("a.txt", ["one"], "First")
+        with self.assertRaises(RepositoryError):
+            blame(self.repo, "missing.txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import shutil
+import tempfile
+from clone import deepen, shallow_clone
+from fsck import walk_reachable
+from repository import Repository
+
+
+class TestShallowClone(unittest.TestCase):
+    def setUp(self):
+        """Create a source repository with a linear history of five commits."""
+        self.base_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.base_dir, "source")
+        os.makedirs(self.source_dir)
+        self.source = Repository.init(self.source_dir)
+        self.commits = []
+        for i in range(5):
+            with open(os.path.join(self.source_dir, f"file{i}.txt"), "w") as f:
+                f.write(f"content {i}")
+            self.source.add(".")
+            self.commits.append(self.source.commit(f"Commit {i}"))
+        self.dest_dir = os.path.join(self.base_dir, "dest")
+
+    def tearDown(self):
+        """Remove the temporary repositories."""
+        shutil.rmtree(self.base_dir)
+
+    def test_depth_limits_history(self):
+        """Only the last N commits are copied and log stops at the boundary."""
+        repo = shallow_clone(self.source_dir, self.dest_dir, 2)
+        self.assertEqual(repo.shallow_commits, {self.commits[3]})
+        self.assertEqual([c["commit_hash"] for c in repo.log()], self.commits[:2:-1])
+        self.assertIsNone(repo.read_commit(self.commits[2]))
+        self.assertEqual(sorted(repo.index), [f"file{i}.txt" for i in range(5)])
+        with open(os.path.join(self.dest_dir, "file0.txt")) as f:
+            self.assertEqual(f.read(), "content 0")
+        # The missing parents beyond the boundary are not reported as damage
+        self.assertEqual(walk_reachable(repo.myscs_dir)[1], [])
+
+    def test_deepen(self):
+        """Deepening fetches older commits until the full history is present."""
+        repo = shallow_clone(self.source_dir, self.dest_dir, 1)
+        self.assertEqual(deepen(repo, 2), 2)
+        self.assertEqual(repo.shallow_commits, {self.commits[2]})
+        self.assertEqual(len(repo.log()), 3)
+        deepen(repo, 10)
+        self.assertEqual(repo.shallow_commits, frozenset())
+        self.assertEqual([c["commit_hash"] for c in repo.log()], self.commits[::-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
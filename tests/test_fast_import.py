@@ -0,0 +1,98 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from fast_import import FastImporter
+from fsck import walk_reachable
+from repository import Repository, RepositoryError
+
+
+def data(text):
+    encoded = text.encode("utf-8")
+    return b"data %d\n%s\n" % (len(encoded), encoded)
+
+
+class TestFastImport(unittest.TestCase):
+    def setUp(self):
+        """Create an empty repository to import into."""
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.repo_dir)
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.repo_dir)
+
+    def run_import(self, stream):
+        return FastImporter(self.repo, io.BytesIO(stream)).run()
+
+    def test_import_history_with_branches_and_merge(self):
+        """Blobs, commits, file changes, branches and merges are imported."""
+        stream = (
+            b"blob\nmark :1\n" + data("one\n") +
+            b"blob\nmark :2\n" + data("two\n") +
+            b"commit refs/heads/main\nmark :10\nauthor Ada <ada@example.com> 1700000000 +0000\n" + data("First") +
+            b"M 100644 :1 a.txt\nM 100644 :2 dir/b.txt\n\n" +
+            b"reset refs/heads/feature\nfrom :10\n\n" +
+            b"commit refs/heads/feature\nmark :11\ncommitter Bob <bob@example.com> 1700000100 +0000\n" + data("Feature") +
+            b"M 100644 inline c.txt\n" + data("three") + b"D a.txt\n" +
+            b"commit refs/heads/main\nmark :12\n" + data("Merge feature") +
+            b"merge :11\nM 100644 inline \"caf\\303\\251.txt\"\n" + data("four") +
+            b"done\n"
+        )
+        self.assertEqual(self.run_import(stream), ["feature", "main"])
+
+        main = self.repo.read_commit(self.repo.branch_commit("main"))
+        feature = self.repo.read_commit(self.repo.branch_commit("feature"))
+        first = self.repo.read_commit(main["parent_commit"])
+        self.assertEqual(first["author"], "Ada <ada@example.com>")
+        self.assertEqual(first["timestamp"], 1700000000.0)
+        self.assertEqual(feature["parent_commit"], main["parent_commit"])
+        self.assertEqual(main["merge_parent"], self.repo.branch_commit("feature"))
+        self.assertEqual(sorted(path for path, _ in feature["files"]), ["c.txt", "dir/b.txt"])
+        self.assertEqual(sorted(path for path, _ in main["files"]), ["a.txt", "caf\u00e9.txt", "dir/b.txt"])
+        self.assertEqual(self.repo.head_commit, self.repo.branch_commit("main"))
+        self.assertEqual(walk_reachable(self.repo.myscs_dir)[1], [])
+        self.assertFalse(os.path.exists(os.path.join(self.repo_dir, "a.txt")))
+
+    def test_errors_leave_refs_untouched(self):
+        """A broken stream raises an error and does not move any branch."""
+        with self.assertRaises(RepositoryError):
+            self.run_import(b"commit refs/heads/main\n" + data("Broken") + b"M 100644 :7 a.txt\n")
+        self.assertIsNone(self.repo.branch_commit("main"))
+
+    def test_reset_without_from_starts_a_new_root(self):
+        """A commit after 'reset' without 'from' has no parent, even if the branch exists."""
+        self.run_import(b"commit refs/heads/main\n" + data("First") + b"M 100644 inline a.txt\n" + data("one"))
+        self.run_import(b"reset refs/heads/main\n\ncommit refs/heads/main\n" + data("Root") +
+                        b"M 100644 inline b.txt\n" + data("two"))
+        root = self.repo.read_commit(self.repo.branch_commit("main"))
+        self.assertIsNone(root["parent_commit"])
+        self.assertEqual([path for path, _ in root["files"]], ["b.txt"])
+
+    def test_paths_with_whitespace_are_refused(self):
+        """Paths the index cannot hold are import errors, quoted or not."""
+        for change in (b"M 100644 inline \"with space.txt\"\n" + data("x"),
+                       b"M 100644 inline tab\tname.txt\n" + data("x"),
+                       b"D \"with space.txt\"\n"):
+            with self.assertRaises(RepositoryError):
+                self.run_import(b"commit refs/heads/main\n" + data("Bad") + change)
+        self.assertIsNone(self.repo.branch_commit("main"))
+
+    def test_malformed_stream_reports_line(self):
+        """Undecodable text and broken path escapes are import errors with a line number."""
+        blob = b"blob\nmark :1\n" + data("one")
+        cases = [
+            (blob + b"commit refs/heads/main\n" + data("Bad") + b"M 100644 :1 \xff.txt\n", "line 8"),
+            (blob + b"commit refs/heads/main\n" + data("Bad") + b"M 100644 :1 \"a\\x.txt\"\n", "line 8"),
+            (blob + b"commit refs/heads/main\n" + b"data 2\n\xff\xfe\n", "line 6"),
+        ]
+        for stream, location in cases:
+            with self.assertRaises(RepositoryError) as raised:
+                self.run_import(stream)
+            self.assertIn(location, str(raised.exception))
+        self.assertIsNone(self.repo.branch_commit("main"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from repoinit import initialize_repo
+from staging import stage_file
+from commit_change import commit
+from objects import hash_file
+from fsck import verify_objects, walk_reachable, prune
+
+
+class TestFsck(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with one commit in a temporary directory."""
+        self.original_dir = os.getcwd()
+        self.repo_dir = tempfile.mkdtemp()
+        os.chdir(self.repo_dir)
+        initialize_repo()
+        with open("tracked.txt", "w") as f:
+            f.write("tracked content")
+        stage_file("tracked.txt")
+        commit("Initial commit")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.repo_dir)
+
+    def test_clean_repository(self):
+        """A freshly committed repository has no corrupt or missing objects."""
+        self.assertEqual(verify_objects(workers=2), [])
+        _, missing = walk_reachable()
+        self.assertEqual(missing, [])
+
+    def test_detects_corrupt_object(self):
+        """An object whose contents do not match its name is reported."""
+        bad_name = "a" * 40
+        with open(f".myscs/objects/{bad_name}", "w") as f:
+            f.write("not what the name says")
+        self.assertIn((bad_name, "hash mismatch"), verify_objects(workers=2))
+
+    def test_detects_missing_blob(self):
+        """A commit that references a blob that was never stored is reported."""
+        blob_hash = hash_file("tracked.txt")
+        os.remove(f".myscs/objects/{blob_hash}")
+        _, missing = walk_reachable()
+        self.assertTrue(missing)
+        for kind, object_hash, _ in missing:
+            self.assertEqual((kind, object_hash), ("blob", blob_hash))
+
+    def test_prune_respects_grace_period(self):
+        """Unreachable objects are only deleted once they are older than the grace period."""
+        old_path = ".myscs/objects/" + "b" * 40
+        new_path = ".myscs/objects/" + "c" * 40
+        for path in (old_path, new_path):
+            with open(path, "w") as f:
+                f.write("unreachable")
+        old_time = time.time() - 30 * 24 * 60 * 60
+        os.utime(old_path, (old_time, old_time))
+
+        prune(grace_days=14)
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+        _, missing = walk_reachable()
+        self.assertEqual(missing, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from unittest import mock
+import maintenance
+import repository
+from clone import copy_repository
+from objects import list_branch_refs, take_new_objects
+from repository import Repository, RepositoryError
+
+
+class TestMaintenance(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with a few commits and branches."""
+        self.test_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.test_dir)
+        for number in range(3):
+            with open(os.path.join(self.test_dir, "a.txt"), "w") as f:
+                f.write(str(number))
+            self.repo.add("a.txt")
+            self.repo.commit(f"Commit {number}")
+            self.repo.branch(f"topic/{number}")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.test_dir)
+
+    def test_thresholds_select_tasks(self):
+        """Only the tasks whose counters crossed their thresholds are due."""
+        self.assertEqual(maintenance.due_tasks(self.repo), [])
+        self.repo.update_config(maintenance_loose_refs=4, maintenance_index_slack=1)
+        self.assertEqual(maintenance.due_tasks(self.repo), ["pack-refs", "compact-index"])
+        self.repo.update_config(maintenance_auto=False)
+        self.assertEqual(maintenance.schedule_maintenance(self.repo), [])
+
+    def test_run_packs_refs_and_compacts_index(self):
+        """After a run refs are packed, the index is compact and the run is recorded."""
+        branches = self.repo.branches()
+        entry = maintenance.run_maintenance(self.repo)
+
+        self.assertEqual(entry["status"], "ok")
+        self.assertEqual([task["name"] for task in entry["tasks"]], list(maintenance.TASKS))
+        self.assertEqual(self.repo.loose_refs(), [])
+        self.assertEqual(self.repo.branches(), branches)
+        self.assertEqual(list_branch_refs(self.repo.common_dir), branches)
+        self.assertEqual(self.repo.index_slack(), 0)
+        self.assertEqual(maintenance.measure(self.repo)["new loose objects"], 0)
+
+        # A loose ref written after packing takes precedence
+        with open(os.path.join(self.test_dir, "a.txt"), "w") as f:
+            f.write("later")
+        self.repo.add("a.txt")
+        commit_hash = self.repo.commit("Later")
+        self.assertEqual(Repository(self.test_dir).branch_commit("main"), commit_hash)
+        self.assertEqual(maintenance.read_state(self.repo)["runs"][-1]["trigger"], "manual")
+
+    def test_index_and_ref_rewrites_wait_for_writers(self):
+        """Compaction and ref packing never run while a foreground writer holds the lock."""
+        timeout = repository.LOCK_TIMEOUT
+        repository.LOCK_TIMEOUT = 0.1
+        try:
+            with self.repo._index_lock():
+                with self.assertRaises(RepositoryError):
+                    self.repo.compact_index()
+            with self.repo._refs_lock():
+                with self.assertRaises(RepositoryError):
+                    self.repo.pack_refs()
+        finally:
+            repository.LOCK_TIMEOUT = timeout
+        self.assertGreater(self.repo.compact_index(), 0)
+        self.assertEqual(self.repo.pack_refs(), 4)
+        self.assertEqual(len(self.repo.branches()), 4)
+
+    def test_lock_prevents_concurrent_runs(self):
+        """A held lock stops a second run; a stale one is taken over."""
+        lock_path = os.path.join(self.repo.common_dir, maintenance.MAINTENANCE_LOCK)
+        with open(lock_path, "w") as lock_file:
+            json.dump({"pid": 1, "started": 0}, lock_file)
+        with self.assertRaises(RepositoryError):
+            maintenance.run_maintenance(self.repo, ["pack-refs"])
+
+        # A lock whose details are not written yet is still held
+        open(lock_path, "w").close()
+        with self.assertRaises(RepositoryError):
+            maintenance.run_maintenance(self.repo, ["pack-refs"])
+        self.assertTrue(os.path.exists(lock_path))
+
+        stale = os.path.getmtime(lock_path) - maintenance.STALE_LOCK_SECONDS - 1
+        os.utime(lock_path, (stale, stale))
+        maintenance.run_maintenance(self.repo, ["pack-refs"])
+        self.assertFalse(os.path.exists(lock_path))
+
+
+    def test_new_objects_are_counted_without_listing_the_store(self):
+        """Commands add what they wrote to the counter; a prune starts it over."""
+        take_new_objects()
+        maintenance.record_new_objects(self.repo)
+        for number in range(3):
+            with open(os.path.join(self.test_dir, f"new{number}.txt"), "w") as f:
+                f.write(f"new {number}")
+        self.repo.add(".")
+        maintenance.record_new_objects(self.repo)
+        self.repo.commit("New files")
+        with mock.patch.object(maintenance.os, "scandir", wraps=os.scandir) as scandir:
+            maintenance.schedule_maintenance(self.repo)
+            values = maintenance.measure(self.repo)
+        self.assertEqual(values["new loose objects"], 4)
+        self.assertNotIn(self.repo.objects_dir, [call.args[0] for call in scandir.call_args_list if call.args])
+
+        maintenance.run_maintenance(self.repo, ["pack-refs"])
+        self.assertEqual(maintenance.new_objects(self.repo), 4)
+        maintenance.run_maintenance(self.repo, ["prune-objects"])
+        self.assertEqual(maintenance.new_objects(self.repo), 0)
+
+    def test_clone_leaves_locks_behind(self):
+        """Locks held in the source while it is copied do not lock the clone."""
+        lock_path = os.path.join(self.repo.common_dir, maintenance.MAINTENANCE_LOCK)
+        open(lock_path, "w").close()
+        reflog_lock = self.repo.reflog_path("main") + ".lock"
+        open(reflog_lock, "w").close()
+        dest = os.path.join(self.test_dir + "_clone")
+        try:
+            copy_repository(self.test_dir, dest)
+            clone = Repository(dest)
+            self.assertIsNone(maintenance.lock_holder(clone))
+            self.assertFalse(os.path.exists(clone.reflog_path("main") + ".lock"))
+            self.assertTrue(os.path.exists(clone.reflog_path("main")))
+        finally:
+            shutil.rmtree(dest, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
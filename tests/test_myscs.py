@@ -3,7 +3,9 @@ import os
 import shutil
 import sys
 print(sys.path)
+import logging
 from repoinit import initialize_repo
+from tracing import setup_logging, stop_logging
 
 
 
@@ -41,10 +43,13 @@ class TestInitializeRepo(unittest.TestCase):
 
     def test_logging(self):
         """Ensure logging works correctly."""
-        log_file = "myscs.log"
-        if os.path.exists(log_file):
-            os.remove(log_file)  # Reset log file before test
-        initialize_repo()
+        log_file = ".myscs/logs/myscs.log"
+        setup_logging("INFO")
+        try:
+            initialize_repo()
+        finally:
+            stop_logging()
+            logging.getLogger().setLevel(logging.WARNING)
         # Check that log file was created and contains relevant info
         self.assertTrue(os.path.exists(log_file))
         with open(log_file, "r") as log:
@@ -0,0 +1,96 @@
+import unittest
+import os
+import shutil
+import tempfile
+import reflog
+from fsck import prune
+from objects import object_path
+from repository import Repository, RepositoryError
+
+
+class TestReflog(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with three commits on main."""
+        self.test_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.test_dir)
+        self.commits = []
+        for number in range(3):
+            with open(os.path.join(self.test_dir, "a.txt"), "w") as f:
+                f.write(str(number))
+            self.repo.add("a.txt")
+            self.commits.append(self.repo.commit(f"Commit {number}"))
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.test_dir)
+
+    def test_entries_follow_commits_and_switches(self):
+        """HEAD and branch reflogs record every move, newest first."""
+        self.repo.branch("feature")
+        self.repo.switch("feature")
+
+        head = self.repo.reflog("HEAD")
+        self.assertEqual(head[0]["operation"], "switch: moving from main to feature")
+        self.assertEqual([entry["new"] for entry in head[1:]], list(reversed(self.commits)))
+        self.assertIsNone(head[-1]["old"])
+        self.assertEqual(self.repo.reflog("main", max_count=2)[1]["old"], self.commits[0])
+        self.assertEqual(self.repo.reflog("feature")[0]["operation"], "branch: created from main")
+
+    def test_compact_and_expire(self):
+        """Compaction keeps the newest entries; expiry drops old ones."""
+        path = self.repo.reflog_path("HEAD")
+        self.assertEqual(reflog.compact(path, keep=2), 1)
+        self.assertEqual([entry["new"] for entry in reflog.read_entries(path)], list(reversed(self.commits[1:])))
+        self.assertEqual(self.repo.expire_reflogs(days=0), 5)
+        self.assertEqual(self.repo.reflog("HEAD"), [])
+
+    def test_appends_and_compaction_wait_for_the_lock(self):
+        """Appends and compaction take the reflog's lock, which is not listed as a reflog."""
+        path = self.repo.reflog_path("HEAD")
+        timeout = reflog.LOCK_TIMEOUT
+        reflog.LOCK_TIMEOUT = 0.1
+        try:
+            with reflog._locked(path):
+                names = sorted(name for name, _ in reflog.iter_reflog_files(self.repo.myscs_dir))
+                self.assertEqual(names, ["HEAD", "refs/heads/main"])
+                with self.assertRaises(TimeoutError):
+                    reflog.compact(path, keep=1)
+                with self.assertRaises(TimeoutError):
+                    reflog.append_entry(path, None, self.commits[0], "blocked")
+        finally:
+            reflog.LOCK_TIMEOUT = timeout
+        self.assertEqual(len(reflog.read_entries(path)), 3)
+        with reflog._locked(path):
+            reflog.LOCK_TIMEOUT = 0.1
+            try:
+                with self.assertRaises(RepositoryError):
+                    self.repo.switch("main")
+            finally:
+                reflog.LOCK_TIMEOUT = timeout
+        self.assertEqual(reflog.compact(path, keep=1), 2)
+        reflog.append_entry(path, self.commits[2], self.commits[0], "reset")
+        self.assertEqual([entry["new"] for entry in reflog.read_entries(path)], [self.commits[0], self.commits[2]])
+        self.assertFalse(os.path.exists(reflog._lock_path(path)))
+
+    def test_branch_reflogs_are_never_mistaken_for_lock_files(self):
+        """Only exact lock and temporary names are skipped, and branches cannot take them."""
+        self.repo.branch("tmp_fix")
+        names = sorted(name for name, _ in reflog.iter_reflog_files(self.repo.myscs_dir))
+        self.assertEqual(names, ["HEAD", "refs/heads/main", "refs/heads/tmp_fix"])
+        for name in ("fix.lock", "fix.tmp"):
+            with self.assertRaises(RepositoryError):
+                self.repo.branch(name)
+
+    def test_prune_keeps_reflog_commits(self):
+        """A commit no branch points to survives prune while a reflog mentions it."""
+        self.repo.update_ref("main", self.commits[0], "reset: moving to Commit 0")
+        prune(grace_days=0, repo=self.repo)
+        self.assertTrue(os.path.exists(object_path(self.commits[2], self.repo.objects_dir)))
+
+        self.repo.expire_reflogs(days=0)
+        prune(grace_days=0, repo=self.repo)
+        self.assertFalse(os.path.exists(object_path(self.commits[2], self.repo.objects_dir)))
+
+
+if __name__ == "__main__":
+    unittest.main()
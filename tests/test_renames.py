@@ -0,0 +1,78 @@
+import unittest
+import os
+import shutil
+import tempfile
+from objects import store_blob
+from renames import RenameDetector
+from repository import Repository
+
+
+class TestRenames(unittest.TestCase):
+    def setUp(self):
+        """Create a repository whose base commit holds two text files."""
+        self.test_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.test_dir)
+        self.lines = [f"line {number}" for number in range(20)]
+        self.base = {"a.py": self.blob("a.py", self.lines), "b.py": self.blob("b.py", ["other"] * 5)}
+        self.base_commit = self.repo.write_commit("Base", self.base, None)
+        self.repo.update_ref("main", self.base_commit, "test")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.test_dir)
+
+    def blob(self, name, lines):
+        path = os.path.join(self.test_dir, name.replace("/", "_"))
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return store_blob(path, self.repo.objects_dir)
+
+    def branch_with(self, branch_name, files):
+        self.repo.update_ref(branch_name, self.repo.write_commit(branch_name, files, self.base_commit), "test")
+
+    def test_exact_and_similar_renames(self):
+        """Identical and mostly unchanged moves are renames; dissimilar ones are not."""
+        edited = self.lines[:15] + ["changed"] * 5
+        self.branch_with("moved", {"src/a.py": self.blob("src/a.py", edited), "src/b.py": self.base["b.py"]})
+
+        changes = self.repo.diff("main", "moved")["changes"]
+        self.assertEqual(
+            [(c["status"], c["old_path"], c["path"], c["similarity"]) for c in changes],
+            [("renamed", "a.py", "src/a.py", 75), ("renamed", "b.py", "src/b.py", 100)],
+        )
+        statuses = [c["status"] for c in self.repo.diff("main", "moved", threshold=80)["changes"]]
+        self.assertEqual(sorted(statuses), ["added", "deleted", "renamed"])
+        statuses = [c["status"] for c in self.repo.diff("main", "moved", find_renames=False)["changes"]]
+        self.assertEqual(sorted(statuses), ["added", "added", "deleted", "deleted"])
+
+    def test_copies(self):
+        """A new file similar to a kept one is reported as a copy when asked."""
+        copy = self.blob("copy.py", self.lines[:18])
+        self.branch_with("copied", dict(self.base, **{"copy.py": copy}))
+        self.assertEqual([c["status"] for c in self.repo.diff("main", "copied")["changes"]], ["added"])
+        change = self.repo.diff("main", "copied", find_copies=True)["changes"][0]
+        self.assertEqual((change["status"], change["old_path"], change["similarity"]), ("copied", "a.py", 90))
+
+    def test_limit_and_threshold_validation(self):
+        """A zero candidate limit leaves only exact matching; bad thresholds are rejected."""
+        detector = RenameDetector(self.repo.objects_dir, limit=0)
+        moved = {"c.py": self.blob("c.py", self.lines[:19]), "b2.py": self.base["b.py"]}
+        self.assertEqual(detector.detect(self.base, moved), [("renamed", "b.py", "b2.py", 100)])
+        with self.assertRaises(ValueError):
+            RenameDetector(self.repo.objects_dir, threshold=150)
+
+    def test_merge_follows_renames(self):
+        """An edit on one branch lands in the file the other branch moved."""
+        edited = self.blob("a_edited", self.lines[:-1] + ["edited"])
+        self.branch_with("edit", dict(self.base, **{"a.py": edited}))
+        self.branch_with("move", {"lib/a.py": self.base["a.py"], "b.py": self.base["b.py"]})
+        self.repo.switch("move")
+
+        result = self.repo.merge("edit")
+        self.assertEqual(result["status"], "merged")
+        merged = self.repo.entries_for_commit(self.repo.read_commit(result["commit"]))
+        self.assertEqual(dict(merged), {"lib/a.py": edited, "b.py": self.base["b.py"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import os
+import shutil
+import tempfile
+from repository import Repository, RepositoryError
+
+
+class TestRepository(unittest.TestCase):
+    def setUp(self):
+        """Create a repository in a temporary directory without changing the working directory."""
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.repo_dir)
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.repo_dir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.repo_dir, name), "w") as f:
+            f.write(content)
+
+    def test_open_requires_repository(self):
+        """Opening a directory without .myscs fails."""
+        empty_dir = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(RepositoryError):
+                Repository(empty_dir)
+        finally:
+            shutil.rmtree(empty_dir)
+
+    def test_add_commit_log(self):
+        """Staged files are committed on the current branch and show up in the log."""
+        self.write("a.txt", "first")
+        results = self.repo.add("a.txt")
+        self.assertEqual([(path, status) for path, status, _ in results], [("a.txt", "staged")])
+        self.assertEqual(self.repo.add("a.txt")[0][1], "unchanged")
+
+        first = self.repo.commit("First")
+        self.write("a.txt", "second")
+        self.repo.add("a.txt")
+        second = self.repo.commit("Second")
+
+        self.assertEqual(self.repo.head, ("main", second))
+        self.assertEqual(self.repo.branch_commit("main"), second)
+        self.assertEqual([c["commit_hash"] for c in self.repo.log()], [second, first])
+        self.assertEqual(list(self.repo.index.items()), [("a.txt", self.repo.read_commit(second)["files"][0][1])])
+
+    def test_commit_without_staged_files(self):
+        """Committing an empty index raises an error."""
+        with self.assertRaises(RepositoryError):
+            self.repo.commit("Nothing")
+
+    def test_cache_sees_external_changes(self):
+        """Files changed by another process are re-read."""
+        self.write("a.txt", "content")
+        self.repo.add("a.txt")
+        commit_hash = self.repo.commit("First")
+        self.assertEqual(self.repo.head_branch, "main")
+
+        with open(os.path.join(self.repo_dir, ".myscs", "HEAD"), "w") as head_file:
+            head_file.write(f"ref: refs/heads/other-branch\n{commit_hash}")
+        self.assertEqual(self.repo.head, ("other-branch", commit_hash))
+
+    def test_branch_and_switch(self):
+        """Branches point at the current commit and switch moves HEAD."""
+        self.write("a.txt", "content")
+        self.repo.add("a.txt")
+        commit_hash = self.repo.commit("First")
+        self.assertEqual(self.repo.branch("feature"), commit_hash)
+        with self.assertRaises(RepositoryError):
+            self.repo.branch("feature")
+        self.assertEqual(self.repo.switch("feature"), commit_hash)
+        self.assertEqual(self.repo.head_branch, "feature")
+        with self.assertRaises(RepositoryError):
+            self.repo.switch("missing")
+
+    def test_switch_keeps_staged_changes(self):
+        """Switching away from staged but uncommitted work is refused."""
+        self.write("a.txt", "v1")
+        self.repo.add("a.txt")
+        self.repo.commit("First")
+        self.repo.branch("other")
+        self.write("a.txt", "v2")
+        self.repo.add("a.txt")
+        self.repo.commit("Second")
+        self.write("a.txt", "staged work")
+        self.repo.add("a.txt")
+
+        with self.assertRaises(RepositoryError):
+            self.repo.switch("other")
+        with self.assertRaises(RepositoryError):
+            self.repo.detach("other")
+        with open(os.path.join(self.repo_dir, "a.txt")) as f:
+            self.assertEqual(f.read(), "staged work")
+        self.assertEqual(self.repo.head_branch, "main")
+        self.assertEqual(self.repo.status()["staged"], ["a.txt"])
+
+    def test_three_way_merge(self):
+        """Changes to different files on two branches merge into a merge commit."""
+        self.write("a.txt", "a")
+        self.write("b.txt", "b")
+        self.repo.add(".")
+        self.repo.commit("Base")
+        self.repo.branch("feature")
+
+        self.repo.switch("feature")
+        self.write("a.txt", "a changed on feature")
+        self.repo.add("a.txt")
+        feature_commit = self.repo.commit("Feature change")
+
+        self.repo.switch("main")
+        self.write("b.txt", "b changed on main")
+        self.repo.add("b.txt")
+        main_commit = self.repo.commit("Main change")
+
+        result = self.repo.merge("feature")
+        self.assertEqual(result["status"], "merged")
+        merge_commit = self.repo.read_commit(result["commit"])
+        self.assertEqual((merge_commit["parent_commit"], merge_commit["merge_parent"]), (main_commit, feature_commit))
+        files = dict(merge_commit["files"])
+        self.assertEqual(files["a.txt"], dict(self.repo.read_commit(feature_commit)["files"])["a.txt"])
+        self.assertEqual(files["b.txt"], dict(self.repo.read_commit(main_commit)["files"])["b.txt"])
+        self.assertEqual(self.repo.merge("feature")["status"], "up-to-date")
+
+    def test_merge_conflict(self):
+        """The same file changed differently on both branches is a conflict."""
+        self.write("a.txt", "a")
+        self.repo.add("a.txt")
+        self.repo.commit("Base")
+        self.repo.branch("feature")
+        self.repo.switch("feature")
+        self.write("a.txt", "feature")
+        self.repo.add("a.txt")
+        self.repo.commit("Feature")
+        self.repo.switch("main")
+        self.write("a.txt", "main")
+        self.repo.add("a.txt")
+        main_commit = self.repo.commit("Main")
+
+        result = self.repo.merge("feature")
+        self.assertEqual(result["status"], "conflict")
+        self.assertEqual(result["conflicts"], ["a.txt"])
+        self.assertEqual(self.repo.head_commit, main_commit)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import os
+import shutil
+import tempfile
+from repository import Repository, RepositoryError
+from sparse import ConePatterns
+from tracing import tracer, OBJECTS_OPENED
+
+
+class TestConePatterns(unittest.TestCase):
+    def test_cone_membership(self):
+        """Top-level files, listed directories and files in their parents are in the cone."""
+        patterns = ConePatterns(["a/b"])
+        self.assertTrue(patterns.contains("top.txt"))
+        self.assertTrue(patterns.contains("a/f.txt"))
+        self.assertTrue(patterns.contains("a/b/deep/x.txt"))
+        self.assertFalse(patterns.contains("a/c/y.txt"))
+        self.assertFalse(patterns.contains("z/w.txt"))
+        self.assertEqual(patterns.collapsed_directory("a/c/d/y.txt"), "a/c/")
+        self.assertEqual(patterns.collapsed_directory("z/w.txt"), "z/")
+        self.assertTrue(patterns.is_collapsed("a/c/"))
+        self.assertTrue(patterns.is_collapsed("z/"))
+        self.assertFalse(patterns.is_collapsed("a/"))
+        self.assertFalse(patterns.is_collapsed("a/c/d/"))
+
+
+class TestSparseCheckout(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with files in several directories."""
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repository.init(self.repo_dir)
+        for path, content in [("top.txt", "top"), ("a/f.txt", "f"), ("a/b/x.txt", "x"),
+                              ("a/c/y.txt", "y"), ("z/w.txt", "w")]:
+            self.write(path, content)
+        self.repo.add(".")
+        self.base = self.repo.commit("Base")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        shutil.rmtree(self.repo_dir)
+
+    def write(self, path, content):
+        absolute_path = os.path.join(self.repo_dir, path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        with open(absolute_path, "w") as f:
+            f.write(content)
+
+    def exists(self, path):
+        return os.path.exists(os.path.join(self.repo_dir, path))
+
+    def test_set_collapses_index_and_working_tree(self):
+        """Out-of-cone directories leave the working tree and become tree entries."""
+        self.repo.set_sparse(["a/b"])
+        self.assertEqual(sorted(self.repo.index), ["a/b/x.txt", "a/c/", "a/f.txt", "top.txt", "z/"])
+        self.assertTrue(self.exists("a/b/x.txt"))
+        self.assertFalse(self.exists("a/c/y.txt"))
+        self.assertFalse(self.exists("z"))
+
+    def test_commit_in_sparse_checkout_keeps_other_files(self):
+        """A commit made in a sparse checkout still contains the collapsed files."""
+        self.repo.set_sparse(["a/b"])
+        self.write("a/b/x.txt", "x changed")
+        results = self.repo.add(".")
+        self.assertEqual([path for path, status, _ in results if status == "staged"], ["a/b/x.txt"])
+        commit_hash = self.repo.commit("Sparse change")
+
+        commit_data = self.repo.read_commit(commit_hash)
+        self.assertEqual(sorted(path for path, _ in commit_data["trees"]), ["a/c/", "z/"])
+        full = self.repo.expand_entries(self.repo.entries_for_commit(commit_data))
+        self.assertEqual(sorted(full), ["a/b/x.txt", "a/c/y.txt", "a/f.txt", "top.txt", "z/w.txt"])
+
+        self.repo.disable_sparse()
+        with open(os.path.join(self.repo_dir, "z/w.txt")) as f:
+            self.assertEqual(f.read(), "w")
+        with open(os.path.join(self.repo_dir, "a/b/x.txt")) as f:
+            self.assertEqual(f.read(), "x changed")
+
+    def test_switch_only_materializes_cone(self):
+        """Switching branches in a sparse checkout only writes files in the cone."""
+        self.repo.branch("feature")
+        self.repo.switch("feature")
+        self.write("a/b/x.txt", "feature x")
+        self.write("z/w.txt", "feature w")
+        self.repo.add(".")
+        self.repo.commit("Feature")
+        self.repo.switch("main")
+
+        self.repo.set_sparse(["a/b"])
+        self.repo.switch("feature")
+        with open(os.path.join(self.repo_dir, "a/b/x.txt")) as f:
+            self.assertEqual(f.read(), "feature x")
+        self.assertFalse(self.exists("z/w.txt"))
+
+    def test_switch_does_not_expand_collapsed_trees(self):
+        """Checking a sparse switch for staged work reads no trees outside the cone."""
+        self.repo.set_sparse(["a/b"])
+        self.repo.branch("feature")
+        self.repo.switch("feature")
+        self.write("a/b/x.txt", "feature x")
+        self.repo.add(".")
+        self.repo.commit("Feature")
+
+        tracer.enabled, tracer.counters = True, {}
+        try:
+            self.repo.switch("main")
+            self.repo.switch("feature")
+        finally:
+            tracer.enabled = False
+        self.assertEqual(tracer.counters.get(OBJECTS_OPENED, 0), 0)
+
+    def test_staged_file_leaving_cone_is_kept(self):
+        """A staged change that is collapsed into a directory tree is not refused."""
+        self.write("z/w.txt", "staged w")
+        self.repo.add("z/w.txt")
+        self.repo.set_sparse(["a/b"])
+        self.assertFalse(self.exists("z/w.txt"))
+        self.assertEqual(self.repo.status()["staged"], ["z/"])
+        self.repo.disable_sparse()
+        with open(os.path.join(self.repo_dir, "z/w.txt")) as f:
+            self.assertEqual(f.read(), "staged w")
+
+    def test_local_changes_block_checkout(self):
+        """A modified file that would be removed from the cone is not overwritten."""
+        self.write("z/w.txt", "local edit")
+        with self.assertRaises(RepositoryError):
+            self.repo.set_sparse(["a/b"])
+        self.assertIsNone(self.repo.sparse_patterns)
+        self.assertTrue(self.exists("z/w.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
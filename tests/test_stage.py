@@ -1,10 +1,17 @@
 import unittest
 import os
+import shutil
+from repository import Repository
 from staging import stage_file  # Import the stage_file function from staging.py
 
 class TestStageFile(unittest.TestCase):
     def setUp(self):
         """Set up test environment by creating test files of different types."""
+        # Staging needs a repository to write the index and blobs into
+        self.created_repo = not os.path.exists(".myscs")
+        if self.created_repo:
+            Repository.init(".")
+
         # Create a text file
         self.text_file_path = "text.txt"
         with open(self.text_file_path, "w") as f:
@@ -38,6 +45,8 @@ class TestStageFile(unittest.TestCase):
             os.remove(".myscs/index")
         if os.path.exists(".myscsignore"):
             os.remove(".myscsignore")
+        if self.created_repo:
+            shutil.rmtree(".myscs")
 
     def test_stage_text_file(self):
         """Test staging a text file."""
@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import tempfile
+from fsck import walk_reachable
+from repository import Repository, RepositoryError
+
+
+class TestWorktree(unittest.TestCase):
+    def setUp(self):
+        """Create a repository with a main and a feature branch."""
+        self.base_dir = tempfile.mkdtemp()
+        self.main_dir = os.path.join(self.base_dir, "main")
+        os.makedirs(self.main_dir)
+        self.repo = Repository.init(self.main_dir)
+        with open(os.path.join(self.main_dir, "a.txt"), "w") as f:
+            f.write("a")
+        self.repo.add("a.txt")
+        self.base = self.repo.commit("Base")
+        self.repo.branch("feature")
+        self.feature_dir = os.path.join(self.base_dir, "feature")
+
+    def tearDown(self):
+        """Remove the temporary repositories."""
+        shutil.rmtree(self.base_dir)
+
+    def test_worktree_shares_objects_and_refs(self):
+        """Commits in a worktree land in the shared store and move the shared branch."""
+        worktree = self.repo.add_worktree(self.feature_dir, "feature")
+        self.assertEqual(worktree.objects_dir, self.repo.objects_dir)
+        self.assertNotEqual(worktree.index_path, self.repo.index_path)
+        with open(os.path.join(self.feature_dir, "a.txt")) as f:
+            self.assertEqual(f.read(), "a")
+
+        with open(os.path.join(self.feature_dir, "b.txt"), "w") as f:
+            f.write("b")
+        self.assertEqual([path for path, status, _ in worktree.add(".") if status == "staged"], ["b.txt"])
+        commit_hash = worktree.commit("Feature work")
+
+        self.assertEqual(self.repo.branch_commit("feature"), commit_hash)
+        self.assertEqual(self.repo.head, ("main", self.base))
+        self.assertFalse(os.path.exists(os.path.join(self.main_dir, "b.txt")))
+        self.assertIn(commit_hash, walk_reachable(self.repo.common_dir)[0])
+
+    def test_branch_cannot_be_checked_out_twice(self):
+        """A branch checked out in one worktree cannot be used by another."""
+        worktree = self.repo.add_worktree(self.feature_dir, "feature")
+        with self.assertRaises(RepositoryError):
+            self.repo.switch("feature")
+        with self.assertRaises(RepositoryError):
+            self.repo.add_worktree(os.path.join(self.base_dir, "other"), "main")
+        with self.assertRaises(RepositoryError):
+            worktree.switch("main")
+
+        self.repo.remove_worktree(self.feature_dir)
+        self.assertFalse(os.path.exists(self.feature_dir))
+        self.assertEqual([w["branch"] for w in self.repo.worktrees()], ["main"])
+        self.repo.switch("feature")
+
+    def test_add_skips_nested_worktrees_and_repositories(self):
+        """Staging the whole tree does not pick up files of worktrees or repositories inside it."""
+        inner_dir = os.path.join(self.main_dir, "inner")
+        self.repo.add_worktree(inner_dir, "feature")
+        with open(os.path.join(inner_dir, "b.txt"), "w") as f:
+            f.write("b")
+        vendor_dir = os.path.join(self.main_dir, "vendor", "lib")
+        os.makedirs(vendor_dir)
+        Repository.init(vendor_dir)
+        with open(os.path.join(vendor_dir, "lib.txt"), "w") as f:
+            f.write("lib")
+        with open(os.path.join(self.main_dir, "c.txt"), "w") as f:
+            f.write("c")
+
+        self.assertEqual([path for path, status, _ in self.repo.add(".") if status == "staged"], ["c.txt"])
+        # A registered worktree is skipped even when its pointer file is gone
+        os.remove(os.path.join(inner_dir, ".myscs"))
+        self.assertEqual(list(self.repo.walk_working_tree()), ["a.txt", "c.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
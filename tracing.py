@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from rich.console import Console
+from rich.table import Table
+
+# Initialize Rich console for output
+console = Console()
+
+LOG_DIR = os.path.join(".myscs", "logs")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Logging stays at WARNING unless asked otherwise, so the logging.info calls
+# in the command code return straight away instead of formatting records.
+DEFAULT_LOG_LEVEL = os.environ.get("MYSCS_LOG_LEVEL", "WARNING")
+
+# Counters reported by --profile and written to --trace files.
+FILES_HASHED = "files_hashed"
+BYTES_READ = "bytes_read"
+OBJECTS_OPENED = "objects_opened"
+CACHE_HITS = "cache_hits"
+
+
+class Tracer:
+    """
+    Collects timed spans and counters for one command run.
+    Does nothing until enabled, so the instrumentation costs a single
+    attribute check when neither --trace nor --profile is given.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.counters = {}
+        self.span_totals = {}
+        self._start_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self._start_ns = time.perf_counter_ns()
+
+    def _timestamp_us(self, ns):
+        return (ns - self._start_ns) / 1000
+
+    def record_span(self, name, start_ns, end_ns, args):
+        duration_us = (end_ns - start_ns) / 1000
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": self._timestamp_us(start_ns),
+            "dur": duration_us,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            calls, total_us = self.span_totals.get(name, (0, 0.0))
+            self.span_totals[name] = (calls + 1, total_us + duration_us)
+
+    def count(self, name, amount):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def write_chrome_trace(self, trace_path):
+        """
+        Write the collected spans and counters in Chrome trace-event format,
+        which can be opened in chrome://tracing or Perfetto.
+        """
+        end_ts = self._timestamp_us(time.perf_counter_ns())
+        events = list(self.events)
+        for name, value in sorted(self.counters.items()):
+            events.append({
+                "name": name,
+                "ph": "C",
+                "ts": end_ts,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {name: value},
+            })
+        with open(trace_path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+    def print_profile(self):
+        """
+        Print a summary table of where the time went and the counter totals.
+        """
+        table = Table(title="Profile", style="bold green")
+        table.add_column("Span", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total (ms)", justify="right", style="magenta")
+        for name, (calls, total_us) in sorted(self.span_totals.items(), key=lambda item: -item[1][1]):
+            table.add_row(name, str(calls), f"{total_us / 1000:.3f}")
+        console.print(table)
+
+        if self.counters:
+            counter_table = Table(title="Counters", style="bold blue")
+            counter_table.add_column("Counter", style="cyan")
+            counter_table.add_column("Value", justify="right", style="yellow")
+            for name, value in sorted(self.counters.items()):
+                counter_table.add_row(name, str(value))
+            console.print(counter_table)
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def span(name, **args):
+    """
+    Time the enclosed block as a span called `name` when tracing is enabled.
+    """
+    if not tracer.enabled:
+        yield
+        return
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        tracer.record_span(name, start_ns, time.perf_counter_ns(), args)
+
+
+def count(name, amount=1):
+    """
+    Add `amount` to a counter when tracing is enabled.
+    """
+    if tracer.enabled:
+        tracer.count(name, amount)
+
+
+class RepositoryLogHandler(logging.FileHandler):
+    """
+    File handler that writes to .myscs/logs/myscs.log.
+    Records logged before the repository exists (for example at the start of
+    `init`) are held back and written once the .myscs directory appears.
+    """
+
+    MAX_PENDING = 1000
+
+    def __init__(self, log_dir=LOG_DIR):
+        self.log_dir = log_dir
+        self.pending = []
+        super().__init__(os.path.join(log_dir, "myscs.log"), delay=True)
+
+    def emit(self, record):
+        if not os.path.isdir(os.path.dirname(self.log_dir)):
+            if len(self.pending) < self.MAX_PENDING:
+                self.pending.append(record)
+            return
+        os.makedirs(self.log_dir, exist_ok=True)
+        pending, self.pending = self.pending, []
+        for pending_record in pending:
+            super().emit(pending_record)
+        super().emit(record)
+
+
+_listener = None
+
+
+def setup_logging(level=DEFAULT_LOG_LEVEL, log_dir=LOG_DIR):
+    """
+    Send log records to .myscs/logs through a queue, so the file is written
+    by a background thread instead of the command doing the work. In a
+    linked worktree, pass the logs directory inside its own .myscs directory.
+    """
+    global _listener
+    stop_logging()
+
+    file_handler = RepositoryLogHandler(log_dir)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler)
+    _listener.start()
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, QueueHandler):
+            root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def stop_logging():
+    """
+    Flush queued log records and stop the background writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
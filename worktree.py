@@ -0,0 +1,36 @@
+import os
+import logging
+from rich.console import Console
+from rich.table import Table
+from repository import Repository, RepositoryError
+
+# Initialize Rich console for output
+console = Console()
+
+def worktree(action, path=None, branch_name=None, force=False, repo=None):
+    """
+    Manage linked worktrees: 'add' a checkout of a branch in another
+    directory, 'list' the worktrees or 'remove' one.
+    """
+    try:
+        repo = repo or Repository(".")
+        if action == "add":
+            new_worktree = repo.add_worktree(path, branch_name)
+            console.print(f"[bold green]Worktree for branch '{branch_name}' created at {new_worktree.root}.[/bold green]")
+            logging.info(f"Added worktree {new_worktree.root} for branch {branch_name}.")
+        elif action == "list":
+            table = Table(title="Worktrees", style="bold blue")
+            table.add_column("Path", style="cyan")
+            table.add_column("Branch", style="green")
+            table.add_column("Commit", style="yellow")
+            for entry in repo.worktrees():
+                path_text = entry["path"] if os.path.isdir(entry["path"] or "") else f"{entry['path']} (missing)"
+                table.add_row(path_text, entry["branch"] or "", (entry["commit"] or "")[:7])
+            console.print(table)
+        elif action == "remove":
+            repo.remove_worktree(path, force)
+            console.print(f"[bold green]Worktree {path} removed.[/bold green]")
+            logging.info(f"Removed worktree {path}.")
+    except RepositoryError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        logging.warning(f"worktree {action} failed: {e}")